@@ -0,0 +1,229 @@
+"""
+Attachment pipeline for hotel messages.
+
+On upload (pre_save, while the file is still in memory) each attachment
+gets its name, size and content type recorded, and images get a small
+JPEG thumbnail so threads can show a preview without pushing the original
+to low-bandwidth clients. Originals are served through
+attachment_response, which answers HTTP Range requests so video seeking
+and resumed downloads only transfer the bytes asked for.
+
+Attachments are served from the site's own origin, so the content type is
+never taken from the client: it is sniffed from the file's leading bytes,
+and only the INLINE_CONTENT_TYPES media formats are shown inline. Anything
+else (HTML, SVG, scripts...) goes out as an application/octet-stream
+download, and every response carries nosniff and a sandbox CSP.
+"""
+import os
+import re
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+THUMBNAIL_MAX_SIZE = (480, 480)
+THUMBNAIL_QUALITY = 70
+RANGE_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+OCTET_STREAM = 'application/octet-stream'
+# Types safe to render inline from the site origin (no script execution)
+INLINE_CONTENT_TYPES = frozenset({
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+    'video/mp4', 'video/quicktime', 'video/webm',
+    'audio/mpeg', 'audio/mp4', 'audio/aac', 'audio/ogg', 'audio/wav',
+    'application/pdf',
+})
+SNIFF_BYTES = 16
+
+
+def sniff_content_type(fileobj):
+    """Content type from the file's magic bytes; OCTET_STREAM for anything not in INLINE_CONTENT_TYPES."""
+    fileobj.seek(0)
+    head = fileobj.read(SNIFF_BYTES)
+    fileobj.seek(0)
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'audio/wav'
+    if head.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if head[4:8] == b'ftyp':
+        brand = head[8:12]
+        if brand.startswith(b'M4A') or brand.startswith(b'M4B'):
+            return 'audio/mp4'
+        return 'video/quicktime' if brand == b'qt  ' else 'video/mp4'
+    if head.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'video/webm'
+    if head.startswith(b'OggS'):
+        return 'audio/ogg'
+    if head.startswith(b'ID3'):
+        return 'audio/mpeg'
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # Frame sync: layer bits 00 is AAC (ADTS), anything else MPEG audio
+        return 'audio/aac' if head[1] & 0x06 == 0 else 'audio/mpeg'
+    return OCTET_STREAM
+
+
+def safe_content_type(content_type):
+    """The stored type if it may be served inline, else OCTET_STREAM (covers rows recorded before sniffing)."""
+    return content_type if content_type in INLINE_CONTENT_TYPES else OCTET_STREAM
+
+
+def build_thumbnail(fileobj):
+    """Return (jpeg_bytes, width, height) for an image file, or None if it is not a readable image."""
+    try:
+        fileobj.seek(0)
+        with Image.open(fileobj) as image:
+            width, height = image.size
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.split()[-1])
+                image = background
+            image.thumbnail(THUMBNAIL_MAX_SIZE)
+            buffer = BytesIO()
+            # Re-encoding drops EXIF/GPS metadata from the preview
+            image.save(buffer, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+    finally:
+        fileobj.seek(0)
+    return buffer.getvalue(), width, height
+
+
+def _apply(instance, fileobj, name, size, content_type):
+    instance.attachment_name = os.path.basename(name)[:255]
+    instance.attachment_size = size
+    instance.attachment_content_type = content_type[:100]
+    instance.attachment_width = None
+    instance.attachment_height = None
+    if content_type.startswith('image/'):
+        thumbnail = build_thumbnail(fileobj)
+        if thumbnail:
+            data, instance.attachment_width, instance.attachment_height = thumbnail
+            stem = os.path.splitext(os.path.basename(name))[0] or 'attachment'
+            instance.attachment_thumbnail.save(f'{stem}_thumb.jpg', ContentFile(data), save=False)
+
+
+def prepare_attachment(instance):
+    """Fill in metadata and the thumbnail for a freshly uploaded attachment."""
+    upload = instance.attachment.file
+    name = getattr(upload, 'name', None) or instance.attachment.name
+    _apply(instance, upload, name, upload.size, sniff_content_type(upload))
+
+
+def process_stored_attachment(instance):
+    """Backfill metadata/thumbnail for an attachment already in storage; returns the fields to save."""
+    name = instance.attachment.name
+    with instance.attachment.open('rb') as stored:
+        fileobj = BytesIO(stored.read())
+    _apply(instance, fileobj, name, fileobj.getbuffer().nbytes, sniff_content_type(fileobj))
+    return [
+        'attachment_thumbnail', 'attachment_name', 'attachment_size',
+        'attachment_content_type', 'attachment_width', 'attachment_height',
+    ]
+
+
+def attachment_payload(message):
+    """Attachment fields for JSON/websocket message payloads."""
+    if not message.attachment:
+        return {'attachment_url': None}
+    return {
+        'attachment_url': message.get_attachment_url(),
+        'attachment_thumbnail_url': message.get_attachment_thumbnail_url(),
+        'attachment_name': message.attachment_name or os.path.basename(message.attachment.name),
+        'attachment_size': message.attachment_size,
+        'attachment_content_type': message.attachment_content_type,
+        'attachment_kind': message.attachment_kind,
+        'attachment_width': message.attachment_width,
+        'attachment_height': message.attachment_height,
+    }
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single satisfiable byte range, None for no/ignored range, False if unsatisfiable."""
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_range(fileobj, start, length):
+    fileobj.seek(start)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = fileobj.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def _harden(response):
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Content-Security-Policy'] = 'sandbox'
+    return response
+
+
+def attachment_response(request, field_file, content_type=None, filename=None, as_attachment=False):
+    """
+    Serve a stored file. Local storage answers Range requests with 206
+    partial content; remote storage (Cloudinary) redirects to its CDN URL,
+    which handles ranges itself. Types outside INLINE_CONTENT_TYPES are
+    always downloaded as application/octet-stream.
+    """
+    storage = field_file.storage
+    try:
+        path = storage.path(field_file.name)
+    except NotImplementedError:
+        return _harden(HttpResponseRedirect(field_file.url))
+
+    size = os.path.getsize(path)
+    content_type = safe_content_type(content_type)
+    as_attachment = as_attachment or content_type == OCTET_STREAM
+    filename = filename or os.path.basename(path)
+    byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(iter_range(open(path, 'rb'), start, end - start + 1), status=206,
+                                         content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type,
+                                as_attachment=as_attachment, filename=filename)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private, max-age=86400'
+    return _harden(response)
@@ -0,0 +1,39 @@
+"""
+Membership bookkeeping for hotel communities.
+
+Community.member_count mirrors the size of the members relation so pages
+can show it without a COUNT over the join table. Joins are applied as F()
+increments from the m2m_changed signal; removals, which are rare, recount
+the affected communities with one grouped query.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Community
+
+
+def add_members(community_ids, count):
+    if count and community_ids:
+        Community.objects.filter(pk__in=community_ids).update(member_count=F('member_count') + count)
+
+
+def _member_count_subquery():
+    Membership = Community.members.through
+    counts = (
+        Membership.objects.filter(community=OuterRef('pk'))
+        .order_by()
+        .values('community')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def recount_members(community_ids=None):
+    """Recompute member_count from the join table, for the given communities or all of them."""
+    communities = Community.objects.all()
+    if community_ids is not None:
+        if not community_ids:
+            return 0
+        communities = communities.filter(pk__in=community_ids)
+    return communities.update(member_count=_member_count_subquery())
@@ -0,0 +1,109 @@
+"""
+Denormalized engagement counters for hotel posts.
+
+Each Post carries like_count, comment_count and share_count, and each
+author carries the matching rollups over all of their posts (plus
+posts_count), so profile and feed pages read engagement from the row they
+already loaded instead of issuing COUNT queries. Counters are adjusted with
+F() expressions from the Like/Comment/Share/Post signals, which keeps them
+correct under concurrent requests and cascade deletes; reconcile_counts()
+rebuilds them from the source tables if they ever drift.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Like, Post, Share
+
+# Post counter -> author rollup it feeds
+ROLLUPS = {
+    'like_count': 'likes_received_count',
+    'comment_count': 'comments_received_count',
+    'share_count': 'shares_received_count',
+}
+
+
+def _adjust(field, delta):
+    if delta > 0:
+        return F(field) + delta
+    return Greatest(F(field) + delta, 0)
+
+
+def adjust_engagement(post_id, author_id, field, delta):
+    """Add delta to one post counter and to the author's matching rollup."""
+    Post.objects.filter(id=post_id).update(**{field: _adjust(field, delta)})
+    get_user_model().objects.filter(id=author_id).update(**{ROLLUPS[field]: _adjust(ROLLUPS[field], delta)})
+
+
+def adjust_post_count(author_id, delta):
+    get_user_model().objects.filter(id=author_id).update(posts_count=_adjust('posts_count', delta))
+
+
+def post_author_id(post_id):
+    return Post.objects.filter(id=post_id).values_list('author_id', flat=True).first()
+
+
+def engagement_counts(post_id):
+    """{'like_count', 'comment_count', 'share_count'} for one post, read from its columns."""
+    counts = Post.objects.filter(id=post_id).values(*ROLLUPS).first()
+    return counts or dict.fromkeys(ROLLUPS, 0)
+
+
+def _count_subquery(model, fk):
+    counts = (
+        model.objects.filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _rollup_subquery(expression):
+    totals = (
+        Post.objects.filter(author=OuterRef('pk'))
+        .order_by()
+        .values('author')
+        .annotate(total=expression)
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+
+def reconcile_counts():
+    """
+    Recompute every post counter and author rollup from the Like, Comment,
+    Share and Post tables. Returns (posts_fixed, authors_fixed): how many
+    rows had drifted.
+    """
+    User = get_user_model()
+    post_truth = {
+        'like_count': _count_subquery(Like, 'post'),
+        'comment_count': _count_subquery(Comment, 'post'),
+        'share_count': _count_subquery(Share, 'original_post'),
+    }
+    author_truth = {
+        'posts_count': _rollup_subquery(Count('id')),
+        'likes_received_count': _rollup_subquery(Sum('like_count')),
+        'comments_received_count': _rollup_subquery(Sum('comment_count')),
+        'shares_received_count': _rollup_subquery(Sum('share_count')),
+    }
+
+    with transaction.atomic():
+        drifted_posts = _drifted_ids(Post.objects.all(), post_truth)
+        Post.objects.filter(id__in=drifted_posts).update(**post_truth)
+        # Author rollups are summed from the post columns, so they run after the posts are fixed
+        drifted_authors = _drifted_ids(User.objects.all(), author_truth)
+        User.objects.filter(id__in=drifted_authors).update(**author_truth)
+    return len(drifted_posts), len(drifted_authors)
+
+
+def _drifted_ids(queryset, truth):
+    annotations = {f'true_{field}': expression for field, expression in truth.items()}
+    rows = queryset.annotate(**annotations).values('id', *truth, *annotations)
+    return [
+        row['id'] for row in rows.iterator(chunk_size=2000)
+        if any(row[field] != row[f'true_{field}'] for field in truth)
+    ]
@@ -0,0 +1,233 @@
+"""
+Feed engine for hotel.social_feed.
+
+Builds one page of the social feed at a time with keyset cursors on
+(created_at, id) instead of loading the whole Post table and slicing it
+in Python. Two streams are read per page:
+
+- regular posts: every post (minus the pinned global posts)
+- partner posts: posts by approved investors, injected after every
+  PARTNER_INTERVAL regular posts
+
+The position of both streams is carried between requests in an opaque,
+signed cursor so the AJAX infinite scroll only ever touches one page.
+The unfiltered regular stream and the "following" home feed are read from
+the fan-out timelines in hotel.timelines.
+"""
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import BooleanField, Exists, F, OuterRef, Prefetch, Q, Value, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment, Like, Post
+from .timelines import follower_source_ids, hydrate, read_timeline
+
+FEED_PAGE_SIZE = 20
+FEED_COMMENTS_PREVIEW = 3
+GLOBAL_POSTS_LIMIT = 10
+PARTNER_INTERVAL = 3
+CURSOR_SALT = 'hotel.feed.cursor'
+# Feed cards are cached per post/version/language; author profile edits show up within this window
+POST_CARD_CACHE_TIMEOUT = 600
+
+
+def encode_cursor(state):
+    return signing.dumps(state, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """Return the cursor state, or None for a missing/tampered cursor (first page)."""
+    if not token:
+        return None
+    try:
+        state = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _position(post):
+    return [post.created_at.isoformat(), post.id]
+
+
+def _after(queryset, position):
+    """Keyset filter: posts strictly older than position in (-created_at, -id) order."""
+    if not position:
+        return queryset
+    created_at = datetime.fromisoformat(position[0])
+    post_id = position[1]
+    return queryset.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=post_id)
+    )
+
+
+def feed_queryset(user=None):
+    """
+    Post queryset for feed pages: author joined, the viewer's like state
+    annotated (like/comment counts are denormalized columns on Post), image renditions prefetched for srcsets,
+    and only the latest FEED_COMMENTS_PREVIEW comments prefetched per post -
+    never the full Like/Comment tables.
+    """
+    if user is not None and user.is_authenticated:
+        liked_by_me = Exists(Like.objects.filter(post=OuterRef('pk'), user=user))
+    else:
+        liked_by_me = Value(False, output_field=BooleanField())
+
+    latest_comments = (
+        Comment.objects.select_related('author')
+        .annotate(
+            recent_rank=Window(
+                RowNumber(),
+                partition_by=[F('post_id')],
+                order_by=[F('created_at').desc(), F('id').desc()],
+            )
+        )
+        .filter(recent_rank__lte=FEED_COMMENTS_PREVIEW)
+        .order_by('created_at', 'id')
+    )
+
+    return Post.objects.select_related('author').annotate(
+        liked_by_me=liked_by_me,
+    ).prefetch_related(
+        Prefetch('comments', queryset=latest_comments, to_attr='latest_comments'),
+        'renditions',
+    )
+
+
+def viewer_overlay(user, posts, following_ids, follower_counts):
+    """
+    Per-viewer state for a page of cached feed cards: like state and counts
+    per post, follow state and follower counts per author, and the viewer's
+    initial for the comment box. Applied client-side by applyViewerOverlay.
+    """
+    viewer_id = user.id if user is not None and user.is_authenticated else None
+    initial = ''
+    if viewer_id:
+        initial = (user.first_name or user.username)[:1].upper()
+    authors = {post.author_id for post in posts}
+    return {
+        'viewer_id': viewer_id,
+        'initial': initial,
+        'posts': {
+            post.id: {'liked': bool(getattr(post, 'liked_by_me', False)), 'likes': post.like_count}
+            for post in posts
+        },
+        'authors': {
+            author_id: {'following': author_id in following_ids, 'followers': follower_counts.get(author_id, 0)}
+            for author_id in authors
+        },
+    }
+
+
+def global_posts_queryset():
+    """Pinned posts from approved investors shown at the top for every user."""
+    return Post.objects.filter(
+        author__user_type='investor',
+        author__is_approved=True
+    ).order_by('-created_at', '-id')
+
+
+def apply_feed_filter(queryset, feed_type):
+    if feed_type == 'text':
+        # Posts with no images and no location
+        return queryset.filter(
+            (Q(image__isnull=True) | Q(image='')) & (Q(location__isnull=True) | Q(location=''))
+        )
+    if feed_type == 'images':
+        return queryset.exclude(image__isnull=True).exclude(image='')
+    if feed_type == 'location':
+        return queryset.exclude(location__isnull=True).exclude(location='')
+    return queryset
+
+
+def build_home_page(user, cursor=None, page_size=FEED_PAGE_SIZE, base_queryset=None):
+    """One page of the viewer's home timeline (own posts plus followed authors)."""
+    if user is None or not user.is_authenticated:
+        return [], None
+    if base_queryset is None:
+        base_queryset = feed_queryset(user)
+
+    state = decode_cursor(cursor) or {}
+    fallback = Post.objects.filter(author_id__in=follower_source_ids(user.id))
+    ids = read_timeline(user.id, state.get('r'), page_size + 1, fallback_queryset=fallback)
+    posts = hydrate(ids[:page_size], base_queryset)
+
+    next_cursor = None
+    if len(ids) > page_size and posts:
+        next_cursor = encode_cursor({'r': _position(posts[-1]), 'p': None, 'n': 0})
+    return posts, next_cursor
+
+
+def build_feed_page(feed_type='all', cursor=None, page_size=FEED_PAGE_SIZE, base_queryset=None, user=None):
+    """
+    Assemble a single feed page.
+
+    Returns (posts, next_cursor). next_cursor is None on the last page.
+    base_queryset lets callers add select_related/prefetch/annotations; it is
+    only ever evaluated for the rows of this page.
+    """
+    if feed_type == 'following':
+        return build_home_page(user, cursor, page_size, base_queryset)
+    if base_queryset is None:
+        base_queryset = feed_queryset()
+
+    state = decode_cursor(cursor)
+    global_ids = list(global_posts_queryset().values_list('id', flat=True)[:GLOBAL_POSTS_LIMIT])
+
+    posts = []
+    if state is None:
+        state = {'r': None, 'p': None, 'n': 0}
+        if global_ids:
+            global_posts = {post.id: post for post in base_queryset.filter(id__in=global_ids)}
+            posts = [global_posts[pk] for pk in global_ids if pk in global_posts]
+
+    partner_qs = apply_feed_filter(
+        base_queryset.filter(author__user_type='investor', author__is_approved=True).exclude(id__in=global_ids),
+        feed_type,
+    )
+
+    slots = max(page_size - len(posts), 0)
+    if feed_type == 'all':
+        # Unfiltered feed: range read on the global fan-out timeline, then hydrate
+        excluded = set(global_ids)
+        ids = read_timeline(None, state['r'], slots + 1 + len(excluded), fallback_queryset=Post.objects.all())
+        regular = hydrate([pk for pk in ids if pk not in excluded][:slots + 1], base_queryset)
+    else:
+        regular_qs = apply_feed_filter(base_queryset.exclude(id__in=global_ids), feed_type)
+        regular = list(_after(regular_qs, state['r']).order_by('-created_at', '-id')[:slots + 1])
+    partners = list(_after(partner_qs, state['p']).order_by('-created_at', '-id')[:slots // PARTNER_INTERVAL + 2])
+
+    seen = {post.id for post in posts}
+    regular_seen = state.get('n', 0)
+    regular_pos = state['r']
+    partner_pos = state['p']
+    r_idx = 0
+    p_idx = 0
+
+    while len(posts) < page_size and r_idx < len(regular):
+        post = regular[r_idx]
+        r_idx += 1
+        regular_pos = _position(post)
+        regular_seen += 1
+        if post.id not in seen:
+            posts.append(post)
+            seen.add(post.id)
+
+        # Every PARTNER_INTERVAL regular posts, inject one partner post
+        if regular_seen % PARTNER_INTERVAL == 0 and len(posts) < page_size:
+            while p_idx < len(partners):
+                partner = partners[p_idx]
+                p_idx += 1
+                partner_pos = _position(partner)
+                if partner.id not in seen:
+                    posts.append(partner)
+                    seen.add(partner.id)
+                    break
+
+    # A full fetch that was entirely consumed (e.g. duplicates skipped) may still have more rows behind it
+    has_next = r_idx < len(regular) or len(regular) > slots
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor({'r': regular_pos, 'p': partner_pos, 'n': regular_seen})
+    return posts, next_cursor
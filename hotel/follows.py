@@ -0,0 +1,62 @@
+"""
+Follow graph lookups for the social feed.
+
+Follower counts for every author on a page come from one grouped query, and
+the set of users the viewer follows is cached per user so follow buttons do
+not cost a query each. The cache is invalidated from Connection signals in
+hotel.models whenever a connection is created, accepted or removed.
+"""
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Connection
+
+FOLLOWING_CACHE_TIMEOUT = 600  # 10 minutes
+
+
+def following_cache_key(user_id):
+    return f"hotel_following_{user_id}"
+
+
+def get_following_ids(user_id):
+    """Return the set of user ids that user_id follows (accepted connections)."""
+    key = following_cache_key(user_id)
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        print(f"Cache get failed: {e}")
+        cached = None
+    if cached is not None:
+        return set(cached)
+
+    following = set(
+        Connection.objects.filter(sender_id=user_id, status='accepted').values_list('receiver_id', flat=True)
+    )
+    try:
+        cache.set(key, list(following), FOLLOWING_CACHE_TIMEOUT)
+    except Exception as e:
+        print(f"Cache set failed: {e}")
+    return following
+
+
+def invalidate_following(user_id):
+    try:
+        cache.delete(following_cache_key(user_id))
+    except Exception as e:
+        print(f"Cache delete failed: {e}")
+
+
+def get_follower_counts(author_ids):
+    """Return {author_id: accepted follower count} in a single grouped query."""
+    author_ids = set(author_ids)
+    if not author_ids:
+        return {}
+    rows = (
+        Connection.objects.filter(receiver_id__in=author_ids, status='accepted')
+        .values('receiver_id')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    counts = {author_id: 0 for author_id in author_ids}
+    counts.update({row['receiver_id']: row['total'] for row in rows})
+    return counts
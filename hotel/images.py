@@ -0,0 +1,153 @@
+"""
+Responsive image renditions for hotel.Post.
+
+After a post with an image is committed, the original is re-encoded into
+AVIF, WebP and JPEG at each of RENDITION_WIDTHS (never upscaled). Encoding
+is CPU-bound, so it runs in a process pool; a small dispatcher thread
+feeds the pool and stores the results, keeping the request thread free.
+Re-encoding also drops EXIF/GPS metadata, and the original dimensions are
+saved on the post so templates can reserve space and avoid layout shift.
+
+Templates render the result with the {% post_picture %} tag from
+hotel_images, which emits a <picture> with per-format srcsets.
+
+The pool lives in the web worker, and gunicorn's --max-requests recycles
+workers, so a queued job can be lost with its process. Post.image_status is
+therefore persisted: PENDING when queued, READY or FAILED when done. Run
+`process_post_images` from cron every few minutes; it picks up posts left
+PENDING for longer than its --stale-minutes window.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+RENDITION_WIDTHS = (320, 640, 1080)
+# (format key, Pillow encoder, quality) - listed in order of preference for <picture>
+RENDITION_FORMATS = (
+    ('avif', 'AVIF', 50),
+    ('webp', 'WEBP', 75),
+    ('jpeg', 'JPEG', 80),
+)
+CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+_pool_lock = threading.Lock()
+_process_pool = None
+_dispatcher = None
+
+
+def _encoders():
+    from PIL import features
+    available = {'JPEG'}
+    if features.check('webp'):
+        available.add('WEBP')
+    if features.check('avif'):
+        available.add('AVIF')
+    return [(key, encoder, quality) for key, encoder, quality in RENDITION_FORMATS if encoder in available]
+
+
+def render_renditions(data, widths=RENDITION_WIDTHS):
+    """
+    Pure, picklable worker: decode image bytes and return
+    (width, height, [(format, width, height, encoded_bytes), ...]).
+    Raises ValueError for data Pillow cannot read.
+    """
+    try:
+        with Image.open(BytesIO(data)) as source:
+            source = ImageOps.exif_transpose(source)
+            if source.mode not in ('RGB', 'L'):
+                rgba = source.convert('RGBA')
+                source = Image.new('RGB', rgba.size, (255, 255, 255))
+                source.paste(rgba, mask=rgba.split()[-1])
+            elif source.mode == 'L':
+                source = source.convert('RGB')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f'Unreadable image: {e}')
+
+    original_width, original_height = source.size
+    targets = sorted({min(width, original_width) for width in widths})
+    renditions = []
+    for target in targets:
+        height = max(1, round(original_height * target / original_width))
+        resized = source if target == original_width else source.resize((target, height), Image.LANCZOS)
+        for key, encoder, quality in _encoders():
+            buffer = BytesIO()
+            # No exif= argument: the encoded rendition carries no camera/GPS metadata
+            resized.save(buffer, format=encoder, quality=quality, optimize=(encoder == 'JPEG'))
+            renditions.append((key, target, height, buffer.getvalue()))
+    return original_width, original_height, renditions
+
+
+def _get_process_pool():
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=getattr(settings, 'POST_IMAGE_WORKERS', 2))
+        return _process_pool
+
+
+def _get_dispatcher():
+    global _dispatcher
+    with _pool_lock:
+        if _dispatcher is None:
+            _dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='post-images')
+        return _dispatcher
+
+
+def process_post_image(post_id, use_pool=True):
+    """Build and store all renditions for one post. Returns the number of renditions written."""
+    from .models import Post, PostImageRendition
+
+    post = Post.objects.filter(id=post_id).first()
+    if post is None or not post.image:
+        return 0
+
+    with post.image.open('rb') as original:
+        data = original.read()
+    try:
+        if use_pool:
+            width, height, renditions = _get_process_pool().submit(render_renditions, data).result()
+        else:
+            width, height, renditions = render_renditions(data)
+    except Exception:
+        Post.objects.filter(id=post.id).update(image_status='FAILED')
+        raise
+
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    with transaction.atomic():
+        for old in post.renditions.all():
+            old.file.delete(save=False)
+        post.renditions.all().delete()
+        for key, rendition_width, rendition_height, encoded in renditions:
+            rendition = PostImageRendition(post=post, format=key, width=rendition_width,
+                                           height=rendition_height, size=len(encoded))
+            rendition.file.save(f'{stem}_{rendition_width}w.{key}', ContentFile(encoded), save=False)
+            rendition.save()
+        Post.objects.filter(id=post.id).update(image_width=width, image_height=height, image_status='READY')
+    return len(renditions)
+
+
+def _process_in_background(post_id):
+    close_old_connections()
+    try:
+        process_post_image(post_id)
+    except Exception as e:
+        print(f"Post image processing failed for post {post_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_post_image(post_id):
+    """Queue rendition processing once the surrounding transaction commits."""
+    from .models import Post
+
+    Post.objects.filter(id=post_id).update(image_status='PENDING')
+    if not getattr(settings, 'POST_IMAGE_ASYNC', True):
+        transaction.on_commit(lambda: process_post_image(post_id, use_pool=False))
+        return
+    transaction.on_commit(lambda: _get_dispatcher().submit(_process_in_background, post_id))
@@ -0,0 +1,118 @@
+"""
+Inbox summaries for hotel direct messages.
+
+One Conversation row per pair of users carries the last message and an
+unread count for each side, so the inbox is a single indexed query no
+matter how long the message history is. Rows are written from the Message
+post_save signal and reset when a thread is read.
+"""
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Greatest
+
+from .models import Conversation, Message
+
+PREVIEW_LENGTH = 100
+PAGE_SIZE = 20
+
+
+def _pair(user_id, other_id):
+    return (user_id, other_id) if user_id <= other_id else (other_id, user_id)
+
+
+def _unread_field(conversation_user_a_id, reader_id):
+    return 'unread_a' if reader_id == conversation_user_a_id else 'unread_b'
+
+
+def message_preview(message):
+    if message.content:
+        return message.content[:PREVIEW_LENGTH]
+    if message.attachment:
+        return '📎 Attachment'
+    return ''
+
+
+def record_message(message):
+    """Point the pair's summary at `message` and bump the receiver's unread count."""
+    user_a_id, user_b_id = _pair(message.sender_id, message.receiver_id)
+    conversation, _ = Conversation.objects.get_or_create(user_a_id=user_a_id, user_b_id=user_b_id)
+    updates = {
+        'last_message': message,
+        'last_message_preview': message_preview(message),
+        'last_message_at': message.created_at,
+    }
+    if not message.is_read:
+        unread_field = _unread_field(user_a_id, message.receiver_id)
+        updates[unread_field] = F(unread_field) + 1
+    Conversation.objects.filter(pk=conversation.pk).update(**updates)
+
+
+def mark_thread_read(reader_id, partner_id):
+    """Reset the reader's unread count after a thread's messages were marked read."""
+    user_a_id, user_b_id = _pair(reader_id, partner_id)
+    Conversation.objects.filter(user_a_id=user_a_id, user_b_id=user_b_id).update(
+        **{_unread_field(user_a_id, reader_id): 0}
+    )
+
+
+def mark_messages_read(reader_id, partner_id, count=1):
+    """Decrement the reader's unread count after count of the partner's messages were marked read."""
+    user_a_id, user_b_id = _pair(reader_id, partner_id)
+    unread_field = _unread_field(user_a_id, reader_id)
+    Conversation.objects.filter(user_a_id=user_a_id, user_b_id=user_b_id).update(
+        **{unread_field: Greatest(F(unread_field) - count, 0)}
+    )
+
+
+def mark_message_read(message):
+    """Decrement the reader's unread count for a single message marked read."""
+    mark_messages_read(message.receiver_id, message.sender_id)
+
+
+def conversations_for(user):
+    """The user's conversations, newest first, with partner and unread_count attached."""
+    conversations = list(
+        Conversation.objects.filter(Q(user_a=user) | Q(user_b=user), last_message_at__isnull=False)
+        .select_related('user_a', 'user_b')
+        .order_by('-last_message_at')
+    )
+    for conversation in conversations:
+        conversation.partner = conversation.partner_for(user)
+        conversation.unread_count = conversation.unread_for(user)
+    return conversations
+
+
+def unread_total(user):
+    totals = Conversation.objects.filter(Q(user_a=user) | Q(user_b=user)).aggregate(
+        as_a=Sum('unread_a', filter=Q(user_a=user)),
+        as_b=Sum('unread_b', filter=Q(user_b=user)),
+    )
+    return (totals['as_a'] or 0) + (totals['as_b'] or 0)
+
+
+def rebuild_conversations():
+    """Recompute every summary from the Message table. Returns the number of rows written."""
+    summaries = {}
+    messages = Message.objects.only(
+        'id', 'sender_id', 'receiver_id', 'content', 'attachment', 'is_read', 'created_at'
+    ).order_by('created_at', 'id')
+    for message in messages.iterator(chunk_size=2000):
+        key = _pair(message.sender_id, message.receiver_id)
+        summary = summaries.setdefault(key, {'unread_a': 0, 'unread_b': 0})
+        summary['last_message'] = message
+        if not message.is_read:
+            summary[_unread_field(key[0], message.receiver_id)] += 1
+
+    Conversation.objects.all().delete()
+    Conversation.objects.bulk_create([
+        Conversation(
+            user_a_id=user_a_id,
+            user_b_id=user_b_id,
+            last_message=summary['last_message'],
+            last_message_preview=message_preview(summary['last_message']),
+            last_message_at=summary['last_message'].created_at,
+            unread_a=summary['unread_a'],
+            unread_b=summary['unread_b'],
+        )
+        for (user_a_id, user_b_id), summary in summaries.items()
+    ], batch_size=1000)
+    return len(summaries)
@@ -0,0 +1,105 @@
+"""
+Management Command: Community Scale Benchmark
+Purpose: Time the community membership check, member count and message
+paging against a large community, next to the old load-everything versions.
+
+Usage:
+    python manage.py community_benchmark
+    python manage.py community_benchmark --members 10000 --messages 100000
+
+Builds a throwaway community (members, messages and their users) inside a
+transaction that is rolled back at the end, so nothing is left behind.
+Each operation reports its median wall time over --repeat runs and the
+number of SQL queries it issued.
+"""
+
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from hotel import sync as message_sync
+from hotel.communities import recount_members
+from hotel.models import Community, CommunityMessage
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark membership checks and message paging on a large throwaway community."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=10000, help='Members in the benchmark community')
+        parser.add_argument('--messages', type=int, default=100000, help='Messages in the benchmark community')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per operation')
+
+    def handle(self, *args, **options):
+        self.repeat = max(options['repeat'], 1)
+        try:
+            with transaction.atomic():
+                self._run(options['members'], options['messages'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark data rolled back.'))
+
+    def _measure(self, label, func):
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+        self.stdout.write(f"{label:<42} {statistics.median(timings) * 1000:9.2f} ms  {len(queries):3d} queries")
+
+    def _run(self, member_total, message_total):
+        User = get_user_model()
+        tag = uuid.uuid4().hex[:8]
+        started = time.perf_counter()
+
+        users = User.objects.bulk_create(
+            [User(username=f'bench-{tag}-{i}', password='!') for i in range(max(member_total, 1) + 1)],
+            batch_size=2000,
+        )
+        outsider, members = users[0], users[1:]
+        community = Community.objects.create(name=f'Benchmark {tag}', creator=members[0])
+        Membership = Community.members.through
+        Membership.objects.bulk_create(
+            [Membership(community_id=community.id, customuser_id=user.id) for user in members],
+            batch_size=5000,
+        )
+        recount_members([community.id])
+        CommunityMessage.objects.bulk_create(
+            [
+                CommunityMessage(community=community, sender=members[i % len(members)], content=f'message {i}')
+                for i in range(message_total)
+            ],
+            batch_size=5000,
+        )
+        community.refresh_from_db()
+        self.stdout.write(
+            f"Seeded {community.member_count} members and {message_total} messages "
+            f"in {time.perf_counter() - started:.1f}s\n"
+        )
+
+        member = members[-1]
+        thread = message_sync.community_thread(community)
+        middle_id = CommunityMessage.objects.filter(community=community).order_by('id').values_list(
+            'id', flat=True
+        )[message_total // 2] if message_total else None
+
+        self._measure('membership: user in members.all() (old)', lambda: member in community.members.all())
+        self._measure('membership: is_member() exists', lambda: community.is_member(member))
+        self._measure('membership: non-member is_member()', lambda: community.is_member(outsider))
+        self._measure('member count: members.count() (old)', lambda: community.members.count())
+        self._measure('member count: member_count column',
+                      lambda: Community.objects.values_list('member_count', flat=True).get(id=community.id))
+        self._measure('messages: full history (old)', lambda: list(thread.order_by('created_at')))
+        self._measure('messages: latest page', lambda: message_sync.messages_before(thread))
+        self._measure('messages: page before the midpoint', lambda: message_sync.messages_before(thread, middle_id))
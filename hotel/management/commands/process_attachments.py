@@ -0,0 +1,46 @@
+"""
+Management Command: Process Message Attachments
+Purpose: Backfill size, content type, dimensions and preview thumbnails for
+hotel message attachments uploaded before the attachment pipeline existed.
+
+Usage:
+    python manage.py process_attachments
+    python manage.py process_attachments --limit 500
+
+New uploads are processed automatically on save; this only touches rows
+without a recorded size.
+"""
+
+from django.core.management.base import BaseCommand
+
+from hotel.attachments import process_stored_attachment
+from hotel.models import CommunityMessage, Message
+
+
+class Command(BaseCommand):
+    help = "Backfill metadata and thumbnails for existing message attachments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Maximum attachments to process per model')
+
+    def handle(self, *args, **options):
+        for model in (Message, CommunityMessage):
+            pending = model.objects.exclude(attachment='').exclude(attachment__isnull=True).filter(
+                attachment_size__isnull=True
+            ).order_by('id')
+            if options['limit']:
+                pending = pending[:options['limit']]
+
+            processed = failed = 0
+            for message in pending.iterator(chunk_size=200):
+                try:
+                    fields = process_stored_attachment(message)
+                    message.save(update_fields=fields)
+                    processed += 1
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f'⚠️ {model.__name__} {message.id}: {e}'))
+
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {model.__name__}: processed {processed} attachment(s), {failed} failed.'
+            ))
@@ -0,0 +1,63 @@
+"""
+Management Command: Process Post Images
+Purpose: Generate responsive AVIF/WebP/JPEG renditions for hotel post images
+whose processing never finished, or re-encode all of them.
+
+Usage:
+    python manage.py process_post_images
+    python manage.py process_post_images --limit 500
+    python manage.py process_post_images --stale-minutes 30
+    python manage.py process_post_images --all
+
+New posts are processed automatically after they are saved, in a pool inside
+the web worker. A recycled worker (gunicorn --max-requests) loses whatever
+was still queued there, so by default this picks up every post image that
+is not READY, skipping PENDING ones queued within --stale-minutes (still in
+flight). Runs as:
+    - Scheduled cron job (e.g. every 5 minutes)
+    - Manual command with --all after changing the rendition settings
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from hotel.images import process_post_image
+from hotel.models import Post
+
+STALE_MINUTES = 10
+
+
+class Command(BaseCommand):
+    help = "Build responsive renditions for post images that are not processed yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Maximum posts to process')
+        parser.add_argument('--all', action='store_true', help='Re-encode posts that already have renditions')
+        parser.add_argument('--stale-minutes', type=int, default=STALE_MINUTES,
+                            help=f'Leave PENDING posts queued more recently than this alone (default: {STALE_MINUTES}).')
+
+    def handle(self, *args, **options):
+        pending = Post.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        if not options['all']:
+            cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+            # Posts are queued when they are created, so created_at is when they went PENDING
+            pending = pending.exclude(image_status='READY').exclude(
+                Q(image_status='PENDING') & Q(created_at__gt=cutoff)
+            )
+        post_ids = list(pending.values_list('id', flat=True))
+        if options['limit']:
+            post_ids = post_ids[:options['limit']]
+
+        processed = failed = 0
+        for post_id in post_ids:
+            try:
+                process_post_image(post_id)
+                processed += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'⚠️ Post {post_id}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Processed {processed} post image(s), {failed} failed.'))
@@ -0,0 +1,102 @@
+"""
+Management Command: Real-time Messaging Load Test
+Purpose: Measure how many concurrent websocket connections one ASGI worker
+can hold and how quickly an event fans out to all of them.
+
+Usage:
+    python manage.py realtime_loadtest
+    python manage.py realtime_loadtest --connections 5000 --events 20
+
+Runs in-process against myuganda.realtime.websocket_application: every
+connection joins the same direct-message thread between two existing users,
+a driver connection sends typing events, and the command reports connect
+time, fan-out latency (p50/p95/max) and peak process memory. Typing events
+go through the channel layer only, so no message rows are written.
+"""
+
+import asyncio
+import resource
+import statistics
+import sys
+import time
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from myuganda.realtime import websocket_application
+
+
+class Command(BaseCommand):
+    help = "Load test the websocket messaging handler: concurrent connections and fan-out latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000, help='Concurrent listening connections')
+        parser.add_argument('--events', type=int, default=10, help='Typing events to fan out')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Seconds to wait for each fan-out')
+
+    def handle(self, *args, **options):
+        users = list(get_user_model().objects.order_by('id')[:2])
+        if len(users) < 2:
+            raise CommandError('Need at least two users in the database to open a direct-message thread.')
+
+        report = asyncio.run(self._run(users[0], users[1], options['connections'], options['events'], options['timeout']))
+
+        self.stdout.write(f"Connections:        {report['connections']}")
+        self.stdout.write(f"Connect time:       {report['connect_seconds']:.2f}s "
+                          f"({report['connections'] / max(report['connect_seconds'], 1e-9):.0f} conn/s)")
+        self.stdout.write(f"Fan-out p50:        {report['p50'] * 1000:.1f} ms")
+        self.stdout.write(f"Fan-out p95:        {report['p95'] * 1000:.1f} ms")
+        self.stdout.write(f"Fan-out max:        {report['max'] * 1000:.1f} ms")
+        self.stdout.write(f"Peak memory:        {report['peak_mb']:.1f} MB")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report['connections']} concurrent connections held by one worker; "
+            f"{report['events']} events delivered to all of them."
+        ))
+
+    async def _connect(self, user, partner):
+        communicator = ApplicationCommunicator(websocket_application, {
+            'type': 'websocket',
+            'path': f'/ws/hotel/conversation/{partner.id}/',
+            'headers': [],
+            'user': user,
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        accepted = await communicator.receive_output(timeout=10)
+        if accepted['type'] != 'websocket.accept':
+            raise CommandError(f'Connection rejected: {accepted}')
+        return communicator
+
+    async def _run(self, user, partner, connections, events, timeout):
+        started = time.perf_counter()
+        listeners = []
+        for _ in range(connections):
+            listeners.append(await self._connect(partner, user))
+        connect_seconds = time.perf_counter() - started
+        driver = await self._connect(user, partner)
+
+        latencies = []
+        for _ in range(events):
+            sent_at = time.perf_counter()
+            await driver.send_input({'type': 'websocket.receive', 'text': '{"type": "typing"}'})
+            await asyncio.gather(*(listener.receive_output(timeout=timeout) for listener in listeners))
+            latencies.append(time.perf_counter() - sent_at)
+            await driver.receive_output(timeout=timeout)
+
+        for communicator in listeners + [driver]:
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(timeout=timeout)
+
+        # ru_maxrss is kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_mb = peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+        ordered = sorted(latencies)
+        return {
+            'connections': connections,
+            'events': events,
+            'connect_seconds': connect_seconds,
+            'p50': statistics.median(ordered) if ordered else 0.0,
+            'p95': ordered[int(len(ordered) * 0.95) - 1] if ordered else 0.0,
+            'max': ordered[-1] if ordered else 0.0,
+            'peak_mb': peak_mb,
+        }
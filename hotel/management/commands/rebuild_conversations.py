@@ -0,0 +1,23 @@
+"""
+Management Command: Rebuild Inbox Conversation Summaries
+Purpose: Recompute hotel.Conversation rows (last message + unread counts)
+from the full Message history.
+
+Usage:
+    python manage.py rebuild_conversations
+
+Run once after deploying the Conversation table, or any time the summaries
+are suspected to have drifted (e.g. after bulk message imports).
+"""
+
+from django.core.management.base import BaseCommand
+
+from hotel.inbox import rebuild_conversations
+
+
+class Command(BaseCommand):
+    help = "Rebuild inbox conversation summaries from the message history."
+
+    def handle(self, *args, **options):
+        count = rebuild_conversations()
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {count} conversation summary row(s).'))
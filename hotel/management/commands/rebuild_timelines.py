@@ -0,0 +1,72 @@
+"""
+Management Command: Rebuild / Trim Feed Timelines
+Purpose: Backfill the fan-out timelines used by the hotel social feed and keep
+the global and home timelines capped.
+
+Usage:
+    python manage.py rebuild_timelines            # Backfill global + rebuild every home timeline
+    python manage.py rebuild_timelines --trim     # Only trim the global and home timelines to the cap
+    python manage.py rebuild_timelines --user 42  # Rebuild a single user's home timeline
+
+Runs as:
+    - Once after deploying the timeline tables
+    - Scheduled cron job (e.g. nightly) with --trim, as a backstop for the
+      trimming done during fan-out (see hotel.timelines)
+"""
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from hotel.models import Post, TimelineEntry
+from hotel.timelines import TIMELINE_MAX_ENTRIES, rebuild_home_timeline, trim_timeline
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Backfill the global feed timeline and rebuild or trim per-user home timelines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trim', action='store_true', help='Only trim the global and home timelines to the cap.')
+        parser.add_argument('--user', type=int, help='Limit to a single user id.')
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=TIMELINE_MAX_ENTRIES,
+            help=f'Entries to keep per timeline (default: {TIMELINE_MAX_ENTRIES}).'
+        )
+
+    def handle(self, *args, **options):
+        keep = options['keep']
+        user_ids = get_user_model().objects.values_list('id', flat=True)
+        if options.get('user'):
+            user_ids = user_ids.filter(id=options['user'])
+
+        if options['trim']:
+            deleted = sum(trim_timeline(user_id, keep) for user_id in user_ids.iterator())
+            if not options.get('user'):
+                deleted += trim_timeline(None, keep)
+            self.stdout.write(self.style.SUCCESS(f'✅ Trimmed {deleted} timeline entries.'))
+            return
+
+        if not options.get('user'):
+            added = self._backfill_global(keep)
+            self.stdout.write(f'Global timeline: {added} post(s) backfilled.')
+
+        rebuilt = 0
+        for user_id in user_ids.iterator():
+            rebuild_home_timeline(user_id, keep)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {rebuilt} home timeline(s).'))
+
+    def _backfill_global(self, keep):
+        """Put the newest `keep` posts on the global timeline; older ones are read through the fallback."""
+        existing = set(TimelineEntry.objects.filter(owner__isnull=True).values_list('post_id', flat=True))
+        posts = Post.objects.only('id', 'author_id', 'created_at').order_by('-created_at', '-id')[:keep]
+        batch = [
+            TimelineEntry(owner=None, post_id=post.id, author_id=post.author_id, created_at=post.created_at)
+            for post in posts if post.id not in existing
+        ]
+        TimelineEntry.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+        trim_timeline(None, keep)
+        return len(batch)
@@ -0,0 +1,27 @@
+"""
+Management Command: Reconcile Engagement Counters
+Purpose: Recompute the denormalized like/comment/share counters on hotel
+posts and the per-author rollups on users from the source tables.
+
+Usage:
+    python manage.py reconcile_engagement
+
+Counters are kept current by signals; run this after bulk imports, raw SQL
+deletes or anything else that bypasses them. Only drifted rows are written.
+"""
+
+from django.core.management.base import BaseCommand
+
+from hotel.engagement import reconcile_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute post engagement counters and author rollups."
+
+    def handle(self, *args, **options):
+        posts_fixed, authors_fixed = reconcile_counts()
+        if posts_fixed or authors_fixed:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️ Corrected {posts_fixed} post(s) and {authors_fixed} author rollup(s).'
+            ))
+        self.stdout.write(self.style.SUCCESS('✅ Engagement counters reconciled.'))
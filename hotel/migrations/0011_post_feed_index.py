@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0010_alter_communitymessage_content_alter_message_content'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='hotel_post_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    Message = apps.get_model('hotel', 'Message')
+    Conversation = apps.get_model('hotel', 'Conversation')
+    summaries = {}
+    for message in Message.objects.order_by('created_at', 'id').iterator(chunk_size=2000):
+        pair = tuple(sorted((message.sender_id, message.receiver_id)))
+        summary = summaries.setdefault(pair, {'unread_a': 0, 'unread_b': 0})
+        summary['last_message'] = message
+        if not message.is_read:
+            summary['unread_a' if message.receiver_id == pair[0] else 'unread_b'] += 1
+    Conversation.objects.bulk_create([
+        Conversation(
+            user_a_id=pair[0],
+            user_b_id=pair[1],
+            last_message=summary['last_message'],
+            last_message_preview=(summary['last_message'].content or '')[:100],
+            last_message_at=summary['last_message'].created_at,
+            unread_a=summary['unread_a'],
+            unread_b=summary['unread_b'],
+        )
+        for pair, summary in summaries.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0012_timelineentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_preview', models.CharField(blank=True, max_length=255)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_a', models.PositiveIntegerField(default=0)),
+                ('unread_b', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['receiver', 'is_read'], name='hotel_msg_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'created_at'], name='hotel_msg_thread_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hotel.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_a',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hotel_conversations_as_a', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user_b',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hotel_conversations_as_b', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_a', '-last_message_at'], name='hotel_conv_a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user_b', '-last_message_at'], name='hotel_conv_b_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversation',
+            unique_together={('user_a', 'user_b')},
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:27
+
+import mimetypes
+import os
+
+from django.db import migrations, models
+
+
+def backfill_attachment_types(apps, schema_editor):
+    # Name and content type come from the file name alone; thumbnails and sizes
+    # need the stored file and are filled in by `manage.py process_attachments`.
+    for model_name in ('Message', 'CommunityMessage'):
+        model = apps.get_model('hotel', model_name)
+        pending = model.objects.exclude(attachment='').exclude(attachment__isnull=True)
+        for message in pending.only('id', 'attachment').iterator(chunk_size=1000):
+            model.objects.filter(pk=message.pk).update(
+                attachment_name=os.path.basename(message.attachment.name)[:255],
+                attachment_content_type=mimetypes.guess_type(message.attachment.name)[0] or 'application/octet-stream',
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0013_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='communitymessage',
+            name='attachment_content_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='communitymessage',
+            name='attachment_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='communitymessage',
+            name='attachment_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='communitymessage',
+            name='attachment_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='communitymessage',
+            name='attachment_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='message_attachments/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='communitymessage',
+            name='attachment_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment_content_type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment_thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='message_attachments/thumbs/'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='attachment_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_attachment_types, migrations.RunPython.noop),
+    ]
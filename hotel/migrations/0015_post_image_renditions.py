@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0014_message_attachment_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='PostImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('avif', 'AVIF'), ('webp', 'WebP'), ('jpeg', 'JPEG')], max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(upload_to='posts/renditions/')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='hotel.post')),
+            ],
+            options={
+                'unique_together': {('post', 'format', 'width')},
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def _count(model, fk):
+    counts = (
+        model.objects.filter(**{fk: OuterRef('pk')})
+        .order_by()
+        .values(fk)
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def _rollup(Post, expression):
+    totals = (
+        Post.objects.filter(author=OuterRef('pk'))
+        .order_by()
+        .values('author')
+        .annotate(total=expression)
+        .values('total')
+    )
+    return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('hotel', 'Post')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post.objects.update(
+        like_count=_count(apps.get_model('hotel', 'Like'), 'post'),
+        comment_count=_count(apps.get_model('hotel', 'Comment'), 'post'),
+        share_count=_count(apps.get_model('hotel', 'Share'), 'original_post'),
+    )
+    User.objects.update(
+        posts_count=_rollup(Post, Count('id')),
+        likes_received_count=_rollup(Post, Sum('like_count')),
+        comments_received_count=_rollup(Post, Sum('comment_count')),
+        shares_received_count=_rollup(Post, Sum('share_count')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0015_post_image_renditions'),
+        ('users', '0008_engagement_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='share_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
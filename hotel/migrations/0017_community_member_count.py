@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_member_counts(apps, schema_editor):
+    Community = apps.get_model('hotel', 'Community')
+    Membership = Community.members.through
+    counts = (
+        Membership.objects.filter(community=OuterRef('pk'))
+        .order_by()
+        .values('community')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Community.objects.update(member_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0016_post_engagement_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='communitymessage',
+            index=models.Index(fields=['community', 'id'], name='hotel_cmsg_cursor_idx'),
+        ),
+        migrations.RunPython(backfill_member_counts, migrations.RunPython.noop),
+    ]
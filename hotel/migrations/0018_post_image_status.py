@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:45
+
+from django.db import migrations, models
+
+
+def backfill_image_status(apps, schema_editor):
+    Post = apps.get_model('hotel', 'Post')
+    with_image = Post.objects.exclude(image='').exclude(image__isnull=True)
+    with_image.filter(renditions__isnull=False).update(image_status='READY')
+    with_image.filter(renditions__isnull=True).update(image_status='PENDING')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0017_community_member_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], max_length=12),
+        ),
+        migrations.RunPython(backfill_image_status, migrations.RunPython.noop),
+    ]
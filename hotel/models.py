@@ -1,18 +1,78 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
+from django.dispatch import receiver
 
 class Post(models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='posts')
     content = models.TextField()
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Filled in by the rendition pipeline (hotel.images); lets templates reserve space
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    IMAGE_STATES = [
+        ('PENDING', 'Pending'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+    image_status = models.CharField(max_length=12, choices=IMAGE_STATES, blank=True)
     location = models.CharField(max_length=255, blank=True, null=True)
+    # Denormalized engagement counters, maintained by hotel.engagement
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination for the social feed orders by (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='hotel_post_feed_idx'),
+        ]
+
     def __str__(self):
         return f"Post by {self.author.username}: {self.content[:50]}"
 
+    @property
+    def card_version(self):
+        """
+        Part of the cache key for the shared feed card (hotel/post_card.html):
+        changes on edits, new comments and once image renditions are ready.
+        Likes and follows are per-viewer overlay data and do not bump it.
+        """
+        return f"{self.updated_at.timestamp():.0f}.{self.comment_count}.{self.image_width or 0}"
+
+    def image_sources(self):
+        """
+        {format: [(url, width), ...]} from prefetched renditions, smallest first.
+        Empty until the renditions have been generated.
+        """
+        sources = {}
+        for rendition in sorted(self.renditions.all(), key=lambda r: r.width):
+            sources.setdefault(rendition.format, []).append((rendition.file.url, rendition.width))
+        return sources
+
+class PostImageRendition(models.Model):
+    FORMAT_CHOICES = [
+        ('avif', 'AVIF'),
+        ('webp', 'WebP'),
+        ('jpeg', 'JPEG'),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='renditions')
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='posts/renditions/')
+
+    class Meta:
+        unique_together = ('post', 'format', 'width')
+
+    def __str__(self):
+        return f"{self.format} {self.width}w for post {self.post_id}"
+
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -45,19 +105,91 @@ class Connection(models.Model):
     def __str__(self):
         return f"Connection from {self.sender.username} to {self.receiver.username}"
 
-class Message(models.Model):
+class MessageAttachment(models.Model):
+    """
+    Attachment file plus the metadata the upload pipeline in hotel.attachments
+    records, so threads can render a preview without fetching the original.
+    """
+    attachment = models.FileField(upload_to='message_attachments/', blank=True, null=True)
+    attachment_thumbnail = models.ImageField(upload_to='message_attachments/thumbs/', blank=True, null=True)
+    attachment_name = models.CharField(max_length=255, blank=True)
+    attachment_size = models.PositiveBigIntegerField(null=True, blank=True)
+    attachment_content_type = models.CharField(max_length=100, blank=True)
+    attachment_width = models.PositiveIntegerField(null=True, blank=True)
+    attachment_height = models.PositiveIntegerField(null=True, blank=True)
+
+    attachment_route = None
+
+    class Meta:
+        abstract = True
+
+    @property
+    def attachment_kind(self):
+        content_type = self.attachment_content_type or ''
+        if content_type.startswith('image/'):
+            return 'image'
+        if content_type.startswith('video/'):
+            return 'video'
+        if content_type.startswith('audio/'):
+            return 'audio'
+        return 'file'
+
+    def get_attachment_url(self):
+        from django.urls import reverse
+        return reverse(self.attachment_route, args=[self.pk])
+
+    def get_attachment_thumbnail_url(self):
+        if not self.attachment_thumbnail:
+            return None
+        return f'{self.get_attachment_url()}?variant=thumbnail'
+
+class Message(MessageAttachment):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hotel_sent_messages')
     receiver = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hotel_received_messages')
     content = models.TextField(blank=True)
-    attachment = models.FileField(upload_to='message_attachments/', blank=True, null=True)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    attachment_route = 'hotel:message_attachment'
+
     def __str__(self):
         return f"Message from {self.sender.username} to {self.receiver.username}"
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['receiver', 'is_read'], name='hotel_msg_unread_idx'),
+            models.Index(fields=['sender', 'receiver', 'created_at'], name='hotel_msg_thread_idx'),
+        ]
+
+class Conversation(models.Model):
+    """
+    Inbox summary for a pair of users, kept up to date from Message signals.
+    user_a always holds the lower user id so each pair has exactly one row.
+    """
+    user_a = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hotel_conversations_as_a')
+    user_b = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='hotel_conversations_as_b')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_preview = models.CharField(max_length=255, blank=True)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_a = models.PositiveIntegerField(default=0)
+    unread_b = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user_a', 'user_b')
+        indexes = [
+            models.Index(fields=['user_a', '-last_message_at'], name='hotel_conv_a_idx'),
+            models.Index(fields=['user_b', '-last_message_at'], name='hotel_conv_b_idx'),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_a_id} and {self.user_b_id}"
+
+    def partner_for(self, user):
+        return self.user_b if self.user_a_id == user.id else self.user_a
+
+    def unread_for(self, user):
+        return self.unread_a if self.user_a_id == user.id else self.unread_b
 
 class Share(models.Model):
     original_post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='shares')
@@ -77,25 +209,200 @@ class Community(models.Model):
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='created_communities')
     members = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='communities', blank=True)
     invite_link = models.CharField(max_length=100, unique=True, blank=True, null=True)
+    # Denormalized len(members), kept current by the members m2m_changed signal
+    member_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Community: {self.name} by {self.creator.username}"
 
+    def is_member(self, user):
+        """Membership via the (community, user) unique index instead of loading all members."""
+        if not user.is_authenticated:
+            return False
+        return self.members.filter(pk=user.pk).exists()
+
     def save(self, *args, **kwargs):
         if not self.invite_link:
             self.invite_link = str(uuid.uuid4())[:8]
         super().save(*args, **kwargs)
 
-class CommunityMessage(models.Model):
+class CommunityMessage(MessageAttachment):
     community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField(blank=True)
-    attachment = models.FileField(upload_to='message_attachments/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    attachment_route = 'hotel:community_attachment'
+
     def __str__(self):
         return f"Message in {self.community.name} by {self.sender.username}"
 
     class Meta:
-        ordering = ['created_at']
\ No newline at end of file
+        ordering = ['created_at']
+        indexes = [
+            # Cursor pages (hotel.sync) read a community's messages by id range
+            models.Index(fields=['community', 'id'], name='hotel_cmsg_cursor_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """
+    Fan-out-on-write timeline row. owner=None is the global timeline; other
+    rows are per-user home timelines filled for followers when a post is made.
+    created_at mirrors the post so pages are a single index range read.
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries', null=True, blank=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('owner', 'post')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='hotel_timeline_page_idx'),
+        ]
+
+    def __str__(self):
+        return f"Timeline of {self.owner_id or 'global'}: post {self.post_id}"
+
+# --- Signals ---
+
+@receiver(post_save, sender=Connection)
+@receiver(post_delete, sender=Connection)
+def invalidate_following_cache(sender, instance, **kwargs):
+    """Drop the sender's cached following set whenever a connection changes."""
+    # Local import to avoid circular dependency
+    from .follows import invalidate_following
+    invalidate_following(instance.sender_id)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Push new posts onto the global timeline and every follower's home timeline."""
+    if created:
+        from .timelines import schedule_fan_out
+        schedule_fan_out(instance)
+
+
+@receiver(pre_save, sender=Connection)
+def remember_connection_status(sender, instance, **kwargs):
+    """Record the stored status so post_save can tell when a follow becomes accepted."""
+    instance._previous_status = (
+        Connection.objects.filter(pk=instance.pk).values_list('status', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Connection)
+def backfill_timeline_on_follow(sender, instance, **kwargs):
+    """Backfill the follower's home timeline only when the connection turns accepted."""
+    if instance.status == 'accepted' and getattr(instance, '_previous_status', None) != 'accepted':
+        from .timelines import backfill_follow
+        backfill_follow(instance.sender_id, instance.receiver_id)
+
+
+@receiver(post_delete, sender=Connection)
+def prune_timeline_on_unfollow(sender, instance, **kwargs):
+    from .timelines import remove_author
+    remove_author(instance.sender_id, instance.receiver_id)
+
+
+@receiver(post_save, sender=Message)
+def update_conversation_summary(sender, instance, created, **kwargs):
+    """Keep the inbox Conversation row in step with every new message."""
+    if created:
+        from .inbox import record_message
+        record_message(instance)
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_save, sender=CommunityMessage)
+def wake_message_sync(sender, instance, created, **kwargs):
+    """Wake long-polling sync requests in this process as soon as a message lands."""
+    if created:
+        from .sync import notify_waiters
+        notify_waiters()
+
+
+@receiver(post_save, sender=Message)
+def push_direct_message(sender, instance, created, **kwargs):
+    """Push new direct messages to open websocket connections on the thread."""
+    if created:
+        from myuganda.realtime import direct_group, publish_message
+        publish_message(direct_group(instance.sender_id, instance.receiver_id), instance)
+
+
+@receiver(post_save, sender=CommunityMessage)
+def push_community_message(sender, instance, created, **kwargs):
+    """Push new community messages to open websocket connections on the community."""
+    if created:
+        from myuganda.realtime import community_group, publish_message
+        publish_message(community_group(instance.community_id), instance)
+
+
+@receiver(pre_save, sender=Message)
+@receiver(pre_save, sender=CommunityMessage)
+def process_message_attachment(sender, instance, **kwargs):
+    """Record metadata and build a preview while the upload is still in memory."""
+    if instance.attachment and not instance.attachment._committed:
+        from .attachments import prepare_attachment
+        prepare_attachment(instance)
+
+
+@receiver(post_save, sender=Post)
+def queue_post_image_renditions(sender, instance, created, **kwargs):
+    """Build responsive renditions for new image posts off the request thread."""
+    if created and instance.image:
+        from .images import schedule_post_image
+        schedule_post_image(instance.id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def update_author_post_count(sender, instance, created=False, **kwargs):
+    """Keep the author's posts_count rollup in step with post creation and deletion."""
+    from .engagement import adjust_post_count
+    if kwargs.get('signal') is post_delete:
+        adjust_post_count(instance.author_id, -1)
+    elif created:
+        adjust_post_count(instance.author_id, 1)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Share)
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Share)
+def update_engagement_counters(sender, instance, created=False, **kwargs):
+    """F() increment/decrement of the post counter and the post author's rollup."""
+    deleted = kwargs.get('signal') is post_delete
+    if not (created or deleted):
+        return
+    from .engagement import adjust_engagement, post_author_id
+    field = {Like: 'like_count', Comment: 'comment_count', Share: 'share_count'}[sender]
+    post_id = instance.original_post_id if sender is Share else instance.post_id
+    author_id = post_author_id(post_id)
+    if author_id is not None:
+        adjust_engagement(post_id, author_id, field, -1 if deleted else 1)
+
+
+
+@receiver(m2m_changed, sender=Community.members.through)
+def update_community_member_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Community.member_count in step with joins and leaves from either side of the relation."""
+    from .communities import add_members, recount_members
+    if action == 'pre_clear' and reverse:
+        # user.communities.clear() reports no ids afterwards; remember which communities lose a member
+        instance._cleared_community_ids = list(instance.communities.values_list('id', flat=True))
+    elif action == 'post_add':
+        # post_add's pk_set only holds rows that were actually inserted
+        if reverse:
+            add_members(pk_set, 1)
+        else:
+            add_members([instance.pk], len(pk_set))
+    elif action == 'post_remove':
+        # Removals report the requested ids rather than the deleted rows, so recount; leaving is rare
+        recount_members(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear':
+        recount_members(instance.__dict__.pop('_cleared_community_ids', []) if reverse else [instance.pk])
@@ -0,0 +1,170 @@
+"""
+Incremental message sync for hotel conversations and communities.
+
+Threads are addressed by message id, which only ever grows:
+
+- delta sync returns messages with id > after (oldest first), optionally
+  long-polling until something arrives so the client holds one cheap
+  request open instead of re-fetching the full history
+- history pages walk backwards with id < before, newest page first, so a
+  thread opens on its latest THREAD_PAGE_SIZE messages and older ones are
+  loaded lazily as the user scrolls up
+
+Live updates normally arrive over the websocket (myuganda.realtime). A
+long-poll ties up the worker thread running the view for up to
+LONG_POLL_TIMEOUT seconds. Under WSGI that is one of the server's own
+request threads, so ?wait=1 is honoured only while fewer than
+MESSAGE_LONG_POLL_MAX_WAITERS requests in the process are already waiting
+(0, the default, turns it off) and the rest of the pool stays free for
+ordinary requests. Under ASGI each sync view runs in a thread taken from
+the shared sync_to_async executor, which every other sync view and ORM
+call in the process also draws on, so a few held long-polls would starve
+them; there it is never held. A request that cannot wait answers at once
+with poll_after, the seconds the client should wait before asking again.
+
+Long-polls are woken in-process by the Message/CommunityMessage signals
+and fall back to re-checking the database every LONG_POLL_INTERVAL
+seconds, so waiters served by another worker still see new rows.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q
+
+from .attachments import attachment_payload
+from .models import CommunityMessage, Message
+
+THREAD_PAGE_SIZE = 30
+SYNC_BATCH_LIMIT = 100
+LONG_POLL_TIMEOUT = 25
+LONG_POLL_INTERVAL = 1.0
+POLL_AFTER = 5
+
+_thread_changed = threading.Condition()
+_waiters_lock = threading.Lock()
+_waiters = 0
+
+
+def notify_waiters():
+    """Wake any long-polls in this process; each re-checks its own thread."""
+    with _thread_changed:
+        _thread_changed.notify_all()
+
+
+def direct_thread(user, other_user):
+    return Message.objects.select_related('sender').filter(
+        Q(sender=user, receiver=other_user) | Q(sender=other_user, receiver=user)
+    )
+
+
+def community_thread(community):
+    return CommunityMessage.objects.select_related('sender').filter(community=community)
+
+
+def parse_message_id(value):
+    """Cursor ids arrive as query strings; anything unusable means 'no cursor'."""
+    try:
+        message_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return message_id if message_id >= 0 else None
+
+
+def messages_after(queryset, after_id, limit=SYNC_BATCH_LIMIT):
+    """Up to limit messages newer than after_id, oldest first, and whether more are waiting."""
+    if after_id is not None:
+        queryset = queryset.filter(id__gt=after_id)
+    batch = list(queryset.order_by('id')[:limit + 1])
+    return batch[:limit], len(batch) > limit
+
+
+def messages_before(queryset, before_id=None, limit=THREAD_PAGE_SIZE):
+    """The page of messages just older than before_id (or the latest page), oldest first."""
+    if before_id is not None:
+        queryset = queryset.filter(id__lt=before_id)
+    page = list(queryset.order_by('-id')[:limit + 1])
+    has_more = len(page) > limit
+    return list(reversed(page[:limit])), has_more
+
+
+def wait_for_messages(queryset, after_id, timeout=LONG_POLL_TIMEOUT, limit=SYNC_BATCH_LIMIT):
+    """Long-poll: return messages_after as soon as there is something, or ([], False) on timeout."""
+    deadline = time.monotonic() + max(timeout, 0)
+    while True:
+        batch, has_more = messages_after(queryset, after_id, limit)
+        remaining = deadline - time.monotonic()
+        if batch or remaining <= 0:
+            return batch, has_more
+        with _thread_changed:
+            _thread_changed.wait(min(LONG_POLL_INTERVAL, remaining))
+
+
+@contextmanager
+def long_poll_slot(request):
+    """
+    Yields True if this request may long-poll, holding one of the process's
+    waiter slots meanwhile. Never under ASGI, where the held thread would
+    come out of the shared sync_to_async executor.
+    """
+    global _waiters
+    limit = getattr(settings, 'MESSAGE_LONG_POLL_MAX_WAITERS', 0)
+    with _waiters_lock:
+        allowed = not isinstance(request, ASGIRequest) and _waiters < limit
+        if allowed:
+            _waiters += 1
+    try:
+        yield allowed
+    finally:
+        if allowed:
+            with _waiters_lock:
+                _waiters -= 1
+
+
+def fetch_messages(request, queryset, after_id, limit=SYNC_BATCH_LIMIT):
+    """
+    Delta sync for a view: long-polls for ?wait=1 when a slot is free.
+    Returns (messages, has_more, poll_after); poll_after is set only when
+    a requested wait could not be held.
+    """
+    if request.GET.get('wait') != '1':
+        return (*messages_after(queryset, after_id, limit), None)
+    with long_poll_slot(request) as allowed:
+        if allowed:
+            return (*wait_for_messages(queryset, after_id, limit=limit), None)
+    return (*messages_after(queryset, after_id, limit), POLL_AFTER)
+
+
+def serialize_message(message, viewer):
+    return {
+        'id': message.id,
+        'sender_id': message.sender_id,
+        'sender': message.sender.username,
+        'sender_name': message.sender.get_full_name() or message.sender.username,
+        'content': message.content or '',
+        **attachment_payload(message),
+        'is_mine': message.sender_id == viewer.id,
+        'is_read': getattr(message, 'is_read', None),
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def sync_payload(messages, viewer, after_id, has_more, poll_after=None):
+    payload = {
+        'messages': [serialize_message(message, viewer) for message in messages],
+        'cursor': messages[-1].id if messages else after_id,
+        'has_more': has_more,
+    }
+    if poll_after is not None:
+        payload['poll_after'] = poll_after
+    return payload
+
+
+def history_payload(messages, viewer, has_more):
+    return {
+        'messages': [serialize_message(message, viewer) for message in messages],
+        'before': messages[0].id if messages else None,
+        'has_more': has_more,
+    }
@@ -0,0 +1,44 @@
+# hotel/templatetags/hotel_images.py
+from django import template
+
+from hotel.images import CONTENT_TYPES, RENDITION_FORMATS
+
+register = template.Library()
+
+DEFAULT_SIZES = '(max-width: 640px) 100vw, 640px'
+
+
+@register.filter(name='srcset')
+def srcset(post, image_format='jpeg'):
+    """
+    "url 320w, url 640w, ..." for one rendition format of a post image.
+    Empty string until the renditions exist.
+    """
+    return ', '.join(f'{url} {width}w' for url, width in post.image_sources().get(image_format, []))
+
+
+@register.inclusion_tag('hotel/post_picture.html')
+def post_picture(post, sizes=DEFAULT_SIZES, css_class='post-image'):
+    """
+    <picture> for a post image: AVIF/WebP sources with a JPEG fallback, the
+    original dimensions for layout, and the original file while renditions
+    are still being generated.
+    """
+    image_sources = post.image_sources()
+    sources = [
+        {
+            'type': CONTENT_TYPES[key],
+            'srcset': ', '.join(f'{url} {width}w' for url, width in image_sources[key]),
+        }
+        for key, _, _ in RENDITION_FORMATS
+        if key != 'jpeg' and key in image_sources
+    ]
+    fallback = image_sources.get('jpeg') or []
+    return {
+        'post': post,
+        'sources': sources,
+        'fallback_src': fallback[-1][0] if fallback else post.image.url,
+        'fallback_srcset': ', '.join(f'{url} {width}w' for url, width in fallback),
+        'sizes': sizes,
+        'css_class': css_class,
+    }
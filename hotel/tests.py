@@ -1,3 +1,814 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from hotel import views
+from hotel.engagement import reconcile_counts
+from hotel.feed import build_feed_page, feed_queryset
+from hotel.follows import get_follower_counts, get_following_ids
+from hotel.images import process_post_image
+from hotel.inbox import conversations_for, rebuild_conversations, unread_total
+from hotel import sync as message_sync
+from hotel.timelines import read_timeline, trim_timeline
+from myuganda.realtime import CLOSE_FORBIDDEN, check_deployment, websocket_application
+from social.models import SecureMessage
+from hotel.templatetags.hotel_images import post_picture, srcset
+from PIL import Image
+from hotel.models import (
+    Comment, Community, CommunityMessage, Connection, Conversation, Like, Message, Post, TimelineEntry,
+)
+
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TranslateSmartSegmentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_split_and_join_round_trip(self):
+        text = "Hello there. How are you?\n\nSee you soon!"
+        segments, separators = views._split_segments(text)
+        self.assertEqual(segments, ['Hello there.', 'How are you?', 'See you soon!'])
+        self.assertEqual(views._join_segments(segments, separators), text)
+
+    @patch('hotel.views._translate_via_services')
+    def test_long_sentences_are_split_below_the_provider_limit(self, mock_translate):
+        mock_translate.side_effect = lambda text, target, source: text.upper()
+        text = ' '.join(['word'] * 300) + ' ' + 'x' * 1000
+
+        segments, separators = views._split_segments(text)
+        self.assertTrue(all(len(segment) <= views.TRANSLATION_BATCH_MAX_CHARS for segment in segments))
+        self.assertEqual(views._join_segments(segments, separators), text)
+
+        self.assertEqual(views.translate_smart(text, 'fr', 'en'), text.upper())
+        for call in mock_translate.call_args_list:
+            self.assertLessEqual(len(call.args[0]), views.TRANSLATION_BATCH_MAX_CHARS)
+
+    @patch('hotel.views._translate_via_services')
+    def test_only_missing_segments_are_sent_upstream(self, mock_translate):
+        mock_translate.side_effect = lambda text, target, source: text.upper()
+
+        views.translate_smart("Shared footer line.", 'fr', 'en')
+        mock_translate.reset_mock()
+
+        result = views.translate_smart("Fresh news today.\nShared footer line.", 'fr', 'en')
+
+        self.assertEqual(result, "FRESH NEWS TODAY.\nSHARED FOOTER LINE.")
+        mock_translate.assert_called_once_with("Fresh news today.", 'fr', 'en')
+
+    @patch('hotel.views._translate_via_services')
+    def test_batch_falls_back_per_segment_when_lines_are_merged(self, mock_translate):
+        def fake(text, target, source):
+            if '\n' in text:
+                return text.replace('\n', ' ').upper()
+            return text.upper()
+
+        mock_translate.side_effect = fake
+        result = views.translate_smart("One. Two.", 'fr', 'en')
+
+        self.assertEqual(result, "ONE. TWO.")
+        self.assertEqual(mock_translate.call_count, 3)
+
+    @patch('hotel.views._translate_via_services', return_value=None)
+    def test_returns_original_when_every_tier_fails(self, mock_translate):
+        text = "First line.\nSecond line."
+        self.assertEqual(views.translate_smart(text, 'fr', 'en'), text)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TranslateStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='secret1234')
+        self.cached_post = Post.objects.create(author=self.user, content='Good morning.')
+        self.fresh_post = Post.objects.create(author=self.user, content='Market opens at noon.')
+        cache.set(views._translation_cache_key('Good morning.', 'en', 'fr'), 'Bonjour.')
+
+    @patch('hotel.views.translate_smart', return_value='Le marché ouvre à midi.')
+    def test_streams_cache_hits_before_provider_results(self, mock_translate):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('hotel:translate_stream'),
+            data=json.dumps({
+                'post_ids': [self.fresh_post.id, self.cached_post.id],
+                'target_language': 'fr',
+            }),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[0], {'post_id': self.cached_post.id, 'translated': 'Bonjour.', 'cached': True})
+        self.assertEqual(lines[1]['post_id'], self.fresh_post.id)
+        self.assertEqual(lines[1]['translated'], 'Le marché ouvre à midi.')
+        self.assertTrue(lines[-1]['done'])
+        mock_translate.assert_called_once_with('Market opens at noon.', 'fr', 'en')
+
+
+class FeedEngineTests(TestCase):
+    def setUp(self):
+        self.member = User.objects.create_user(username='member', password='secret1234')
+        self.partner = User.objects.create_user(
+            username='partner', password='secret1234', user_type='investor', is_approved=True,
+        )
+
+    def test_keyset_pages_cover_every_post_once(self):
+        for i in range(25):
+            Post.objects.create(author=self.member, content=f'post {i}')
+
+        first_page, cursor = build_feed_page(page_size=10)
+        second_page, cursor = build_feed_page(cursor=cursor, page_size=10)
+        third_page, cursor = build_feed_page(cursor=cursor, page_size=10)
+
+        ids = [post.id for post in first_page + second_page + third_page]
+        self.assertEqual(len(ids), 25)
+        self.assertEqual(len(set(ids)), 25)
+        self.assertIsNone(cursor)
+
+    def test_global_posts_lead_the_first_page_only(self):
+        pinned = Post.objects.create(author=self.partner, content='pinned')
+        for i in range(5):
+            Post.objects.create(author=self.member, content=f'post {i}')
+
+        first_page, cursor = build_feed_page(page_size=3)
+        second_page, _ = build_feed_page(cursor=cursor, page_size=3)
+
+        self.assertEqual(first_page[0], pinned)
+        self.assertNotIn(pinned, second_page)
+
+    def test_tampered_cursor_restarts_from_first_page(self):
+        Post.objects.create(author=self.member, content='only post')
+        posts, cursor = build_feed_page(cursor='not-a-real-cursor')
+        self.assertEqual(len(posts), 1)
+        self.assertIsNone(cursor)
+
+    def test_social_feed_ajax_returns_next_cursor(self):
+        for i in range(25):
+            Post.objects.create(author=self.member, content=f'post {i}')
+        self.client.force_login(self.member)
+
+        response = self.client.get(reverse('hotel:social_feed'), {'format': 'json'})
+        data = response.json()
+        self.assertTrue(data['has_next'])
+
+        response = self.client.get(reverse('hotel:social_feed'), {'format': 'json', 'cursor': data['next_cursor']})
+        data = response.json()
+        self.assertFalse(data['has_next'])
+        self.assertIsNone(data['next_cursor'])
+        self.assertEqual(data['html'].count('class="post-card"'), 5)
+
+    def test_social_feed_page_renders(self):
+        Post.objects.create(author=self.member, content='hello feed')
+        self.client.force_login(self.member)
+        response = self.client.get(reverse('hotel:social_feed'))
+        self.assertContains(response, 'hello feed')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class FollowLookupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', password='secret1234')
+        self.authors = [User.objects.create_user(username=f'author{i}', password='secret1234') for i in range(3)]
+
+    def test_follower_counts_are_grouped(self):
+        Connection.objects.create(sender=self.viewer, receiver=self.authors[0], status='accepted')
+        Connection.objects.create(sender=self.authors[1], receiver=self.authors[0], status='accepted')
+        Connection.objects.create(sender=self.authors[2], receiver=self.authors[1], status='pending')
+
+        with self.assertNumQueries(1):
+            counts = get_follower_counts(author.id for author in self.authors)
+
+        self.assertEqual(counts, {self.authors[0].id: 2, self.authors[1].id: 0, self.authors[2].id: 0})
+
+    def test_following_set_is_cached_and_invalidated_on_follow(self):
+        self.assertEqual(get_following_ids(self.viewer.id), set())
+        with self.assertNumQueries(0):
+            get_following_ids(self.viewer.id)
+
+        self.client.force_login(self.viewer)
+        self.client.get(reverse('hotel:follow_user', args=[self.authors[0].id]))
+        self.assertEqual(get_following_ids(self.viewer.id), {self.authors[0].id})
+
+        self.client.get(reverse('hotel:unfollow_user', args=[self.authors[0].id]))
+        self.assertEqual(get_following_ids(self.viewer.id), set())
+
+
+class FeedAnnotationTests(TestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='secret1234')
+        self.author = User.objects.create_user(username='author', password='secret1234')
+        self.post = Post.objects.create(author=self.author, content='annotated')
+        Like.objects.create(post=self.post, user=self.viewer)
+        Like.objects.create(post=self.post, user=self.author)
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.author, content=f'comment {i}')
+
+    def test_counts_like_state_and_latest_comments(self):
+        post = feed_queryset(self.viewer).get(pk=self.post.pk)
+
+        self.assertEqual(post.like_count, 2)
+        self.assertEqual(post.comment_count, 5)
+        self.assertTrue(post.liked_by_me)
+        self.assertEqual(
+            [comment.content for comment in post.latest_comments],
+            ['comment 2', 'comment 3', 'comment 4'],
+        )
+
+    def test_page_query_count_does_not_grow_with_engagement(self):
+        # global ids, timeline range + post fallback, hydrate, latest comments, renditions, partner stream
+        with self.assertNumQueries(7):
+            posts, _ = build_feed_page(base_queryset=feed_queryset(self.viewer))
+            [comment.author.username for post in posts for comment in post.latest_comments]
+
+
+class EngagementCounterTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='secret1234')
+        self.fan = User.objects.create_user(username='fan', password='secret1234')
+        self.post = Post.objects.create(author=self.author, content='counted')
+        self.client.force_login(self.fan)
+
+    def test_views_keep_post_and_author_counters_in_step(self):
+        response = self.client.post(reverse('hotel:like_post', args=[self.post.id]))
+        self.assertEqual(response.json()['likes_count'], 1)
+        self.client.post(reverse('hotel:add_comment', args=[self.post.id]), {'content': 'nice'})
+        self.client.post(reverse('hotel:share_post', args=[self.post.id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count, self.post.share_count), (1, 1, 1))
+        self.assertEqual(self.author.posts_count, 1)
+        self.assertEqual(self.author.likes_received_count, 1)
+        self.assertEqual(self.author.comments_received_count, 1)
+        self.assertEqual(self.author.shares_received_count, 1)
+
+        response = self.client.post(reverse('hotel:like_post', args=[self.post.id]))
+        self.assertEqual(response.json()['likes_count'], 0)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.likes_received_count, 0)
+
+    def test_deleting_a_post_rolls_back_author_totals(self):
+        Like.objects.create(post=self.post, user=self.fan)
+        Comment.objects.create(post=self.post, author=self.fan, content='hi')
+        self.post.delete()
+
+        self.author.refresh_from_db()
+        self.assertEqual(
+            (self.author.posts_count, self.author.likes_received_count, self.author.comments_received_count),
+            (0, 0, 0),
+        )
+
+    def test_reconcile_repairs_drifted_counters(self):
+        Like.objects.create(post=self.post, user=self.fan)
+        Post.objects.filter(id=self.post.id).update(like_count=40, comment_count=3)
+        User.objects.filter(id=self.author.id).update(likes_received_count=0, posts_count=9)
+
+        self.assertEqual(reconcile_counts(), (1, 1))
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+        self.assertEqual((self.author.posts_count, self.author.likes_received_count), (1, 1))
+        self.assertEqual(reconcile_counts(), (0, 0))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PostCardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='secret1234')
+        self.fan = User.objects.create_user(username='fan', first_name='Fiona', password='secret1234')
+        self.other = User.objects.create_user(username='other', password='secret1234')
+        self.post = Post.objects.create(author=self.author, content='original text')
+        Like.objects.create(post=self.post, user=self.fan)
+        Connection.objects.create(sender=self.fan, receiver=self.author, status='accepted')
+
+    def _page(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('hotel:social_feed'), {'format': 'json'}).json()
+
+    def test_cards_are_shared_and_viewer_state_travels_in_overlay(self):
+        fan_page = self._page(self.fan)
+        other_page = self._page(self.other)
+
+        self.assertEqual(fan_page['html'], other_page['html'])
+        post_key = str(self.post.id)
+        author_key = str(self.author.id)
+        self.assertEqual(fan_page['viewer']['posts'][post_key], {'liked': True, 'likes': 1})
+        self.assertEqual(other_page['viewer']['posts'][post_key], {'liked': False, 'likes': 1})
+        self.assertEqual(fan_page['viewer']['authors'][author_key], {'following': True, 'followers': 1})
+        self.assertFalse(other_page['viewer']['authors'][author_key]['following'])
+        self.assertEqual(fan_page['viewer']['initial'], 'F')
+
+    def test_card_is_rerendered_when_its_version_changes(self):
+        self._page(self.fan)
+        # A raw update bypasses the version, so the cached card is served
+        Post.objects.filter(id=self.post.id).update(content='silently changed')
+        self.assertIn('original text', self._page(self.other)['html'])
+
+        Comment.objects.create(post=self.post, author=self.other, content='first!')
+        html = self._page(self.other)['html']
+        self.assertIn('silently changed', html)
+        self.assertIn('first!', html)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='secret1234')
+        self.friend = User.objects.create_user(username='friend', password='secret1234')
+        self.stranger = User.objects.create_user(username='stranger', password='secret1234')
+        Connection.objects.create(sender=self.reader, receiver=self.friend, status='accepted')
+
+    def test_new_posts_fan_out_to_followers_and_global(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.friend, content='hello followers')
+            Post.objects.create(author=self.stranger, content='not followed')
+            # Nothing is written until the post's transaction commits
+            self.assertEqual(read_timeline(None), [])
+
+        self.assertEqual(read_timeline(self.reader.id), [post.id])
+        self.assertEqual(len(read_timeline(None)), 2)
+
+    def test_home_page_reads_timeline_and_unfollow_prunes_it(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                Post.objects.create(author=self.friend, content=f'friend {i}')
+            Post.objects.create(author=self.stranger, content='not followed')
+
+        posts, cursor = build_feed_page(feed_type='following', user=self.reader, page_size=2)
+        more, cursor = build_feed_page(feed_type='following', user=self.reader, cursor=cursor, page_size=2)
+        self.assertEqual([p.content for p in posts + more], ['friend 2', 'friend 1', 'friend 0'])
+        self.assertIsNone(cursor)
+
+        Connection.objects.filter(sender=self.reader, receiver=self.friend).delete()
+        self.assertEqual(read_timeline(self.reader.id), [])
+
+    def test_capped_timeline_falls_back_to_posts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            posts = [Post.objects.create(author=self.friend, content=f'friend {i}') for i in range(4)]
+        trim_timeline(self.reader.id, keep=2)
+
+        fallback = Post.objects.filter(author=self.friend)
+        ids = read_timeline(self.reader.id, limit=10, fallback_queryset=fallback)
+        self.assertEqual(ids, [post.id for post in reversed(posts)])
+
+
+    @patch('hotel.timelines.TIMELINE_TRIM_EVERY', 1)
+    @patch('hotel.timelines.TIMELINE_MAX_ENTRIES', 3)
+    def test_fan_out_trims_the_global_and_home_timelines(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            posts = [Post.objects.create(author=self.friend, content=f'friend {i}') for i in range(5)]
+
+        newest = [post.id for post in reversed(posts)][:3]
+        self.assertEqual(read_timeline(None, limit=10), newest)
+        self.assertEqual(read_timeline(self.reader.id, limit=10), newest)
+
+    def test_follow_backfill_stays_above_the_trimmed_boundary(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            older = Post.objects.create(author=self.stranger, content='older')
+            posts = [Post.objects.create(author=self.friend, content=f'friend {i}') for i in range(4)]
+        trim_timeline(self.reader.id, keep=2)
+
+        connection = Connection.objects.create(sender=self.reader, receiver=self.stranger)
+        self.assertNotIn(older.id, read_timeline(self.reader.id))
+        connection.status = 'accepted'
+        connection.save()
+
+        fallback = Post.objects.filter(author__in=[self.friend, self.stranger])
+        ids = read_timeline(self.reader.id, limit=10, fallback_queryset=fallback)
+        self.assertEqual(ids, [post.id for post in reversed(posts)] + [older.id])
+        self.assertNotIn(older.id, read_timeline(self.reader.id))
+
+    def test_backfill_only_runs_when_a_follow_is_accepted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.stranger, content='later followed')
+        connection = Connection.objects.create(sender=self.reader, receiver=self.stranger, status='accepted')
+        self.assertEqual(read_timeline(self.reader.id), [post.id])
+
+        TimelineEntry.objects.filter(owner=self.reader).delete()
+        connection.save()
+        self.assertEqual(read_timeline(self.reader.id), [])
+
+
+class ConversationSummaryTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='secret1234')
+        self.bob = User.objects.create_user(username='bob', password='secret1234')
+        self.carol = User.objects.create_user(username='carol', password='secret1234')
+
+    def test_messages_update_summary_and_unread_counts(self):
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='hi alice')
+        Message.objects.create(sender=self.alice, receiver=self.bob, content='hi bob')
+        last = Message.objects.create(sender=self.bob, receiver=self.alice, content='are you there?')
+        Message.objects.create(sender=self.carol, receiver=self.alice, content='hello from carol')
+
+        self.assertEqual(Conversation.objects.count(), 2)
+        conversation = Conversation.objects.get(user_a=self.alice, user_b=self.bob)
+        self.assertEqual(conversation.last_message, last)
+        self.assertEqual(conversation.last_message_preview, 'are you there?')
+        self.assertEqual(conversation.unread_for(self.alice), 2)
+        self.assertEqual(conversation.unread_for(self.bob), 1)
+        self.assertEqual(unread_total(self.alice), 3)
+        with CaptureQueriesContext(connection) as queries:
+            unread_total(self.carol)
+        self.assertIn('WHERE', queries[0]['sql'])
+
+        with self.assertNumQueries(1):
+            conversations = conversations_for(self.alice)
+            self.assertEqual([c.partner for c in conversations], [self.carol, self.bob])
+
+    def test_reading_a_thread_resets_unread(self):
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='one')
+        single = Message.objects.create(sender=self.carol, receiver=self.alice, content='two')
+        self.client.login(username='alice', password='secret1234')
+
+        self.client.get(reverse('hotel:conversation', args=[self.bob.id]))
+        self.client.post(reverse('hotel:mark_message_read', args=[single.id]))
+        self.client.post(reverse('hotel:mark_message_read', args=[single.id]))
+
+        self.assertEqual(unread_total(self.alice), 0)
+        response = self.client.get(reverse('hotel:inbox_messages'))
+        self.assertContains(response, 'two')
+        self.assertEqual(len(response.context['conversations']), 2)
+
+    def test_rebuild_matches_incremental_summaries(self):
+        Message.objects.create(sender=self.bob, receiver=self.alice, content='one')
+        Message.objects.create(sender=self.alice, receiver=self.bob, content='two', is_read=True)
+        expected = list(Conversation.objects.values_list('user_a', 'user_b', 'last_message', 'unread_a', 'unread_b'))
+
+        self.assertEqual(rebuild_conversations(), 1)
+        self.assertEqual(
+            list(Conversation.objects.values_list('user_a', 'user_b', 'last_message', 'unread_a', 'unread_b')),
+            expected,
+        )
+
+
+class MessageSyncTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='secret1234')
+        self.bob = User.objects.create_user(username='bob', password='secret1234')
+        self.client.login(username='alice', password='secret1234')
+
+    def test_conversation_renders_latest_page_and_pages_backwards(self):
+        sent = [
+            Message.objects.create(sender=self.bob, receiver=self.alice, content=f'message {i}')
+            for i in range(message_sync.THREAD_PAGE_SIZE + 5)
+        ]
+        response = self.client.get(reverse('hotel:conversation', args=[self.bob.id]))
+        self.assertEqual(len(response.context['messages']), message_sync.THREAD_PAGE_SIZE)
+        self.assertTrue(response.context['has_more'])
+        self.assertEqual(response.context['sync_cursor'], sent[-1].id)
+
+        oldest_rendered = response.context['messages'][0].id
+        history = self.client.get(
+            reverse('hotel:conversation_history', args=[self.bob.id]), {'before': oldest_rendered}
+        ).json()
+        self.assertEqual([m['content'] for m in history['messages']], [f'message {i}' for i in range(5)])
+        self.assertFalse(history['has_more'])
+
+    def test_sync_returns_only_the_delta_and_marks_it_read(self):
+        first = Message.objects.create(sender=self.bob, receiver=self.alice, content='old')
+        latest = Message.objects.create(sender=self.bob, receiver=self.alice, content='new')
+
+        data = self.client.get(
+            reverse('hotel:conversation_sync', args=[self.bob.id]), {'after': first.id}
+        ).json()
+        self.assertEqual([m['content'] for m in data['messages']], ['new'])
+        self.assertEqual(data['cursor'], latest.id)
+        self.assertEqual(Message.objects.filter(receiver=self.alice, is_read=False).count(), 0)
+
+        empty = self.client.get(
+            reverse('hotel:conversation_sync', args=[self.bob.id]), {'after': data['cursor']}
+        ).json()
+        self.assertEqual(empty, {'messages': [], 'cursor': data['cursor'], 'has_more': False})
+
+    def test_long_poll_times_out_with_empty_delta(self):
+        thread = message_sync.direct_thread(self.alice, self.bob)
+        with patch.object(message_sync, 'LONG_POLL_INTERVAL', 0.01):
+            self.assertEqual(message_sync.wait_for_messages(thread, 0, timeout=0.05), ([], False))
+
+    def test_wait_is_only_held_while_a_waiter_slot_is_free(self):
+        url = reverse('hotel:conversation_sync', args=[self.bob.id])
+        with patch.object(message_sync, 'wait_for_messages') as wait:
+            data = self.client.get(url, {'after': 0, 'wait': '1'}).json()
+            wait.assert_not_called()
+            self.assertEqual(data['poll_after'], message_sync.POLL_AFTER)
+
+            wait.return_value = ([], False)
+            with override_settings(MESSAGE_LONG_POLL_MAX_WAITERS=1):
+                data = self.client.get(url, {'after': 0, 'wait': '1'}).json()
+                self.assertNotIn('poll_after', data)
+                with patch.object(message_sync, '_waiters', 1):
+                    self.assertIn('poll_after', self.client.get(url, {'after': 0, 'wait': '1'}).json())
+            self.assertEqual(wait.call_count, 1)
+
+    def test_community_sync_requires_membership(self):
+        community = Community.objects.create(name='Makers', creator=self.bob)
+        community.members.add(self.bob)
+        message = CommunityMessage.objects.create(community=community, sender=self.bob, content='welcome')
+
+        url = reverse('hotel:community_sync', args=[community.id])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        community.members.add(self.alice)
+        data = self.client.get(url, {'after': 0}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [message.id])
+        self.assertFalse(data['messages'][0]['is_mine'])
+
+
+class RealtimeMessagingTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='secret1234')
+        self.bob = User.objects.create_user(username='bob', password='secret1234')
+
+    async def _connect(self, user, path):
+        communicator = ApplicationCommunicator(websocket_application, {
+            'type': 'websocket', 'path': path, 'headers': [], 'user': user,
+        })
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(timeout=5)
+
+    async def _frame(self, communicator):
+        return json.loads((await communicator.receive_output(timeout=5))['text'])
+
+    async def _disconnect(self, *communicators):
+        for communicator in communicators:
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(timeout=5)
+
+    async def test_direct_messages_typing_and_read_receipts(self):
+        alice, accepted = await self._connect(self.alice, f'/ws/hotel/conversation/{self.bob.id}/')
+        self.assertEqual(accepted['type'], 'websocket.accept')
+        bob, _ = await self._connect(self.bob, f'/ws/hotel/conversation/{self.alice.id}/')
+
+        await alice.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'message', 'content': 'hi bob'})})
+        for communicator in (alice, bob):
+            frame = await self._frame(communicator)
+            self.assertEqual(frame['type'], 'message')
+            self.assertEqual(frame['message']['content'], 'hi bob')
+        message_id = frame['message']['id']
+
+        await bob.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'typing'})})
+        self.assertEqual((await self._frame(alice))['username'], 'bob')
+        await self._frame(bob)
+
+        await bob.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'read', 'up_to': message_id})})
+        receipt = await self._frame(alice)
+        self.assertEqual((receipt['type'], receipt['up_to']), ('read', message_id))
+        self.assertTrue(await sync_to_async(lambda: Message.objects.get(id=message_id).is_read)())
+        self.assertEqual(await sync_to_async(unread_total)(self.bob), 0)
+
+        await self._disconnect(alice, bob)
+
+    async def test_secure_messages_created_elsewhere_are_pushed(self):
+        alice, _ = await self._connect(self.alice, f'/ws/social/chat/{self.bob.id}/')
+        await sync_to_async(SecureMessage.objects.create)(sender=self.bob, recipient=self.alice, content='offer')
+        frame = await self._frame(alice)
+        self.assertEqual((frame['message']['content'], frame['message']['sender_id']), ('offer', self.bob.id))
+        await self._disconnect(alice)
+
+    async def test_foreign_origins_are_rejected(self):
+        path = f'/ws/hotel/conversation/{self.bob.id}/'
+        for origin, expected in (('https://evil.example', 'websocket.close'), ('http://testserver', 'websocket.accept')):
+            communicator = ApplicationCommunicator(websocket_application, {
+                'type': 'websocket', 'path': path, 'user': self.alice,
+                'headers': [(b'host', b'testserver'), (b'origin', origin.encode())],
+            })
+            await communicator.send_input({'type': 'websocket.connect'})
+            self.assertEqual((await communicator.receive_output(timeout=5))['type'], expected)
+            if expected == 'websocket.accept':
+                await self._disconnect(communicator)
+
+    def test_unsubscribed_threads_skip_the_event_and_multi_worker_needs_a_broker(self):
+        with patch('myuganda.realtime.message_event') as build_event:
+            Message.objects.create(sender=self.alice, receiver=self.bob, content='nobody listening')
+        build_event.assert_not_called()
+
+        check_deployment(1)
+        with self.assertRaises(ImproperlyConfigured):
+            check_deployment(2)
+        # A websocket-only process never sees the messages the WSGI workers save
+        with self.assertRaises(ImproperlyConfigured):
+            check_deployment(1, separate_http=True)
+        with override_settings(REALTIME_CHANNEL_LAYER='myuganda.realtime.RedisChannelLayer'):
+            check_deployment(2, separate_http=True)
+
+    async def test_realtime_process_leaves_http_to_the_wsgi_server(self):
+        from myuganda.asgi import realtime_application
+
+        communicator = ApplicationCommunicator(realtime_application, {
+            'type': 'http', 'method': 'GET', 'path': '/hotel/', 'headers': [],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        start = await communicator.receive_output(1)
+        self.assertEqual(start['status'], 404)
+
+    async def test_community_requires_membership(self):
+        community = await sync_to_async(Community.objects.create)(name='Makers', creator=self.bob)
+        _, closed = await self._connect(self.alice, f'/ws/hotel/community/{community.id}/')
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': CLOSE_FORBIDDEN})
+
+
+class MessageAttachmentTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.alice = User.objects.create_user(username='alice', password='secret1234')
+        self.bob = User.objects.create_user(username='bob', password='secret1234')
+        self.eve = User.objects.create_user(username='eve', password='secret1234')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _image_upload(self, size=(1600, 1200)):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, format='PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def test_image_upload_records_metadata_and_thumbnail(self):
+        message = Message.objects.create(sender=self.alice, receiver=self.bob, attachment=self._image_upload())
+
+        self.assertEqual(message.attachment_kind, 'image')
+        self.assertEqual((message.attachment_width, message.attachment_height), (1600, 1200))
+        self.assertEqual(message.attachment_size, message.attachment.size)
+        with Image.open(message.attachment_thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.format, 'JPEG')
+            self.assertLessEqual(max(thumbnail.size), 480)
+
+        self.client.login(username='bob', password='secret1234')
+        response = self.client.get(message.get_attachment_thumbnail_url())
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        with open(message.attachment_thumbnail.path, 'rb') as thumbnail_file:
+            self.assertEqual(b''.join(response.streaming_content), thumbnail_file.read())
+
+    def test_original_is_served_with_range_requests_to_participants_only(self):
+        document = SimpleUploadedFile('notes.txt', b'0123456789' * 10, content_type='text/plain')
+        message = Message.objects.create(sender=self.alice, receiver=self.bob, attachment=document)
+        self.assertEqual(message.attachment_kind, 'file')
+        self.assertIsNone(message.get_attachment_thumbnail_url())
+
+        self.client.login(username='bob', password='secret1234')
+        partial = self.client.get(message.get_attachment_url(), HTTP_RANGE='bytes=10-19')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(b''.join(partial.streaming_content), b'0123456789')
+
+        suffix = self.client.get(message.get_attachment_url(), HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(suffix.streaming_content), b'56789')
+        self.assertEqual(self.client.get(message.get_attachment_url(), HTTP_RANGE='bytes=500-').status_code, 416)
+
+        self.client.login(username='eve', password='secret1234')
+        self.assertEqual(self.client.get(message.get_attachment_url()).status_code, 404)
+
+    def test_client_content_type_is_ignored_and_active_content_is_downloaded(self):
+        page = SimpleUploadedFile('x.html', b'<script>alert(document.cookie)</script>', content_type='image/png')
+        message = Message.objects.create(sender=self.alice, receiver=self.bob, attachment=page)
+        self.assertEqual(message.attachment_content_type, 'application/octet-stream')
+        self.assertEqual(message.attachment_kind, 'file')
+        # Rows recorded before sniffing are still served as downloads
+        Message.objects.filter(pk=message.pk).update(attachment_content_type='text/html')
+
+        self.client.login(username='bob', password='secret1234')
+        response = self.client.get(message.get_attachment_url())
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+
+        image = Message.objects.create(sender=self.alice, receiver=self.bob, attachment=self._image_upload((8, 8)))
+        self.assertEqual(image.attachment_content_type, 'image/png')
+        partial = self.client.get(image.get_attachment_url(), HTTP_RANGE='bytes=0-9')
+        self.assertEqual(partial['Content-Type'], 'image/png')
+        self.assertTrue(partial['Content-Disposition'].startswith('inline'))
+        self.assertEqual(partial['Content-Security-Policy'], 'sandbox')
+        download = self.client.get(image.get_attachment_url() + '?download=1', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(download.status_code, 206)
+        self.assertTrue(download['Content-Disposition'].startswith('attachment'))
+
+    def test_sync_payload_carries_preview_metadata(self):
+        message = Message.objects.create(sender=self.alice, receiver=self.bob, attachment=self._image_upload((64, 32)))
+        payload = message_sync.serialize_message(message, self.bob)
+        self.assertEqual(payload['attachment_kind'], 'image')
+        self.assertEqual(payload['attachment_thumbnail_url'], message.get_attachment_thumbnail_url())
+        self.assertEqual((payload['attachment_width'], payload['attachment_height']), (64, 32))
+
+
+@override_settings(POST_IMAGE_ASYNC=False)
+class PostImageRenditionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.author = User.objects.create_user(username='author', password='secret1234')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _upload(self, size):
+        image = Image.new('RGB', size, (10, 120, 200))
+        exif = Image.Exif()
+        exif[0x010F] = 'CameraMaker'
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', exif=exif)
+        return SimpleUploadedFile('holiday.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_new_image_post_gets_renditions_without_metadata(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.author, content='view', image=self._upload((800, 400)))
+
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (800, 400))
+        widths = sorted({r.width for r in post.renditions.all()})
+        self.assertEqual(widths, [320, 640, 800])
+        self.assertTrue({'webp', 'jpeg'} <= {r.format for r in post.renditions.all()})
+
+        jpeg = post.renditions.get(format='jpeg', width=320)
+        self.assertEqual(jpeg.height, 160)
+        with Image.open(jpeg.file.path) as rendition:
+            self.assertNotIn(0x010F, rendition.getexif())
+
+    def test_picture_tag_uses_srcsets_and_falls_back_to_original(self):
+        post = Post.objects.create(author=self.author, content='pending', image=self._upload((500, 500)))
+        context = post_picture(post)
+        self.assertEqual(context['sources'], [])
+        self.assertEqual(context['fallback_src'], post.image.url)
+
+        process_post_image(post.id, use_pool=False)
+        post = feed_queryset().get(id=post.id)
+        context = post_picture(post)
+        self.assertTrue(context['fallback_src'].endswith('_500w.jpeg'))
+        self.assertIn('image/webp', [source['type'] for source in context['sources']])
+        self.assertEqual(srcset(post, 'webp').count('w,') + 1, 2)
+
+    @patch('hotel.management.commands.process_post_images.process_post_image')
+    def test_command_picks_up_posts_left_pending_by_a_lost_worker(self, mock_process):
+        mock_process.side_effect = lambda post_id: process_post_image(post_id, use_pool=False)
+        # The on_commit callback never runs, as when the worker is recycled first
+        lost = Post.objects.create(author=self.author, content='lost', image=self._upload((400, 200)))
+        in_flight = Post.objects.create(author=self.author, content='queued', image=self._upload((400, 200)))
+        Post.objects.filter(id=lost.id).update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(Post.objects.get(id=in_flight.id).image_status, 'PENDING')
+
+        call_command('process_post_images', stdout=StringIO())
+        mock_process.assert_called_once_with(lost.id)
+        self.assertEqual(Post.objects.get(id=lost.id).image_status, 'READY')
+        self.assertEqual(Post.objects.get(id=in_flight.id).image_status, 'PENDING')
+
+
+class CommunityMembershipTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.joiner = User.objects.create_user(username='joiner', password='secret1234')
+        self.community = Community.objects.create(name='Hikers', creator=self.creator)
+        self.community.members.add(self.creator)
+
+    def _member_count(self):
+        self.community.refresh_from_db()
+        return self.community.member_count
+
+    def test_member_count_follows_both_sides_of_the_relation(self):
+        self.community.members.add(self.creator, self.joiner)
+        self.assertEqual(self._member_count(), 2)
+        self.joiner.communities.remove(self.community)
+        self.assertEqual(self._member_count(), 1)
+        self.joiner.communities.add(self.community)
+        self.assertEqual(self._member_count(), 2)
+        self.joiner.communities.clear()
+        self.assertEqual(self._member_count(), 1)
+        self.community.members.clear()
+        self.assertEqual(self._member_count(), 0)
+
+    def test_join_checks_membership_without_loading_members(self):
+        self.client.force_login(self.joiner)
+        self.assertFalse(self.community.is_member(self.joiner))
+        self.client.get(reverse('hotel:join_community', args=[self.community.invite_link]))
+        self.assertTrue(self.community.is_member(self.joiner))
+        self.assertEqual(self._member_count(), 2)
+
+        # Joining again is a no-op
+        self.client.get(reverse('hotel:join_community', args=[self.community.invite_link]))
+        self.assertEqual(self._member_count(), 2)
+
+        response = self.client.get(reverse('hotel:community_conversation', args=[self.community.id]))
+        self.assertContains(response, '2 members')
@@ -0,0 +1,149 @@
+"""
+Fan-out-on-write timelines for the hotel social feed.
+
+When a Post is created its id is pushed onto the global timeline and onto
+the home timeline of every accepted follower (TimelineEntry rows). The
+fan-out runs once the creating transaction commits, so the post's INSERT
+never holds its transaction open for it, and followers are read with an
+iterator and written in FANOUT_BATCH_SIZE bulk inserts. Reading
+a page is then one index range read on (owner, created_at, post) followed
+by an id__in hydrate of the posts.
+
+Every timeline, the global one included, is capped at TIMELINE_MAX_ENTRIES
+and trimmed as part of the fan-out: a post trims the timelines it lands on
+when (owner id + post id) % TIMELINE_TRIM_EVERY == 0, so each fan-out trims
+about 1/TIMELINE_TRIM_EVERY of its recipients and the global timeline
+(owner id 0 here) is trimmed on every TIMELINE_TRIM_EVERY-th post.
+`rebuild_timelines --trim` remains the nightly backstop. Anything older
+than a timeline's oldest entry is served from the Post table through the
+fallback queryset, so a timeline must always hold every post of its
+sources down to its oldest entry: backfill_follow never writes below it.
+"""
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Connection, Post, TimelineEntry
+
+TIMELINE_MAX_ENTRIES = 800
+TIMELINE_BACKFILL = 50
+FANOUT_BATCH_SIZE = 1000
+TIMELINE_TRIM_EVERY = 50
+
+
+def _entry(owner_id, post):
+    return TimelineEntry(owner_id=owner_id, post_id=post.id, author_id=post.author_id, created_at=post.created_at)
+
+
+def _due_for_trim(owner_id, post):
+    return ((owner_id or 0) + post.id) % TIMELINE_TRIM_EVERY == 0
+
+
+def fan_out_post(post, batch_size=FANOUT_BATCH_SIZE):
+    """Write the post onto the global timeline and its author's followers' timelines, trimming those due."""
+    TimelineEntry.objects.bulk_create([_entry(None, post), _entry(post.author_id, post)], ignore_conflicts=True)
+    due = [owner_id for owner_id in (None, post.author_id) if _due_for_trim(owner_id, post)]
+    followers = (
+        Connection.objects.filter(receiver_id=post.author_id, status='accepted')
+        .exclude(sender_id=post.author_id).values_list('sender_id', flat=True)
+    )
+    batch = []
+    for owner_id in followers.iterator(chunk_size=batch_size):
+        batch.append(_entry(owner_id, post))
+        if _due_for_trim(owner_id, post):
+            due.append(owner_id)
+        if len(batch) == batch_size:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    for owner_id in due:
+        trim_timeline(owner_id)
+
+
+def schedule_fan_out(post):
+    """Fan the post out once the transaction that created it commits."""
+    transaction.on_commit(lambda: fan_out_post(post))
+
+
+def backfill_follow(follower_id, author_id, limit=TIMELINE_BACKFILL):
+    """
+    Copy the author's most recent posts into a new follower's home timeline,
+    but never below its oldest entry: older posts are read through the
+    fallback, which only starts once the timeline runs out.
+    """
+    posts = Post.objects.filter(author_id=author_id).only('id', 'author_id', 'created_at')
+    oldest = (
+        TimelineEntry.objects.filter(owner_id=follower_id)
+        .order_by('created_at', 'post_id').values_list('created_at', 'post_id').first()
+    )
+    if oldest is not None:
+        created_at, post_id = oldest
+        posts = posts.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=post_id))
+    posts = posts.order_by('-created_at', '-id')[:limit]
+    TimelineEntry.objects.bulk_create([_entry(follower_id, post) for post in posts], ignore_conflicts=True)
+
+
+def remove_author(follower_id, author_id):
+    TimelineEntry.objects.filter(owner_id=follower_id, author_id=author_id).delete()
+
+
+def trim_timeline(owner_id, keep=None):
+    """Drop entries beyond the newest `keep` for one timeline (None: global). Returns rows deleted."""
+    if keep is None:
+        keep = TIMELINE_MAX_ENTRIES
+    entries = TimelineEntry.objects.filter(owner_id=owner_id).order_by('-created_at', '-post_id')
+    boundary = entries.values_list('created_at', 'post_id')[keep:keep + 1].first()
+    if boundary is None:
+        return 0
+    created_at, post_id = boundary
+    deleted, _ = entries.filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lte=post_id)
+    ).delete()
+    return deleted
+
+
+def rebuild_home_timeline(owner_id, limit=TIMELINE_MAX_ENTRIES):
+    """Recompute a home timeline from scratch (own posts plus followed authors)."""
+    authors = follower_source_ids(owner_id)
+    TimelineEntry.objects.filter(owner_id=owner_id).delete()
+    posts = Post.objects.filter(author_id__in=authors).only('id', 'author_id', 'created_at').order_by('-created_at', '-id')[:limit]
+    TimelineEntry.objects.bulk_create([_entry(owner_id, post) for post in posts], ignore_conflicts=True)
+
+
+def follower_source_ids(owner_id):
+    """Authors whose posts belong on owner_id's home timeline."""
+    followed = Connection.objects.filter(sender_id=owner_id, status='accepted').values_list('receiver_id', flat=True)
+    return [owner_id] + list(followed)
+
+
+def read_timeline(owner_id, position=None, limit=20, fallback_queryset=None):
+    """
+    Return up to `limit` post ids from a timeline, newest first, strictly after
+    `position` ([created_at iso, post_id]). When the capped timeline runs out,
+    the remaining ids are read from fallback_queryset with the same keyset.
+    """
+    entries = TimelineEntry.objects.filter(owner_id=owner_id)
+    if position:
+        created_at = datetime.fromisoformat(position[0])
+        entries = entries.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lt=position[1])
+        )
+    rows = list(entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit])
+
+    if len(rows) < limit and fallback_queryset is not None:
+        last = [rows[-1][0].isoformat(), rows[-1][1]] if rows else position
+        older = fallback_queryset
+        if last:
+            created_at = datetime.fromisoformat(last[0])
+            older = older.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last[1]))
+        rows += list(older.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit - len(rows)])
+
+    return [post_id for _, post_id in rows]
+
+
+def hydrate(post_ids, queryset):
+    """Fetch posts for ids with one id__in query, preserving timeline order."""
+    posts = {post.id: post for post in queryset.filter(id__in=post_ids)}
+    return [posts[pk] for pk in post_ids if pk in posts]
@@ -10,6 +10,7 @@ urlpatterns = [
     path('like-post/<int:post_id>/', views.like_post, name='like_post'),
     path('add-comment/<int:post_id>/', views.add_comment, name='add_comment'),
     path('translate/', views.translate_text, name='translate_text'),
+    path('translate/stream/', views.translate_stream, name='translate_stream'),
     path('send_message/<int:user_id>/', views.send_message, name='send_message'),
     path('inbox/', views.inbox, name='inbox'),
     path('inbox/messages/', views.inbox_messages, name='inbox_messages'),
@@ -17,9 +18,15 @@ urlpatterns = [
     path('inbox/notifications/', views.inbox_notifications, name='inbox_notifications'),
     path('mark-message-read/<int:message_id>/', views.mark_message_read, name='mark_message_read'),
     path('conversation/<int:user_id>/', views.conversation, name='conversation'),
+    path('conversation/<int:user_id>/sync/', views.conversation_sync, name='conversation_sync'),
+    path('conversation/<int:user_id>/history/', views.conversation_history, name='conversation_history'),
+    path('attachments/message/<int:message_id>/', views.message_attachment, name='message_attachment'),
+    path('attachments/community/<int:message_id>/', views.community_attachment, name='community_attachment'),
     path('create_community/', views.create_community, name='create_community'),
     path('community/join/<str:invite_link>/', views.join_community, name='join_community'),
     path('community/<int:community_id>/', views.community_conversation, name='community_conversation'),
+    path('community/<int:community_id>/sync/', views.community_sync, name='community_sync'),
+    path('community/<int:community_id>/history/', views.community_history, name='community_history'),
     path('follow/<int:user_id>/', views.follow_user, name='follow_user'),
     path('unfollow/<int:user_id>/', views.unfollow_user, name='unfollow_user'),
     path('share-post/<int:post_id>/', views.share_post, name='share_post'),
@@ -1,20 +1,28 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.db.models import Q
 from django.core.cache import cache
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.paginator import Paginator
 from urllib.parse import quote
 from .models import Post, Comment, Like, Connection, Message, Share, Community, CommunityMessage
 from .forms import PostForm
+from .feed import POST_CARD_CACHE_TIMEOUT, build_feed_page, feed_queryset, viewer_overlay
+from .follows import get_following_ids, get_follower_counts
+from . import inbox as inbox_summary
+from . import sync as message_sync
+from .attachments import attachment_response
+from .engagement import engagement_counts
 from users.models import CustomUser
 from django.conf import settings
 from django.template.loader import render_to_string
 import requests
 import json
 import os
+import re
 import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 INVESTOR_CREATE_PASSCODE = getattr(settings, 'INVESTOR_CREATE_PASSCODE', '23882')
 
@@ -96,11 +104,11 @@ def _google_translate(text, source_lang, target_lang):
         translated_segments = []
         for item in data[0]:
             if isinstance(item, list) and item and isinstance(item[0], str):
-                segment = item[0].strip()
-                if segment:
-                    translated_segments.append(segment)
+                translated_segments.append(item[0])
 
-        translated = ' '.join(translated_segments).strip()
+        # Google keeps the source whitespace on each sentence, so joining
+        # without a separator preserves line breaks for batched segments.
+        translated = ''.join(translated_segments).strip()
         if translated and isinstance(translated, str) and len(translated) > 2 and translated != text and not _is_suspicious_text(translated, len(text)):
             return translated
     except Exception as e:
@@ -139,65 +147,15 @@ def social_feed(request):
     if isinstance(target_lang, str):
         target_lang = target_lang.lower()
     
-    # 2. Get Global Posts from approved investors that should appear for every user
-    global_posts_query = Post.objects.filter(
-        author__user_type='investor',
-        author__is_approved=True
-    ).select_related('author').prefetch_related('comments', 'likes').order_by('-created_at')[:10]
-    global_posts = list(global_posts_query)
-    global_post_ids = [post.id for post in global_posts]
-
-    # 3. Get ALL ACTIVE POSTS (visible to all logged-in users)
-    # Show posts from all users (not just connections) so everyone can see the feed
-    regular_posts_query = Post.objects.exclude(id__in=global_post_ids).select_related('author').prefetch_related('comments', 'likes').order_by('-created_at')
-    partner_posts_query = Post.objects.filter(author__user_type='investor', author__is_approved=True)\
-        .exclude(id__in=global_post_ids).select_related('author').prefetch_related('comments', 'likes').order_by('-created_at')
-
-    # 4. Apply Filtering Logic to BOTH querysets
-    if feed_type == 'text':
-        # Posts with no images and no location
-        filter_q = Q(image__isnull=True) & (Q(location__isnull=True) | Q(location=''))
-        regular_posts_query = regular_posts_query.filter(filter_q)
-        partner_posts_query = partner_posts_query.filter(filter_q)
-        
-    elif feed_type == 'images':
-        # Posts that HAVE images
-        regular_posts_query = regular_posts_query.exclude(image__isnull=True)
-        partner_posts_query = partner_posts_query.exclude(image__isnull=True)
-        
-    elif feed_type == 'location':
-        # Posts that HAVE location data
-        regular_posts_query = regular_posts_query.exclude(location__isnull=True).exclude(location='')
-        partner_posts_query = partner_posts_query.exclude(location__isnull=True).exclude(location='')
-
-    # 4. Interleave Logic (Invisible to user)
-    regular_posts = list(regular_posts_query)
-    partner_posts = list(partner_posts_query)
-    
-    final_feed = []
-    p_idx = 0  # Counter for partner posts
-    
-    for i, post in enumerate(regular_posts):
-        final_feed.append(post)
-        # Every 3 posts, inject 1 partner post if available
-        if (i + 1) % 3 == 0 and p_idx < len(partner_posts):
-            # Check to ensure we don't duplicate the same post if the partner 
-            # is also a connection of the user
-            if partner_posts[p_idx] not in final_feed:
-                final_feed.append(partner_posts[p_idx])
-            p_idx += 1
-
-    # 5. Put global/pattern posts at the top for every user
-    posts = list(global_posts) + final_feed
-
-    # Paginate feed so we do not load every post at once
-    page_number = request.GET.get('page', 1)
-    paginator = Paginator(posts, 20)
-    try:
-        page_obj = paginator.page(page_number)
-    except (PageNotAnInteger, EmptyPage):
-        page_obj = paginator.page(1)
-    posts = list(page_obj.object_list)
+    # 2-5. Assemble only the requested page: pinned investor posts on the first
+    # page, then regular posts with a partner post injected after every three.
+    posts, next_cursor = build_feed_page(
+        feed_type=feed_type,
+        cursor=request.GET.get('cursor'),
+        base_queryset=feed_queryset(request.user),
+        user=request.user,
+    )
+    has_next = next_cursor is not None
 
     # Translate posts if requested
     if translate_feed and target_lang != 'en':
@@ -212,57 +170,44 @@ def social_feed(request):
                 print(f"Translation error for post {post.id}: {str(e)[:100]}")
                 post.is_translated = False
 
+    # Follower counts for every author on the page in one grouped query;
+    # follow state comes from the viewer's cached following set.
+    following_ids = set() if is_adsense_crawler else get_following_ids(request.user.id)
+    follower_counts = get_follower_counts(post.author_id for post in posts)
+    for post in posts:
+        post.author.follower_count = follower_counts.get(post.author_id, 0)
+        post.author.is_following = post.author_id in following_ids
+
     # Handle AJAX requests for infinite scroll
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.GET.get('format') == 'json':
+        # Cards are cached per post and shared by all viewers; like/follow state travels in the overlay
         html = render_to_string('hotel/posts_partial.html', {
             'posts': posts,
-            'request': request,
             'current_lang': target_lang,
+            'post_card_timeout': POST_CARD_CACHE_TIMEOUT,
         })
         return JsonResponse({
             'html': html,
-            'has_next': page_obj.has_next(),
-            'next_page': page_obj.next_page_number() if page_obj.has_next() else None,
+            'viewer': viewer_overlay(request.user, posts, following_ids, follower_counts),
+            'has_next': has_next,
+            'next_cursor': next_cursor,
         })
 
     if is_adsense_crawler:
         connections = []
-        following_count = 0
         all_users = []
     else:
         connections = Connection.objects.filter(
             Q(sender=request.user) | Q(receiver=request.user),
             status='accepted'
         )
-        following_count = Connection.objects.filter(sender=request.user, status='accepted').count()
         all_users = CustomUser.objects.exclude(id=request.user.id)
-    
-    # Add follower count and following status to each post author
-    author_ids = set(post.author.id for post in posts)
-    follower_counts = {}
-    following_status = {}
-    
-    for author_id in author_ids:
-        follower_counts[author_id] = Connection.objects.filter(
-            receiver_id=author_id,
-            status='accepted'
-        ).count()
-        if is_adsense_crawler:
-            following_status[author_id] = False
-        else:
-            following_status[author_id] = Connection.objects.filter(
-                sender=request.user,
-                receiver_id=author_id,
-                status='accepted'
-            ).exists()
-    
-    for post in posts:
-        post.author.follower_count = follower_counts.get(post.author.id, 0)
-        post.author.is_following = following_status.get(post.author.id, False)
-    
+    following_count = len(following_ids)
+
     context = {
         'posts': posts,
-        'page_obj': page_obj,
+        'has_next': has_next,
+        'next_cursor': next_cursor,
         'connections': connections,
         'following_count': following_count,
         'all_users': all_users,
@@ -350,7 +295,8 @@ def like_post(request, post_id):
     like, created = Like.objects.get_or_create(post=post, user=request.user)
     if not created:
         like.delete()
-    return JsonResponse({'likes_count': post.likes.count()})
+    # like_count is kept current by the Like signals (hotel.engagement)
+    return JsonResponse({'likes_count': engagement_counts(post.id)['like_count']})
 
 @login_required
 def add_comment(request, post_id):
@@ -367,6 +313,7 @@ def add_comment(request, post_id):
             comment = Comment.objects.create(post=post, author=request.user, content=content)
             return JsonResponse({
                 'success': True,
+                'comments_count': engagement_counts(post.id)['comment_count'],
                 'comment': {
                     'author_initial': comment.author.first_name[:1].upper() if comment.author.first_name else comment.author.username[:1].upper(),
                     'author_name': comment.author.get_full_name() or comment.author.username,
@@ -439,6 +386,85 @@ LANGUAGE_SERVICE_OVERRIDES = {
 }
 
 
+# Translation memory: long posts are split into sentence/line segments so
+# each segment is cached on its own and only the missing ones go upstream.
+TRANSLATION_CACHE_TIMEOUT = 604800  # 7 days
+MYMEMORY_MAX_CHARS = 500
+TRANSLATION_BATCH_MAX_CHARS = 450  # stay under MyMemory's 500 char limit
+_SEGMENT_SPLIT_RE = re.compile(r'(\s*\n\s*|(?<=[.!?])[ \t]+)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _hard_split(segment, max_chars):
+    """
+    Cut a segment longer than max_chars at the last whitespace within the
+    limit (or mid-word when there is none). Returns (pieces, separators).
+    """
+    pieces, separators = [], []
+    while len(segment) > max_chars:
+        cut = None
+        for match in _WHITESPACE_RE.finditer(segment, 1):
+            if match.start() > max_chars:
+                break
+            cut = match
+        if cut is None:
+            pieces.append(segment[:max_chars])
+            separators.append('')
+            segment = segment[max_chars:]
+        else:
+            pieces.append(segment[:cut.start()])
+            separators.append(cut.group())
+            segment = segment[cut.end():]
+    pieces.append(segment)
+    return pieces, separators
+
+
+def _split_segments(text, max_chars=TRANSLATION_BATCH_MAX_CHARS):
+    """
+    Split text into (segments, separators) so that
+    segments[0] + separators[0] + segments[1] + ... rebuilds the original.
+    Sentences longer than max_chars are split further on whitespace, so no
+    segment exceeds the providers' request limits.
+    """
+    parts = _SEGMENT_SPLIT_RE.split(text)
+    segments, separators = [], []
+    for i, part in enumerate(parts[0::2]):
+        if i:
+            separators.append(parts[2 * i - 1])
+        pieces, cuts = _hard_split(part, max_chars)
+        segments.extend(pieces)
+        separators.extend(cuts)
+    return segments, separators
+
+
+def _join_segments(segments, separators):
+    pieces = []
+    for i, segment in enumerate(segments):
+        pieces.append(segment)
+        if i < len(separators):
+            pieces.append(separators[i])
+    return ''.join(pieces)
+
+
+def _batch_segments(segments, max_chars=TRANSLATION_BATCH_MAX_CHARS):
+    """Group segments into newline-joined batches of at most max_chars."""
+    batches = []
+    current = []
+    current_len = 0
+    for segment in segments:
+        extra = len(segment) + (1 if current else 0)
+        if current and current_len + extra > max_chars:
+            batches.append(current)
+            current = []
+            current_len = 0
+            extra = len(segment)
+        current.append(segment)
+        current_len += extra
+    if current:
+        batches.append(current)
+    return batches
+
+
 def translate_smart(text, target_lang, source_lang='en'):
     """
     Intelligent translation routing with smart service selection:
@@ -448,21 +474,19 @@ def translate_smart(text, target_lang, source_lang='en'):
     4. MyMemory as a final fallback
     5. 7-day caching to reduce API load
     6. Graceful fallback to original text on all failures
+
+    Multi-sentence text is segmented first: every segment is looked up in the
+    translation cache, the missing ones are sent upstream in small batches and
+    the result is reassembled with the original line breaks and spacing.
     """
     target_lang = target_lang.lower() if isinstance(target_lang, str) else target_lang
     source_lang = source_lang.lower() if isinstance(source_lang, str) else source_lang
-    service_source_lang = 'en' if source_lang == 'auto' else source_lang
 
     # Early returns for no-ops
     if not text or not text.strip() or target_lang == source_lang:
         return text
-
-    # Prepare common values and helpers up-front
-    target_code = LANGUAGE_SERVICE_OVERRIDES.get(target_lang, target_lang)
-    if isinstance(target_code, str):
-        target_code = target_code.lower().strip()
     if isinstance(source_lang, str):
-        source_lang = source_lang.lower().strip()
+        source_lang = source_lang.strip()
 
     # Use stable cache key for all translation entry points
     cache_key = _translation_cache_key(text, source_lang, target_lang)
@@ -470,6 +494,70 @@ def translate_smart(text, target_lang, source_lang='en'):
     if cached is not None and isinstance(cached, str) and len(cached) > 0:
         return cached
 
+    segments, separators = _split_segments(text)
+    translatable = [seg for seg in segments if seg.strip()]
+
+    if len(translatable) <= 1:
+        translated_text = _translate_via_services(text, target_lang, source_lang)
+        if translated_text:
+            _safe_cache_set(cache_key, translated_text, TRANSLATION_CACHE_TIMEOUT)
+            return translated_text
+        print(f"All translation tiers failed for {target_lang} ({source_lang}), returning original")
+        return text
+
+    # Look up every distinct segment in the translation memory
+    memory = {}
+    missing = []
+    for segment in dict.fromkeys(translatable):
+        hit = _safe_cache_get(_translation_cache_key(segment, source_lang, target_lang))
+        if hit is not None and isinstance(hit, str) and len(hit) > 0:
+            memory[segment] = hit
+        else:
+            missing.append(segment)
+
+    for batch in _batch_segments(missing):
+        results = []
+        if len(batch) > 1:
+            batch_result = _translate_via_services('\n'.join(batch), target_lang, source_lang)
+            if batch_result:
+                results = [line.strip() for line in batch_result.split('\n') if line.strip()]
+        if len(results) != len(batch):
+            # Provider merged or dropped lines; fall back to one call per segment
+            results = [_translate_via_services(segment, target_lang, source_lang) for segment in batch]
+        for segment, translated_segment in zip(batch, results):
+            if translated_segment:
+                memory[segment] = translated_segment
+                _safe_cache_set(
+                    _translation_cache_key(segment, source_lang, target_lang),
+                    translated_segment,
+                    TRANSLATION_CACHE_TIMEOUT,
+                )
+
+    if not memory:
+        print(f"All translation tiers failed for {target_lang} ({source_lang}), returning original")
+        return text
+
+    translated_text = _join_segments(
+        [memory.get(segment, segment) if segment.strip() else segment for segment in segments],
+        separators,
+    )
+    if all(segment in memory for segment in translatable):
+        _safe_cache_set(cache_key, translated_text, TRANSLATION_CACHE_TIMEOUT)
+    return translated_text
+
+
+def _translate_via_services(text, target_lang, source_lang='en'):
+    """
+    Run a single piece of text through the provider cascade.
+    Returns the translation, or None when every tier failed. No caching here.
+    """
+    service_source_lang = 'en' if source_lang == 'auto' else source_lang
+
+    # Prepare common values and helpers up-front
+    target_code = LANGUAGE_SERVICE_OVERRIDES.get(target_lang, target_lang)
+    if isinstance(target_code, str):
+        target_code = target_code.lower().strip()
+
     def _try_sunbird():
         if not SUNBIRD_API_KEY:
             print("Sunbird API key not configured, skipping Sunbird translation")
@@ -635,13 +723,17 @@ def translate_smart(text, target_lang, source_lang='en'):
     def _try_mymemory():
         if not target_code:
             return None
+        if len(text) > MYMEMORY_MAX_CHARS:
+            # Sending a truncated text would cache a translation of only part of it
+            print(f"MyMemory skipped: {len(text)} chars is over its {MYMEMORY_MAX_CHARS} char limit")
+            return None
         # MyMemory doesn't support 'auto' source, default to 'en'
         mymem_source = 'en' if service_source_lang in {'auto', 'en', 'eng'} else service_source_lang
         try:
             res = requests.get(
                 'https://api.mymemory.translated.net/get',
                 params={
-                    'q': text[:500],
+                    'q': text,
                     'langpair': f'{mymem_source}|{target_code}'
                 },
                 timeout=8,
@@ -687,59 +779,17 @@ def translate_smart(text, target_lang, source_lang='en'):
     target_in_nllb = target_code in NLLB_LANGS or target_lang in NLLB_LANGS
 
     if target_in_sunbird:
-        translated_text = _try_sunbird()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_nllb()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_libre()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_google()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_mymemory()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
+        services = (_try_sunbird, _try_nllb, _try_libre, _try_google, _try_mymemory)
     elif target_in_nllb:
-        translated_text = _try_nllb()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_libre()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_google()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_mymemory()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
+        services = (_try_nllb, _try_libre, _try_google, _try_mymemory)
     else:
-        translated_text = _try_libre()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_google()
-        if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
-            return translated_text
-        translated_text = _try_mymemory()
+        services = (_try_libre, _try_google, _try_mymemory)
+
+    for service in services:
+        translated_text = service()
         if translated_text:
-            _safe_cache_set(cache_key, translated_text, 604800)
             return translated_text
-
-    print(f"All translation tiers failed for {target_lang} ({source_lang}), returning original")
-    return text
+    return None
 
 @login_required
 def translate_text(request):
@@ -769,6 +819,81 @@ def translate_text(request):
         print(f"translate_text error: {str(e)[:150]}")
         return JsonResponse({'error': str(e)[:100], 'translated': ''}, status=500)
 
+TRANSLATION_STREAM_MAX_ITEMS = 50
+TRANSLATION_STREAM_WORKERS = 4
+
+
+@login_required
+def translate_stream(request):
+    """
+    Stream post translations as JSON lines (application/x-ndjson).
+    Cache hits are written immediately; misses are translated in a small
+    thread pool and each line is flushed as soon as its provider answers.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST only'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    target_language = (data.get('target_language') or getattr(request.user, 'language', 'en') or 'en').lower().strip()
+    source_language = (data.get('source_language') or 'en').lower().strip()
+    post_ids = []
+    for raw_id in data.get('post_ids') or []:
+        try:
+            post_ids.append(int(raw_id))
+        except (TypeError, ValueError):
+            continue
+    post_ids = post_ids[:TRANSLATION_STREAM_MAX_ITEMS]
+    if not post_ids:
+        return JsonResponse({'error': 'post_ids required'}, status=400)
+
+    posts = list(Post.objects.filter(id__in=post_ids).only('id', 'content'))
+
+    def _line(payload):
+        return json.dumps(payload) + '\n'
+
+    def _stream():
+        pending = []
+        for post in posts:
+            if not post.content or not post.content.strip() or source_language == target_language:
+                yield _line({'post_id': post.id, 'translated': post.content, 'cached': True, 'skipped': True})
+                continue
+            cached = _safe_cache_get(_translation_cache_key(post.content, source_language, target_language))
+            if cached:
+                yield _line({'post_id': post.id, 'translated': cached, 'cached': True})
+            else:
+                pending.append(post)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(TRANSLATION_STREAM_WORKERS, len(pending))) as executor:
+                futures = {
+                    executor.submit(translate_smart, post.content, target_language, source_language): post
+                    for post in pending
+                }
+                for future in as_completed(futures):
+                    post = futures[future]
+                    try:
+                        translated = future.result()
+                    except Exception as e:
+                        print(f"translate_stream error for post {post.id}: {str(e)[:100]}")
+                        translated = None
+                    yield _line({
+                        'post_id': post.id,
+                        'translated': translated or post.content,
+                        'cached': False,
+                        'success': bool(translated) and translated != post.content,
+                    })
+
+        yield _line({'done': True, 'count': len(posts)})
+
+    response = StreamingHttpResponse(_stream(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
 @login_required
 def send_message(request, user_id):
     receiver = get_object_or_404(CustomUser, id=user_id)
@@ -789,7 +914,7 @@ def send_message(request, user_id):
             attachment = request.FILES.get('attachment')
 
         if content or attachment:
-            Message.objects.create(
+            new_message = Message.objects.create(
                 sender=request.user,
                 receiver=receiver,
                 content=content,
@@ -800,7 +925,11 @@ def send_message(request, user_id):
                 'application/json' in request.headers.get('Content-Type', '')
             )
             if is_ajax:
-                return JsonResponse({'success': True, 'message': f'Message sent to {receiver.username}!'})
+                return JsonResponse({
+                    'success': True,
+                    'message': f'Message sent to {receiver.username}!',
+                    'message_id': new_message.id,
+                })
             else:
                 # messages.success(request, f'Message sent to {receiver.username}!')
                 return redirect('hotel:inbox')
@@ -812,30 +941,17 @@ def inbox(request):
 
 @login_required
 def inbox_messages(request):
-    # Defer `attachment` to avoid database errors if migrations haven't been applied yet
-    messages_list = Message.objects.defer('attachment').filter(
-        Q(sender=request.user) | Q(receiver=request.user)
-    ).order_by('-created_at')
-
-    conversations = {}
-    for msg in messages_list:
-        partner = msg.receiver if msg.sender == request.user else msg.sender
-        if partner.id not in conversations:
-            conversations[partner.id] = {
-                'grouper': partner,
-                'list': []
-            }
-        conversations[partner.id]['list'].append(msg)
-
-    message_groups = list(conversations.values())
-    unread_messages = messages_list.filter(receiver=request.user, is_read=False)[:5]
-    unread_messages_count = messages_list.filter(receiver=request.user, is_read=False).count()
+    # One row per conversation partner, read from the Conversation summaries
+    conversations = inbox_summary.conversations_for(request.user)
+    unread_messages_count = sum(conversation.unread_count for conversation in conversations)
+    unread_messages = Message.objects.defer('attachment').select_related('sender').filter(
+        receiver=request.user, is_read=False
+    ).order_by('-created_at')[:5]
     communities = Community.objects.filter(members=request.user).order_by('-created_at')
     notifications = Message.objects.none()
 
     return render(request, 'hotel/inbox.html', {
-        'message_groups': message_groups,
-        'messages': messages_list,
+        'conversations': conversations,
         'communities': communities,
         'unread_messages': unread_messages,
         'unread_messages_count': unread_messages_count,
@@ -847,9 +963,11 @@ def inbox_communities(request):
     messages_list = Message.objects.defer('attachment').filter(receiver=request.user).order_by('-created_at')
     communities = Community.objects.filter(members=request.user).order_by('-created_at')
     unread_messages = messages_list.filter(is_read=False)[:5]
-    unread_count = messages_list.filter(is_read=False).count()
+    unread_count = inbox_summary.unread_total(request.user)
+    page = Paginator(messages_list, inbox_summary.PAGE_SIZE).get_page(request.GET.get('page'))
     return render(request, 'hotel/inbox_communities.html', {
-        'messages': messages_list,
+        'messages': page,
+        'page_obj': page,
         'communities': communities,
         'unread_messages': unread_messages,
         'unread_count': unread_count,
@@ -860,9 +978,11 @@ def inbox_notifications(request):
     messages_list = Message.objects.defer('attachment').filter(receiver=request.user).order_by('-created_at')
     communities = Community.objects.filter(members=request.user).order_by('-created_at')
     unread_messages = messages_list.filter(is_read=False)[:5]
-    unread_count = messages_list.filter(is_read=False).count()
+    unread_count = inbox_summary.unread_total(request.user)
+    page = Paginator(messages_list, inbox_summary.PAGE_SIZE).get_page(request.GET.get('page'))
     return render(request, 'hotel/inbox_notifications.html', {
-        'messages': messages_list,
+        'messages': page,
+        'page_obj': page,
         'communities': communities,
         'unread_messages': unread_messages,
         'unread_count': unread_count,
@@ -872,8 +992,8 @@ def inbox_notifications(request):
 def mark_message_read(request, message_id):
     if request.method == 'POST':
         message = get_object_or_404(Message, id=message_id, receiver=request.user)
-        message.is_read = True
-        message.save()
+        if Message.objects.filter(id=message.id, is_read=False).update(is_read=True):
+            inbox_summary.mark_message_read(message)
         
         # Check if it's an AJAX request
         is_ajax = (
@@ -899,24 +1019,36 @@ def share_post(request, post_id):
             or 'application/json' in request.headers.get('Accept', '')
         )
         if is_ajax:
-            return JsonResponse({'success': True, 'shares_count': post.shares.count()})
+            return JsonResponse({'success': True, 'shares_count': engagement_counts(post.id)['share_count']})
         messages.success(request, 'Post shared successfully!')
         return redirect('hotel:social_feed')
     return render(request, 'hotel/share_post.html', {'post': post})
 
 @login_required
 def get_recent_messages(request):
-    messages_list = Message.objects.defer('attachment').filter(receiver=request.user).order_by('-created_at')[:5]
+    """
+    Latest received messages. With ?after=<id> only newer messages are
+    returned, and ?wait=1 long-polls until one arrives when the server has
+    a free waiter slot (see hotel.sync).
+    """
+    received = Message.objects.defer('attachment').select_related('sender').filter(receiver=request.user)
+    after_id = message_sync.parse_message_id(request.GET.get('after'))
+    if after_id is None:
+        messages_list = list(received.order_by('-id')[:5])
+    else:
+        messages_list, _, _ = message_sync.fetch_messages(request, received, after_id, limit=5)
     messages_data = []
     for msg in messages_list:
         messages_data.append({
+            'id': msg.id,
             'sender': msg.sender.username,
             'sender_id': msg.sender.id,
             'content': msg.content[:50],
             'created_at': msg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             'is_read': msg.is_read
         })
-    return JsonResponse({'messages': messages_data})
+    cursor = max([msg.id for msg in messages_list], default=after_id)
+    return JsonResponse({'messages': messages_data, 'cursor': cursor})
 
 @login_required
 def gemini_translate(request):
@@ -1009,22 +1141,74 @@ def conversation(request, user_id):
             )
             # Mark messages as read when replying
             Message.objects.filter(sender=other_user, receiver=request.user, is_read=False).update(is_read=True)
+            inbox_summary.mark_thread_read(request.user.id, other_user.id)
         return redirect('hotel:conversation', user_id=user_id)
     
-    # Get messages between the two users
-    messages = Message.objects.defer('attachment').filter(
-        (Q(sender=request.user) & Q(receiver=other_user)) |
-        (Q(sender=other_user) & Q(receiver=request.user))
-    ).order_by('created_at')
+    # Only the latest page is rendered; older pages and new messages are fetched incrementally
+    messages, has_more = message_sync.messages_before(message_sync.direct_thread(request.user, other_user))
     
     # Mark received messages as read
-    Message.objects.filter(sender=other_user, receiver=request.user, is_read=False).update(is_read=True)
+    if Message.objects.filter(sender=other_user, receiver=request.user, is_read=False).update(is_read=True):
+        inbox_summary.mark_thread_read(request.user.id, other_user.id)
     
     return render(request, 'hotel/conversation.html', {
         'other_user': other_user,
-        'messages': messages
+        'messages': messages,
+        'has_more': has_more,
+        'sync_cursor': messages[-1].id if messages else 0,
     })
 
+@login_required
+def conversation_sync(request, user_id):
+    """Messages in the thread newer than ?after=<id>; ?wait=1 long-polls when a waiter slot is free."""
+    other_user = get_object_or_404(CustomUser, id=user_id)
+    thread = message_sync.direct_thread(request.user, other_user)
+    after_id = message_sync.parse_message_id(request.GET.get('after'))
+    messages, has_more, poll_after = message_sync.fetch_messages(request, thread, after_id)
+
+    if any(msg.receiver_id == request.user.id and not msg.is_read for msg in messages):
+        Message.objects.filter(sender=other_user, receiver=request.user, is_read=False).update(is_read=True)
+        inbox_summary.mark_thread_read(request.user.id, other_user.id)
+
+    return JsonResponse(message_sync.sync_payload(messages, request.user, after_id, has_more, poll_after))
+
+@login_required
+def conversation_history(request, user_id):
+    """The page of messages older than ?before=<id>, for scrolling back through a thread."""
+    other_user = get_object_or_404(CustomUser, id=user_id)
+    messages, has_more = message_sync.messages_before(
+        message_sync.direct_thread(request.user, other_user),
+        message_sync.parse_message_id(request.GET.get('before')),
+    )
+    return JsonResponse(message_sync.history_payload(messages, request.user, has_more))
+
+def _serve_message_attachment(request, message):
+    if not message.attachment:
+        return HttpResponse(status=404)
+    if request.GET.get('variant') == 'thumbnail' and message.attachment_thumbnail:
+        return attachment_response(request, message.attachment_thumbnail, content_type='image/jpeg')
+    return attachment_response(
+        request,
+        message.attachment,
+        content_type=message.attachment_content_type or None,
+        filename=message.attachment_name or None,
+        as_attachment=request.GET.get('download') == '1',
+    )
+
+@login_required
+def message_attachment(request, message_id):
+    """Attachment (or ?variant=thumbnail preview) of a direct message, with Range support."""
+    message = get_object_or_404(
+        Message.objects.filter(Q(sender=request.user) | Q(receiver=request.user)), id=message_id
+    )
+    return _serve_message_attachment(request, message)
+
+@login_required
+def community_attachment(request, message_id):
+    """Attachment (or ?variant=thumbnail preview) of a community message, members only."""
+    message = get_object_or_404(CommunityMessage, id=message_id, community__members=request.user)
+    return _serve_message_attachment(request, message)
+
 @login_required
 def create_community(request):
     if request.method == 'POST':
@@ -1042,7 +1226,7 @@ def join_community(request, invite_link):
     if not request.user.is_authenticated:
         next_url = quote(request.path)
         return redirect(f"{settings.LOGIN_URL}?next={next_url}")
-    if request.user not in community.members.all():
+    if not community.is_member(request.user):
         community.members.add(request.user)
         messages.success(request, f'Joined community "{community.name}"!')
     return redirect('hotel:community_conversation', community_id=community.id)
@@ -1066,8 +1250,9 @@ def community_conversation(request, community_id):
             content = request.POST.get('content', '') or ''
             attachment = request.FILES.get('attachment')
 
+        new_message = None
         if content or attachment:
-            CommunityMessage.objects.create(
+            new_message = CommunityMessage.objects.create(
                 community=community,
                 sender=request.user,
                 content=content,
@@ -1079,16 +1264,38 @@ def community_conversation(request, community_id):
             'application/json' in request.headers.get('Content-Type', '')
         )
         if is_ajax:
-            return JsonResponse({'success': True})
+            return JsonResponse({'success': True, 'message_id': new_message.id if new_message else None})
 
         return redirect('hotel:community_conversation', community_id=community_id)
     
-    messages = community.messages.all().order_by('created_at')
+    messages, has_more = message_sync.messages_before(message_sync.community_thread(community))
     return render(request, 'hotel/community_conversation.html', {
         'community': community,
-        'messages': messages
+        'is_member': True,
+        'messages': messages,
+        'has_more': has_more,
+        'sync_cursor': messages[-1].id if messages else 0,
     })
 
+@login_required
+def community_sync(request, community_id):
+    """Community messages newer than ?after=<id>; ?wait=1 long-polls when a waiter slot is free."""
+    community = get_object_or_404(Community, id=community_id, members=request.user)
+    thread = message_sync.community_thread(community)
+    after_id = message_sync.parse_message_id(request.GET.get('after'))
+    messages, has_more, poll_after = message_sync.fetch_messages(request, thread, after_id)
+    return JsonResponse(message_sync.sync_payload(messages, request.user, after_id, has_more, poll_after))
+
+@login_required
+def community_history(request, community_id):
+    """The page of community messages older than ?before=<id>."""
+    community = get_object_or_404(Community, id=community_id, members=request.user)
+    messages, has_more = message_sync.messages_before(
+        message_sync.community_thread(community),
+        message_sync.parse_message_id(request.GET.get('before')),
+    )
+    return JsonResponse(message_sync.history_payload(messages, request.user, has_more))
+
 @login_required
 def follow_user(request, user_id):
     user_to_follow = get_object_or_404(CustomUser, id=user_id)
@@ -1,7 +1,23 @@
 """
 ASGI config for myuganda project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+Exposes two ASGI callables:
+
+- ``application``: HTTP requests go to Django and websocket connections to
+  the real-time messaging handler in myuganda.realtime. Convenient for
+  local development in one process:
+
+      uvicorn myuganda.asgi:application --host 0.0.0.0 --port 8000
+
+- ``realtime_application``: websockets only; HTTP requests get a 404. This
+  is what production runs (SERVER_ROLE=realtime in the Dockerfile), next to
+  the WSGI server that handles every HTTP request. Django's ASGI handler
+  reads a sync StreamingHttpResponse/FileResponse into memory before
+  sending it, which would buffer translate_stream's NDJSON and whole reel
+  videos and attachments, and skip the WSGI file_wrapper/sendfile path.
+  The front-end proxy routes /ws/ to this process. Messages are saved by
+  the WSGI workers, so it needs REALTIME_REDIS_URL; startup fails otherwise
+  (myuganda.realtime.check_deployment).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +29,27 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myuganda.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from myuganda.realtime import check_deployment, websocket_application  # noqa: E402  (needs the app registry loaded)
+
+check_deployment(
+    int(os.environ.get('WEB_CONCURRENCY') or os.environ.get('REALTIME_WORKERS') or 1),
+    separate_http=os.environ.get('SERVER_ROLE') == 'realtime',
+)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
+
+
+async def realtime_application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    if scope['type'] == 'http':
+        # HTTP is served by the WSGI server; only /ws/ should be routed here
+        await send({'type': 'http.response.start', 'status': 404,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': b'Not Found'})
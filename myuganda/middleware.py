@@ -7,6 +7,7 @@ be exploited for unauthorized resource modification or reconnaissance.
 """
 
 from django.http import HttpResponse, HttpResponsePermanentRedirect
+from django.middleware.gzip import GZipMiddleware
 from django.utils.deprecation import MiddlewareMixin
 import logging
 
@@ -31,6 +32,24 @@ class CanonicalDomainMiddleware(MiddlewareMixin):
         return None
 
 
+
+class RangeAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves byte-range capable responses alone.
+
+    Content-Range offsets refer to the unencoded file, so gzipping a 206
+    (or any response advertising Accept-Ranges, such as reel media and
+    hotel attachments) would corrupt seeking. Video is already compressed,
+    and X-Accel-Redirect/X-Sendfile bodies are filled in by the front-end.
+    """
+
+    def process_response(self, request, response):
+        if (response.status_code in (206, 416) or response.get('Accept-Ranges') == 'bytes'
+                or response.has_header('X-Accel-Redirect') or response.has_header('X-Sendfile')):
+            return response
+        return super().process_response(request, response)
+
+
 class HTTPMethodSecurityMiddleware(MiddlewareMixin):
     """
     Restricts HTTP methods to only those required by the application.
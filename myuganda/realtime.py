@@ -0,0 +1,512 @@
+"""
+Real-time messaging over ASGI websockets.
+
+One websocket per open thread pushes new messages, typing indicators and
+read receipts for:
+
+    /ws/hotel/conversation/<user_id>/   hotel.Message (direct messages)
+    /ws/hotel/community/<community_id>/ hotel.CommunityMessage
+    /ws/social/chat/<partner_id>/       social.SecureMessage
+
+Events fan out through a channel layer: every connection owns a channel,
+and channels join a group per thread. Model post_save signals publish new
+messages to the thread's group, so anything that creates a message (the
+websocket itself, the regular views, the admin) reaches connected clients.
+
+The default InMemoryChannelLayer only reaches connections served by the
+same process, which is enough for local development with one ASGI process
+serving both HTTP and websockets. RedisChannelLayer (REALTIME_REDIS_URL)
+relays group events through Redis pub/sub so they reach sockets held by
+every worker. In production HTTP stays on the WSGI server and only the
+websockets run in a separate ASGI process (myuganda.asgi.realtime_application),
+so messages saved by the WSGI workers must cross processes:
+check_deployment() refuses to start that process, or several workers, on
+the in-memory layer.
+
+The handshake only accepts browser connections whose Origin is the host
+being connected to or one of CSRF_TRUSTED_ORIGINS, since the socket is
+authenticated by the session cookie (cross-site websocket hijacking).
+
+Frames sent by the client (JSON):
+    {"type": "message", "content": "..."}
+    {"type": "typing"}
+    {"type": "read", "up_to": <message id>}
+
+Frames pushed to the client:
+    {"type": "message", "message": {...}}
+    {"type": "typing", "user_id": ..., "username": "..."}
+    {"type": "read", "user_id": ..., "up_to": ...}
+"""
+import asyncio
+import itertools
+import json
+import re
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http.request import validate_host
+from django.utils.http import is_same_domain
+from django.utils.module_loading import import_string
+
+CHANNEL_CAPACITY = 100
+DEFAULT_CHANNEL_LAYER = 'myuganda.realtime.InMemoryChannelLayer'
+REDIS_PREFIX = 'realtime:'
+
+CLOSE_UNAUTHENTICATED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+
+ROUTES = [
+    (re.compile(r'^/ws/hotel/conversation/(?P<target_id>\d+)/$'), 'direct'),
+    (re.compile(r'^/ws/hotel/community/(?P<target_id>\d+)/$'), 'community'),
+    (re.compile(r'^/ws/social/chat/(?P<target_id>\d+)/$'), 'secure'),
+]
+
+
+# --- Channel layers ---
+
+class BaseChannelLayer:
+    """Interface a broker-backed layer implements to replace the in-memory one."""
+
+    async def new_channel(self):
+        raise NotImplementedError
+
+    async def receive(self, channel):
+        raise NotImplementedError
+
+    async def group_add(self, group, channel):
+        raise NotImplementedError
+
+    async def group_discard(self, group, channel):
+        raise NotImplementedError
+
+    async def group_send(self, group, event):
+        raise NotImplementedError
+
+    def publish(self, group, event):
+        """Send to a group from synchronous code (views, signals, management commands)."""
+        raise NotImplementedError
+
+    def has_subscribers(self, group):
+        """Whether publishing to group could reach anyone; lets callers skip building the event."""
+        return True
+
+    # Whether events reach connections held by other processes
+    cross_process = False
+
+
+class InMemoryChannelLayer(BaseChannelLayer):
+    """
+    Process-local layer: one bounded asyncio.Queue per channel. A slow
+    client loses its oldest undelivered events rather than growing memory.
+    """
+
+    def __init__(self, capacity=CHANNEL_CAPACITY):
+        self.capacity = capacity
+        self.channels = {}
+        self.groups = {}
+        self.loop = None
+        self._counter = itertools.count(1)
+
+    async def new_channel(self):
+        self.loop = asyncio.get_running_loop()
+        channel = f'inmemory.{next(self._counter)}'
+        self.channels[channel] = asyncio.Queue(maxsize=self.capacity)
+        return channel
+
+    async def receive(self, channel):
+        return await self.channels[channel].get()
+
+    async def group_add(self, group, channel):
+        self.groups.setdefault(group, set()).add(channel)
+
+    async def group_discard(self, group, channel):
+        members = self.groups.get(group)
+        if members is not None:
+            members.discard(channel)
+            if not members:
+                del self.groups[group]
+        if not any(channel in members for members in self.groups.values()):
+            self.channels.pop(channel, None)
+
+    async def group_send(self, group, event):
+        for channel in list(self.groups.get(group, ())):
+            queue = self.channels.get(channel)
+            if queue is None:
+                continue
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def has_subscribers(self, group):
+        return group in self.groups
+
+    def publish(self, group, event):
+        loop = self.loop
+        if loop is None or not loop.is_running() or group not in self.groups:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            loop.create_task(self.group_send(group, event))
+        else:
+            asyncio.run_coroutine_threadsafe(self.group_send(group, event), loop)
+
+
+class RedisChannelLayer(InMemoryChannelLayer):
+    """
+    Multi-worker layer: connections still get local queues, but group
+    events travel over Redis pub/sub. Each process subscribes to a group's
+    Redis channel while it holds a member of that group, and one reader
+    task delivers what arrives to the local queues, so a message saved in
+    any worker (or a management command) reaches every open socket.
+    """
+
+    cross_process = True
+
+    def __init__(self, url=None, capacity=CHANNEL_CAPACITY, prefix=REDIS_PREFIX):
+        import redis
+
+        super().__init__(capacity)
+        self.url = url or getattr(settings, 'REALTIME_REDIS_URL', '')
+        if not self.url:
+            raise ImproperlyConfigured('RedisChannelLayer needs REALTIME_REDIS_URL')
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(self.url)
+        self.async_client = None
+        self.pubsub = None
+        self.reader = None
+
+    async def _connect(self):
+        if self.async_client is None:
+            import redis.asyncio
+
+            self.async_client = redis.asyncio.Redis.from_url(self.url)
+            self.pubsub = self.async_client.pubsub()
+
+    async def group_add(self, group, channel):
+        first = group not in self.groups
+        await super().group_add(group, channel)
+        if first:
+            await self._connect()
+            await self.pubsub.subscribe(self.prefix + group)
+            if self.reader is None or self.reader.done():
+                self.reader = asyncio.create_task(self._read())
+
+    async def group_discard(self, group, channel):
+        held = group in self.groups
+        await super().group_discard(group, channel)
+        if held and group not in self.groups and self.pubsub is not None:
+            await self.pubsub.unsubscribe(self.prefix + group)
+
+    async def group_send(self, group, event):
+        await self._connect()
+        await self.async_client.publish(self.prefix + group, json.dumps(event))
+
+    def publish(self, group, event):
+        self.client.publish(self.prefix + group, json.dumps(event))
+
+    def has_subscribers(self, group):
+        return any(count for _, count in self.client.pubsub_numsub(self.prefix + group))
+
+    async def _read(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Realtime Redis read error: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not message or message.get('type') != 'message':
+                continue
+            group = message['channel'].decode()[len(self.prefix):]
+            await InMemoryChannelLayer.group_send(self, group, json.loads(message['data']))
+
+
+_channel_layer = None
+
+
+def get_channel_layer():
+    global _channel_layer
+    if _channel_layer is None:
+        layer_class = import_string(getattr(settings, 'REALTIME_CHANNEL_LAYER', DEFAULT_CHANNEL_LAYER))
+        _channel_layer = layer_class()
+    return _channel_layer
+
+
+# --- Groups and events ---
+
+def direct_group(user_id, other_id):
+    low, high = sorted((user_id, other_id))
+    return f'hotel.dm.{low}.{high}'
+
+
+def community_group(community_id):
+    return f'hotel.community.{community_id}'
+
+
+def secure_group(user_id, other_id):
+    low, high = sorted((user_id, other_id))
+    return f'social.secure.{low}.{high}'
+
+
+def message_event(message):
+    """Viewer-independent payload; clients compare sender_id with their own id."""
+    created_at = getattr(message, 'created_at', None) or getattr(message, 'timestamp', None)
+    if hasattr(message, 'get_attachment_url'):
+        from hotel.attachments import attachment_payload
+        attachment = attachment_payload(message)
+    else:
+        attachment = {'attachment_url': None}
+    return {
+        'type': 'message',
+        'message': {
+            'id': message.id,
+            'sender_id': message.sender_id,
+            'sender': message.sender.username,
+            'sender_name': message.sender.get_full_name() or message.sender.username,
+            'content': message.content or '',
+            **attachment,
+            'is_read': getattr(message, 'is_read', None),
+            'created_at': created_at.isoformat() if created_at else None,
+        },
+    }
+
+
+def publish(group, event):
+    try:
+        get_channel_layer().publish(group, event)
+    except Exception as e:
+        print(f"Realtime publish error: {e}")
+
+
+def publish_message(group, message):
+    """Publish a saved message, skipping the event (and its sender query) when nobody is subscribed."""
+    try:
+        if not get_channel_layer().has_subscribers(group):
+            return
+    except Exception as e:
+        print(f"Realtime publish error: {e}")
+        return
+    publish(group, message_event(message))
+
+
+def check_deployment(workers, separate_http=False):
+    """
+    Refuse to serve several workers, or websockets apart from the HTTP
+    server (separate_http), from a layer that cannot reach the other processes.
+    """
+    layer_path = getattr(settings, 'REALTIME_CHANNEL_LAYER', DEFAULT_CHANNEL_LAYER)
+    if getattr(import_string(layer_path), 'cross_process', False):
+        return
+    if separate_http:
+        raise ImproperlyConfigured(
+            f'{layer_path} only reaches websockets in its own process, but messages are saved by the '
+            f'WSGI workers; set REALTIME_REDIS_URL (RedisChannelLayer) for a separate realtime process.'
+        )
+    if workers > 1:
+        raise ImproperlyConfigured(
+            f'{layer_path} only reaches websockets in its own process; set REALTIME_REDIS_URL '
+            f'(RedisChannelLayer) or run a single worker (got {workers}).'
+        )
+
+
+# --- Thread access (sync, run through sync_to_async) ---
+
+def _user_from_session(session_key):
+    from django.contrib.auth import get_user
+
+    if not session_key:
+        return None
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(SimpleNamespace(session=session))
+    return user if user.is_authenticated else None
+
+
+def _resolve_thread(kind, user, target_id):
+    """Return (group, target) for a thread the user may join, or raise PermissionError/LookupError."""
+    from hotel.models import Community
+    from users.models import CustomUser
+
+    if kind == 'community':
+        community = Community.objects.filter(id=target_id).first()
+        if community is None:
+            raise LookupError(target_id)
+        if not community.members.filter(id=user.id).exists():
+            raise PermissionError(target_id)
+        return community_group(community.id), community
+
+    partner = CustomUser.objects.filter(id=target_id).first()
+    if partner is None:
+        raise LookupError(target_id)
+    if kind == 'direct':
+        return direct_group(user.id, partner.id), partner
+    return secure_group(user.id, partner.id), partner
+
+
+def _create_message(kind, user, target, content):
+    if kind == 'direct':
+        from hotel.models import Message
+        Message.objects.create(sender=user, receiver=target, content=content)
+    elif kind == 'community':
+        from hotel.models import CommunityMessage
+        CommunityMessage.objects.create(community=target, sender=user, content=content)
+    else:
+        from social.models import SecureMessage
+        SecureMessage.objects.create(sender=user, recipient=target, content=content)
+
+
+def _mark_read(kind, user, target, up_to):
+    """Mark the partner's messages up to up_to as read; returns True if any changed."""
+    if kind == 'direct':
+        from hotel.inbox import mark_messages_read
+        from hotel.models import Message
+        updated = Message.objects.filter(
+            sender=target, receiver=user, is_read=False, id__lte=up_to
+        ).update(is_read=True)
+        if updated:
+            mark_messages_read(user.id, target.id, updated)
+        return bool(updated)
+    if kind == 'secure':
+        from social.models import SecureMessage
+        return bool(SecureMessage.objects.filter(
+            sender=target, recipient=user, is_read=False, id__lte=up_to
+        ).update(is_read=True))
+    return False
+
+
+# --- ASGI application ---
+
+def _header(scope, name):
+    for header, value in scope.get('headers', []):
+        if header == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _session_key(scope):
+    value = _header(scope, b'cookie')
+    if value is None:
+        return None
+    cookie = SimpleCookie()
+    cookie.load(value)
+    morsel = cookie.get(settings.SESSION_COOKIE_NAME)
+    return morsel.value if morsel else None
+
+
+def origin_allowed(scope):
+    """
+    Browsers always send Origin on websocket handshakes; it must be the host
+    being connected to (itself one of ALLOWED_HOSTS) or a trusted origin.
+    Non-browser clients without Origin carry no ambient cookie risk.
+    """
+    origin = _header(scope, b'origin')
+    if origin is None:
+        return True
+    if origin == 'null':
+        return False
+    trusted = getattr(settings, 'CSRF_TRUSTED_ORIGINS', [])
+    if origin in trusted:
+        return True
+    parts = urlsplit(origin)
+    # Wildcard entries ('https://*.example.com') match subdomains, as in CsrfViewMiddleware
+    if any(
+        '*' in entry and urlsplit(entry).scheme == parts.scheme
+        and is_same_domain(parts.netloc, urlsplit(entry).netloc.lstrip('*'))
+        for entry in trusted
+    ):
+        return True
+    host = _header(scope, b'host')
+    return bool(host) and parts.netloc == host and validate_host(parts.hostname or '', settings.ALLOWED_HOSTS)
+
+
+def _route(path):
+    for pattern, kind in ROUTES:
+        match = pattern.match(path)
+        if match:
+            return kind, int(match.group('target_id'))
+    return None, None
+
+
+async def _close(send, code):
+    await send({'type': 'websocket.close', 'code': code})
+
+
+async def websocket_application(scope, receive, send):
+    """ASGI websocket handler; http traffic is routed to Django in myuganda.asgi."""
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+
+    if not origin_allowed(scope):
+        return await _close(send, CLOSE_FORBIDDEN)
+
+    kind, target_id = _route(scope.get('path', ''))
+    if kind is None:
+        return await _close(send, CLOSE_NOT_FOUND)
+
+    user = scope.get('user')
+    if user is None:
+        user = await sync_to_async(_user_from_session)(_session_key(scope))
+    if user is None or not user.is_authenticated:
+        return await _close(send, CLOSE_UNAUTHENTICATED)
+
+    try:
+        group, target = await sync_to_async(_resolve_thread)(kind, user, target_id)
+    except LookupError:
+        return await _close(send, CLOSE_NOT_FOUND)
+    except PermissionError:
+        return await _close(send, CLOSE_FORBIDDEN)
+
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    await layer.group_add(group, channel)
+    await send({'type': 'websocket.accept'})
+
+    async def forward_events():
+        while True:
+            payload = await layer.receive(channel)
+            await send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    forwarder = asyncio.create_task(forward_events())
+    try:
+        while True:
+            event = await receive()
+            if event['type'] == 'websocket.disconnect':
+                break
+            if event['type'] != 'websocket.receive' or not event.get('text'):
+                continue
+            try:
+                frame = json.loads(event['text'])
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(frame, dict):
+                continue
+
+            frame_type = frame.get('type')
+            if frame_type == 'message':
+                content = str(frame.get('content') or '').strip()
+                if content:
+                    await sync_to_async(_create_message)(kind, user, target, content)
+            elif frame_type == 'typing':
+                await layer.group_send(group, {'type': 'typing', 'user_id': user.id, 'username': user.username})
+            elif frame_type == 'read':
+                try:
+                    up_to = int(frame.get('up_to'))
+                except (TypeError, ValueError):
+                    continue
+                if await sync_to_async(_mark_read)(kind, user, target, up_to):
+                    await layer.group_send(group, {'type': 'read', 'user_id': user.id, 'up_to': up_to})
+    finally:
+        forwarder.cancel()
+        await layer.group_discard(group, channel)
@@ -164,7 +164,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'myuganda.middleware.CanonicalDomainMiddleware',  # Preserve canonical host while excluding crawler files
     'whitenoise.middleware.WhiteNoiseMiddleware', # High-performance static serving
-    'django.middleware.gzip.GZipMiddleware',  # Compress responses for faster loading
+    'myuganda.middleware.RangeAwareGZipMiddleware',  # Compress responses for faster loading (not byte-range media)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -312,6 +312,19 @@ else:
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Reel storage tiers (social.storage). LOCAL is always the server disk under
+# MEDIA_ROOT, whatever "default" is, and is served by social.media. ARCHIVE is
+# REELS_ARCHIVE_ROOT on disk (MEDIA_ROOT when unset); point REELS_ARCHIVE_BACKEND
+# at an object store backend to move cold reels off the server.
+STORAGES["reels_local"] = {
+    "BACKEND": "django.core.files.storage.FileSystemStorage",
+}
+STORAGES["reels_archive"] = {
+    "BACKEND": os.environ.get('REELS_ARCHIVE_BACKEND', 'django.core.files.storage.FileSystemStorage'),
+}
+if os.environ.get('REELS_ARCHIVE_ROOT'):
+    STORAGES["reels_archive"]["OPTIONS"] = {"location": os.environ['REELS_ARCHIVE_ROOT']}
 FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', str(10 * 1024 * 1024)))
 DATA_UPLOAD_MAX_MEMORY_SIZE = FILE_UPLOAD_MAX_MEMORY_SIZE
 
@@ -415,3 +428,18 @@ else:
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
+
+# --- REAL-TIME MESSAGING ---
+# Channel layer used by the websocket handler in myuganda.realtime. The in-memory
+# layer only reaches clients on the same ASGI worker; with REALTIME_REDIS_URL set,
+# RedisChannelLayer relays events between processes (required for more than one
+# worker, and for the separate websocket process production runs next to WSGI).
+ASGI_APPLICATION = 'myuganda.asgi.application'
+REALTIME_REDIS_URL = os.getenv('REALTIME_REDIS_URL') or os.getenv('REDIS_URL', '')
+REALTIME_CHANNEL_LAYER = os.getenv(
+    'REALTIME_CHANNEL_LAYER',
+    'myuganda.realtime.RedisChannelLayer' if REALTIME_REDIS_URL else 'myuganda.realtime.InMemoryChannelLayer',
+)
+# Concurrent ?wait=1 long-polls per WSGI process (each holds a request thread);
+# 0 answers at once and lets clients poll, the websocket being the live path.
+MESSAGE_LONG_POLL_MAX_WAITERS = int(os.getenv('MESSAGE_LONG_POLL_MAX_WAITERS', '0'))
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django import forms
-from .models import SocialProfile, BusinessReel, VideoEndorsement, SecureMessage
+from .models import SocialProfile, BusinessReel, VideoEndorsement, SecureMessage, ReelPromotion
+from .trust import recompute_all
 
 # --- CUSTOM WIDGETS/FORMS ---
 
@@ -62,8 +63,7 @@ class SocialProfileAdmin(admin.ModelAdmin):
 
     @admin.action(description="Recalculate selected Trust Scores")
     def recalculate_trust(self, request, queryset):
-        for profile in queryset:
-            profile.update_trust_score()
+        recompute_all(user_ids=queryset.values_list('user_id', flat=True))
         self.message_user(request, "Trust scores have been updated based on verified endorsements.")
 
 
@@ -179,3 +179,14 @@ class VideoEndorsementAdmin(admin.ModelAdmin):
     )
 
 
+
+
+@admin.register(ReelPromotion)
+class ReelPromotionAdmin(admin.ModelAdmin):
+    """
+    Track LOCAL -> CLOUDINARY promotions queued by promote_viral_reels.
+    """
+    list_display = ('reel', 'state', 'attempts', 'bytes_uploaded', 'total_bytes', 'updated_at')
+    list_filter = ('state',)
+    search_fields = ('reel__caption', 'public_id')
+    readonly_fields = ('upload_id', 'bytes_uploaded', 'total_bytes', 'public_id', 'last_error', 'updated_at')
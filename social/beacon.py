@@ -0,0 +1,121 @@
+"""
+Batched engagement beacon for the reel feed.
+
+The feed queues view/share/download events in the browser and posts them
+to social:track_events every few seconds (and with navigator.sendBeacon
+when the page is hidden), instead of one request per reel per event.
+sendBeacon cannot set headers, so the body is parsed as JSON whatever its
+Content-Type:
+
+    {"events": [{"type": "view", "reel": 12}, {"type": "share", "reel": 7}, ...]}
+
+A batch is validated and coalesced before anything is counted: malformed
+events are rejected individually, a view counts at most once per reel per
+batch (and is then deduplicated across batches by social.counters), and
+shares/downloads are capped per reel per batch. The coalesced deltas go
+into the write-behind buffer in social.counters.
+
+Like the per-event endpoints, the beacon needs a signed-in user. sendBeacon
+cannot send the CSRF header either, so is_same_origin() stands in for the
+token: the request's Origin (or Sec-Fetch-Site) must show it came from a
+page on this site.
+
+Likes stay on social:toggle_like: they change state rather than a counter,
+need CSRF protection and answer with the author's new trust score.
+"""
+import json
+from collections import Counter
+
+from django.conf import settings
+
+from . import counters as reel_counters
+
+MAX_BEACON_BYTES = 64 * 1024
+MAX_BEACON_EVENTS = 200
+MAX_REPEATS_PER_REEL = 5
+
+# Event type -> BusinessReel counter field
+EVENT_FIELDS = {
+    'view': 'views_count',
+    'share': 'share_count',
+    'download': 'download_count',
+}
+
+
+class BeaconError(ValueError):
+    """The batch as a whole is unusable (too large, not JSON, wrong shape)."""
+
+
+def is_same_origin(request):
+    """CSRF equivalent for beacons: Origin must be this site or a CSRF_TRUSTED_ORIGINS entry."""
+    origin = request.headers.get('Origin')
+    if origin is None:
+        # Browsers that omit Origin on same-origin requests still send fetch metadata
+        return request.headers.get('Sec-Fetch-Site') == 'same-origin'
+    if origin in getattr(settings, 'CSRF_TRUSTED_ORIGINS', []):
+        return True
+    return origin == f'{request.scheme}://{request.get_host()}'
+
+
+def parse_batch(body):
+    """Decode a beacon body into its list of raw events."""
+    if len(body) > MAX_BEACON_BYTES:
+        raise BeaconError('Beacon too large.')
+    try:
+        payload = json.loads(body or b'{}')
+    except (TypeError, ValueError):
+        raise BeaconError('Beacon is not valid JSON.')
+    events = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(events, list):
+        raise BeaconError('Beacon must carry a list of events.')
+    if len(events) > MAX_BEACON_EVENTS:
+        raise BeaconError(f'At most {MAX_BEACON_EVENTS} events per beacon.')
+    return events
+
+
+def coalesce(events):
+    """
+    Validate events and fold them into {(reel_id, event_type): count}.
+    Returns (coalesced, rejected) where rejected counts dropped events.
+    """
+    coalesced = Counter()
+    rejected = 0
+    for event in events:
+        if not isinstance(event, dict):
+            rejected += 1
+            continue
+        event_type, reel_id = event.get('type'), event.get('reel')
+        if isinstance(reel_id, str) and reel_id.isdigit():
+            reel_id = int(reel_id)
+        if (event_type not in EVENT_FIELDS
+                or not isinstance(reel_id, int) or isinstance(reel_id, bool) or reel_id <= 0):
+            rejected += 1
+            continue
+        limit = 1 if event_type == 'view' else MAX_REPEATS_PER_REEL
+        if coalesced[reel_id, event_type] >= limit:
+            continue
+        coalesced[reel_id, event_type] += 1
+    return coalesced, rejected
+
+
+def record_batch(coalesced, viewer):
+    """
+    Push coalesced events into the counter buffer.
+    Returns (accepted, rejected, {reel_id: approximate counts}); events for
+    reels that do not exist are rejected.
+    """
+    existing = reel_counters.prime({reel_id for reel_id, _ in coalesced})
+    accepted = rejected = 0
+    totals = {}
+    for (reel_id, event_type), count in coalesced.items():
+        if reel_id not in existing:
+            rejected += count
+            continue
+        if event_type == 'view':
+            counts, _ = reel_counters.record_view(reel_id, viewer)
+        else:
+            counts = reel_counters.record(reel_id, EVENT_FIELDS[event_type], count)
+        accepted += count
+        if counts is not None:
+            totals[reel_id] = counts
+    return accepted, rejected, totals
@@ -0,0 +1,212 @@
+"""
+Write-behind engagement counters for BusinessReel.
+
+View, share and download events are added to an in-process buffer instead
+of each costing an UPDATE plus a re-read. The buffer is flushed every
+FLUSH_INTERVAL seconds (or once MAX_PENDING_REELS reels are waiting) as
+one UPDATE ... SET field = field + delta per reel, so a burst of events on
+a popular reel becomes a single write. Every worker flushes only its own
+deltas, so totals stay exact across processes; what a response reports is
+the last flushed value this worker knows plus its own pending delta, which
+is approximate by design.
+
+Views are deduplicated per viewer and reel for VIEW_DEDUP_WINDOW seconds
+through the shared Django cache, so re-scrolling past a reel does not
+inflate its count.
+"""
+import atexit
+import hashlib
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BusinessReel
+
+COUNTER_FIELDS = ('views_count', 'share_count', 'download_count')
+FLUSH_INTERVAL = 5.0
+MAX_PENDING_REELS = 500
+KNOWN_REELS_LIMIT = 5000
+VIEW_DEDUP_WINDOW = 30 * 60  # 30 minutes
+
+_SNAPSHOT_FIELDS = ('id',) + COUNTER_FIELDS + ('storage_tier',)
+
+
+class ReelCounterBuffer:
+    """Pending per-reel deltas plus the last flushed counts seen by this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(Counter)
+        self._known = OrderedDict()
+        self._timer = None
+
+    def _remember(self, rows):
+        for row in rows:
+            self._known[row['id']] = row
+            self._known.move_to_end(row['id'])
+        while len(self._known) > KNOWN_REELS_LIMIT:
+            self._known.popitem(last=False)
+
+    def _snapshot(self, reel_id):
+        """Flushed counts for reel_id, read from the database the first time this process sees it."""
+        with self._lock:
+            known = self._known.get(reel_id)
+        if known is None:
+            known = BusinessReel.objects.filter(id=reel_id).values(*_SNAPSHOT_FIELDS).first()
+            if known is None:
+                return None
+            with self._lock:
+                self._remember([known])
+        return known
+
+    def prime(self, reel_ids):
+        """Load snapshots for any of reel_ids this process has not seen, in one query. Returns the ids that exist."""
+        with self._lock:
+            missing = [reel_id for reel_id in reel_ids if reel_id not in self._known]
+        if missing:
+            rows = list(BusinessReel.objects.filter(id__in=missing).values(*_SNAPSHOT_FIELDS))
+            with self._lock:
+                self._remember(rows)
+        with self._lock:
+            return {reel_id for reel_id in reel_ids if reel_id in self._known}
+
+    def approximate(self, reel_id):
+        """Flushed counts plus this process's pending deltas, or None for an unknown reel."""
+        known = self._snapshot(reel_id)
+        if known is None:
+            return None
+        with self._lock:
+            pending = self._pending.get(reel_id, Counter())
+            return {**known, **{field: known[field] + pending[field] for field in COUNTER_FIELDS}}
+
+    def add(self, reel_id, field, amount=1):
+        """Buffer an increment. Returns the approximate counts, or None if the reel does not exist."""
+        if field not in COUNTER_FIELDS:
+            raise ValueError(f'Unknown reel counter: {field}')
+        if self._snapshot(reel_id) is None:
+            return None
+        with self._lock:
+            self._pending[reel_id][field] += amount
+            backlog = len(self._pending)
+        if backlog >= MAX_PENDING_REELS:
+            self.flush()
+        else:
+            self._schedule()
+        return self.approximate(reel_id)
+
+    def _schedule(self):
+        if not getattr(settings, 'REEL_COUNTERS_ASYNC', True):
+            return
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(getattr(settings, 'REEL_COUNTER_FLUSH_INTERVAL', FLUSH_INTERVAL),
+                                          self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_in_background(self):
+        close_old_connections()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Reel counter flush failed: {e}")
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Write all pending deltas to the database. Returns the number of reels updated."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(Counter)
+            self._timer = None
+        if not pending:
+            return 0
+        try:
+            now = timezone.now()
+            with transaction.atomic():
+                for reel_id, deltas in pending.items():
+                    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+                    if deltas['views_count'] > 0:
+                        # Activity signal for the storage policy (social.storage)
+                        updates['recent_views'] = F('recent_views') + deltas['views_count']
+                        updates['last_viewed_at'] = now
+                    if updates:
+                        BusinessReel.objects.filter(id=reel_id).update(**updates)
+        except Exception:
+            # Put the deltas back so the next flush retries them
+            with self._lock:
+                for reel_id, deltas in pending.items():
+                    self._pending[reel_id].update(deltas)
+            raise
+        rows = BusinessReel.objects.filter(id__in=list(pending)).values(*_SNAPSHOT_FIELDS)
+        with self._lock:
+            self._remember(rows)
+        return len(pending)
+
+    def reset(self):
+        """Drop pending deltas and known counts without writing them (tests)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._pending.clear()
+            self._known.clear()
+
+
+_buffer = ReelCounterBuffer()
+atexit.register(_buffer._flush_in_background)
+
+
+def viewer_key(request):
+    """
+    Dedup key for views. Anonymous viewers use their existing session, or
+    else a hash of address and user agent: saving a session just to get a
+    key would write a django_session row per cookie-less request.
+    """
+    if request.user.is_authenticated:
+        return f'u{request.user.id}'
+    if request.session.session_key:
+        return f's{request.session.session_key}'
+    fingerprint = f"{request.META.get('REMOTE_ADDR', '')}|{request.headers.get('User-Agent', '')}"
+    return 'a' + hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+
+
+def record(reel_id, field, amount=1):
+    return _buffer.add(reel_id, field, amount)
+
+
+def record_view(reel_id, viewer):
+    """
+    Count a view unless this viewer already viewed the reel within
+    VIEW_DEDUP_WINDOW. Returns (approximate counts or None, counted).
+    """
+    try:
+        first_view = cache.add(f'social_reel_view_{reel_id}_{viewer}', 1, VIEW_DEDUP_WINDOW)
+    except Exception as e:
+        print(f"Cache add failed: {e}")
+        first_view = True
+    if not first_view:
+        return _buffer.approximate(reel_id), False
+    counts = _buffer.add(reel_id, 'views_count')
+    return counts, counts is not None
+
+
+def approximate(reel_id):
+    return _buffer.approximate(reel_id)
+
+
+def prime(reel_ids):
+    return _buffer.prime(reel_ids)
+
+
+def flush():
+    return _buffer.flush()
+
+
+def reset():
+    _buffer.reset()
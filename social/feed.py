@@ -0,0 +1,118 @@
+"""
+Cursor-paginated reel feed for social.FeedView.
+
+The feed is read one page of REEL_PAGE_SIZE reels at a time, so the first
+response and every page after it cost the same no matter how many reels
+exist. Two orderings are served:
+
+- 'for_you' (default): the precomputed ranking in social.ranking, paged by
+  (score, reel id) and re-ranked per viewer within each page
+- 'latest': newest first, paged by (created_at, id)
+
+The cursor is signed, opaque to the client and carries the ordering; a
+missing or tampered cursor starts from the top.
+"""
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import BooleanField, Exists, F, OuterRef, Q, Value
+
+from .models import BusinessReel
+from .ranking import ranked_page
+
+REEL_PAGE_SIZE = 8
+REEL_PAGE_SIZE_MAX = 30
+FEED_MODES = ('for_you', 'latest')
+CURSOR_SALT = 'social.feed.cursor'
+
+
+def encode_cursor(mode, position):
+    return signing.dumps({'m': mode, 'p': position}, salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    """Return (mode, position), or (None, None) for a missing/tampered cursor."""
+    if not token:
+        return None, None
+    try:
+        state = signing.loads(token, salt=CURSOR_SALT)
+        mode, position = state['m'], list(state['p'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None, None
+    if mode not in FEED_MODES or len(position) != 2:
+        return None, None
+    return mode, position
+
+
+def feed_queryset(user=None):
+    """Active reels with author/profile joined and like totals/state annotated (no per-reel queries)."""
+    Likes = BusinessReel.likes.through
+    if user is not None and user.is_authenticated:
+        liked_by_me = Exists(Likes.objects.filter(businessreel=OuterRef('pk'), customuser=user))
+    else:
+        liked_by_me = Value(False, output_field=BooleanField())
+
+    return BusinessReel.objects.filter(is_active=True).select_related(
+        'author',
+        'author__social_profile'
+    ).annotate(
+        like_total=F('like_count'),
+        liked_by_me=liked_by_me,
+    )
+
+
+def _latest_page(queryset, position, page_size):
+    if position:
+        created_at, reel_id = datetime.fromisoformat(position[0]), position[1]
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=reel_id))
+    reels = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+    next_position = None
+    if len(reels) > page_size:
+        last = reels[page_size - 1]
+        next_position = [last.created_at.isoformat(), last.id]
+    return reels[:page_size], next_position
+
+
+def feed_page(user=None, cursor=None, page_size=REEL_PAGE_SIZE, mode='for_you'):
+    """
+    One page of the reel feed. mode only applies to the first page; later
+    pages keep the ordering recorded in their cursor.
+    Returns (reels, next_cursor); next_cursor is None on the last page.
+    """
+    cursor_mode, position = decode_cursor(cursor)
+    mode = cursor_mode or (mode if mode in FEED_MODES else 'for_you')
+    queryset = feed_queryset(user)
+
+    if mode == 'for_you':
+        language = getattr(user, 'language', None) if user is not None and user.is_authenticated else None
+        reels, next_position = ranked_page(queryset, position, page_size, language)
+        if not reels and next_position is None and position is None:
+            # Nothing ranked yet (rank_reels has not run): serve the latest reels instead
+            mode = 'latest'
+    if mode == 'latest':
+        reels, next_position = _latest_page(queryset, position, page_size)
+
+    next_cursor = encode_cursor(mode, next_position) if next_position else None
+    return reels, next_cursor
+
+
+def serialize_reel(reel):
+    """JSON shape of a reel for API clients of the paged feed."""
+    profile = getattr(reel.author, 'social_profile', None)
+    return {
+        'id': reel.id,
+        'author': reel.author.username,
+        'author_id': reel.author_id,
+        'caption': reel.caption,
+        'video_url': reel.source_video_url,
+        'thumbnail_url': reel.source_thumbnail_url,
+        'is_external': reel.is_external_video,
+        'price': str(reel.price) if reel.price is not None else None,
+        'currency': reel.currency,
+        'likes': reel.like_total,
+        'liked': reel.liked_by_me,
+        'share_count': reel.share_count,
+        'download_count': reel.download_count,
+        'trust_score': profile.trust_score if profile else None,
+        'created_at': reel.created_at.isoformat(),
+    }
@@ -0,0 +1,79 @@
+"""
+Like counters for business reels.
+
+BusinessReel.like_count mirrors the size of the likes relation and
+SocialProfile.reel_likes_count the likes across all of a creator's reels,
+so the feed, ranking and trust score never COUNT the join table. Both are
+applied as F() deltas from the m2m_changed signal. Django reports the
+requested ids on remove/clear rather than the rows actually deleted, so
+pre_remove/pre_clear first look up which likes exist (an indexed lookup on
+the (reel, user) unique constraint) and post_* apply exactly those.
+"""
+from collections import Counter
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import trust
+from .models import BusinessReel, SocialProfile
+
+Likes = BusinessReel.likes.through
+
+
+def existing_likes(reel_ids=None, user_ids=None):
+    """{reel_id: number of existing likes} for the given reels and/or users."""
+    rows = Likes.objects.all()
+    if reel_ids is not None:
+        rows = rows.filter(businessreel_id__in=list(reel_ids))
+    if user_ids is not None:
+        rows = rows.filter(customuser_id__in=list(user_ids))
+    return Counter(dict(rows.order_by().values('businessreel_id').annotate(total=Count('pk'))
+                        .values_list('businessreel_id', 'total')))
+
+
+def apply_like_deltas(reel_deltas):
+    """Apply {reel_id: delta} to the reels' like_count and their authors' rollups, then mark authors dirty."""
+    reel_deltas = {reel_id: delta for reel_id, delta in reel_deltas.items() if delta}
+    if not reel_deltas:
+        return
+    by_delta = {}
+    for reel_id, delta in reel_deltas.items():
+        by_delta.setdefault(delta, []).append(reel_id)
+    for delta, reel_ids in by_delta.items():
+        BusinessReel.objects.filter(pk__in=reel_ids).update(like_count=F('like_count') + delta)
+
+    author_deltas = Counter()
+    for reel_id, author_id in BusinessReel.objects.filter(pk__in=list(reel_deltas)).values_list('id', 'author_id'):
+        author_deltas[author_id] += reel_deltas[reel_id]
+    for author_id, delta in author_deltas.items():
+        if delta:
+            SocialProfile.objects.filter(user_id=author_id).update(reel_likes_count=F('reel_likes_count') + delta)
+    trust.mark_likes_changed(author_deltas)
+
+
+def recount_author_likes(user_ids=None):
+    """
+    Set reel_likes_count from the join table inside one UPDATE, so the count
+    is taken by the database at write time and never replaces a concurrent
+    F() delta with a value read earlier. Returns the number of profiles updated.
+    """
+    author_totals = (
+        Likes.objects.filter(businessreel__author=OuterRef('user'))
+        .order_by().values('businessreel__author').annotate(total=Count('pk')).values('total')
+    )
+    profiles = SocialProfile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return profiles.update(reel_likes_count=Coalesce(Subquery(author_totals, output_field=IntegerField()), 0))
+
+
+def recount_likes():
+    """Recompute like_count and reel_likes_count from the join table (after bulk imports or raw SQL)."""
+    like_totals = (
+        Likes.objects.filter(businessreel=OuterRef('pk'))
+        .order_by().values('businessreel').annotate(total=Count('pk')).values('total')
+    )
+    reels = BusinessReel.objects.update(
+        like_count=Coalesce(Subquery(like_totals, output_field=IntegerField()), 0)
+    )
+    return reels, recount_author_likes()
@@ -0,0 +1,67 @@
+"""
+Management Command: Manage Reel Storage
+Purpose: Apply the reel storage policy - promote hot reels, archive cold
+ones, keep local disk under budget - and report bytes per tier.
+
+Usage:
+    python manage.py manage_reel_storage
+    python manage.py manage_reel_storage --budget-gb 50
+    python manage.py manage_reel_storage --dry-run          # Show the plan without moving anything
+
+Promotions are queued here and uploaded by promote_viral_reels; see
+social.storage for the thresholds (overridable as REEL_* settings). Runs as:
+    - Manual command
+    - Scheduled cron job (e.g., hourly via system cron, before promote_viral_reels)
+"""
+
+from django.core.management.base import BaseCommand
+
+from social import storage
+
+
+def _human(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f'{size:.1f}{unit}' if unit != 'B' else f'{size}B'
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = "Promote, archive and evict reel videos according to recent view velocity and the local disk budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-gb', type=float, default=None,
+                            help='Local disk budget for reels/staging/ in GB (default: REEL_LOCAL_DISK_BUDGET).')
+        parser.add_argument('--max-actions', type=int, default=storage.MAX_ACTIONS,
+                            help=f'Most tier moves to make in one run (default: {storage.MAX_ACTIONS}).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Preview changes without executing (test mode).')
+
+    def handle(self, *args, **options):
+        budget = int(options['budget_gb'] * 1024 ** 3) if options['budget_gb'] is not None else None
+
+        if not options['dry_run']:
+            updated = storage.update_velocities()
+            self.stdout.write(f'📈 Updated view velocity for {updated} reel(s).')
+
+        actions = storage.plan(budget=budget, max_actions=options['max_actions'])
+        for action, reel, reason in actions:
+            self.stdout.write(f'  {action.upper():8} reel {reel.id} [{reel.storage_tier}] - {reason}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Mode: DRY-RUN (no changes applied) - {len(actions)} move(s) planned'))
+        elif actions:
+            results = storage.apply(actions)
+            style = self.style.WARNING if results.get('failed') else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{"⚠️" if results.get("failed") else "✅"} Promotions queued: {results.get(storage.PROMOTE, 0)}, '
+                f'restored: {results.get(storage.RESTORE, 0)}, archived: {results.get(storage.ARCHIVE, 0)}, '
+                f'failed: {results.get("failed", 0)}'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Storage tiers already match the policy.'))
+
+        self.stdout.write('\n' + '='*70)
+        for tier, totals in storage.tier_report().items():
+            self.stdout.write(f'{tier:12} {totals["reels"]:>8} reel(s) {_human(totals["bytes"]):>12}')
+        self.stdout.write('='*70)
@@ -5,20 +5,27 @@ Purpose: Automatically migrate high-engagement videos from local server disk to
 Usage:
     python manage.py promote_viral_reels                    # Default: 50 views threshold
     python manage.py promote_viral_reels --threshold 100    # Custom threshold
+    python manage.py promote_viral_reels --workers 8 --rate 10
+    python manage.py promote_viral_reels --retry-failed     # Give FAILED reels another round of attempts
     python manage.py promote_viral_reels --dry-run          # Preview changes without executing
 
 This implements Tier 3 migration (LOCAL → CLOUDINARY) for sustainable platform growth.
+Eligible reels are queued as ReelPromotion rows and uploaded in parallel,
+in resumable chunks (see social.promotion): an interrupted run picks up
+where it stopped, and reels that keep failing are marked FAILED after
+MAX_ATTEMPTS tries.
 Runs as:
     - Manual command
     - Scheduled cron job (e.g., daily via celery-beat or system cron)
 """
 
 import os
-import sys
-from django.core.management.base import BaseCommand, CommandError
+
 from django.conf import settings
-from django.db.models import F
-from social.models import BusinessReel
+from django.core.management.base import BaseCommand, CommandError
+
+from social import promotion
+from social.models import ReelPromotion
 
 try:
     import cloudinary
@@ -35,8 +42,37 @@ class Command(BaseCommand):
         parser.add_argument(
             '--threshold',
             type=int,
-            default=50,
-            help='Minimum views required to promote a video (default: 50).'
+            default=promotion.DEFAULT_THRESHOLD,
+            help=f'Minimum views required to promote a video (default: {promotion.DEFAULT_THRESHOLD}).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=promotion.DEFAULT_WORKERS,
+            help=f'Concurrent uploads (default: {promotion.DEFAULT_WORKERS}).'
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=promotion.DEFAULT_RATE,
+            help=f'Max upload parts per second across all workers, 0 for no limit (default: {promotion.DEFAULT_RATE}).'
+        )
+        parser.add_argument(
+            '--chunk-mb',
+            type=int,
+            default=promotion.CHUNK_SIZE // (1024 * 1024),
+            help='Upload part size in MB (default: %(default)s; Cloudinary requires at least 5).'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Promote at most this many reels in this run.'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Re-queue FAILED promotions with a fresh set of attempts.'
         )
         parser.add_argument(
             '--dry-run',
@@ -45,30 +81,31 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        threshold = options.get('threshold', 50)
-        dry_run = options.get('dry_run', False)
+        threshold = options['threshold']
+        dry_run = options['dry_run']
+        backend_name = getattr(settings, 'REEL_PROMOTION_BACKEND', 'cloudinary')
 
         # Verify Cloudinary is configured
-        if not CLOUDINARY_AVAILABLE:
-            raise CommandError(
-                "cloudinary package not installed. "
-                "Run: pip install cloudinary"
-            )
+        if backend_name == 'cloudinary':
+            if not CLOUDINARY_AVAILABLE:
+                raise CommandError(
+                    "cloudinary package not installed. "
+                    "Run: pip install cloudinary"
+                )
 
-        if not hasattr(settings, 'CLOUDINARY_STORAGE'):
-            raise CommandError(
-                "CLOUDINARY_STORAGE not configured in settings.py. "
-                "Set up Cloudinary credentials first."
-            )
+            if not hasattr(settings, 'CLOUDINARY_STORAGE'):
+                raise CommandError(
+                    "CLOUDINARY_STORAGE not configured in settings.py. "
+                    "Set up Cloudinary credentials first."
+                )
 
-        # Find LOCAL reels that have exceeded the views threshold
-        viral_reels = BusinessReel.objects.filter(
-            storage_tier='LOCAL',
-            views_count__gte=threshold,
-            local_video__isnull=False
-        ).exclude(local_video='')
+        if dry_run:
+            self._preview(threshold)
+            return
 
-        if not viral_reels.exists():
+        queued = promotion.enqueue(threshold, retry_failed=options['retry_failed'])
+        pending = ReelPromotion.objects.filter(state=ReelPromotion.QUEUED).count()
+        if not pending:
             self.stdout.write(
                 self.style.SUCCESS(
                     f'✅ No reels found with {threshold}+ views. Platform is healthy!'
@@ -78,105 +115,55 @@ class Command(BaseCommand):
 
         self.stdout.write(
             self.style.WARNING(
-                f'🔍 Found {viral_reels.count()} reel(s) eligible for CDN promotion...'
+                f'🔍 {pending} reel(s) queued for CDN promotion ({queued} newly queued), '
+                f'{options["workers"]} worker(s)...'
             )
         )
 
-        promoted_count = 0
-        failed_reels = []
-
-        for reel in viral_reels:
-            try:
-                self.stdout.write(
-                    f'\n📹 Processing: "{reel.caption[:50]}" '
-                    f'({reel.views_count} views, {reel.author.username})'
-                )
-
-                # Skip if already promoted
-                if reel.storage_tier == 'CLOUDINARY' and reel.cloudinary_public_id:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            '  ⚠️  Already on Cloudinary CDN. Skipping.'
-                        )
-                    )
-                    continue
-
-                # Get local file path
-                local_path = reel.local_video.path
-                if not os.path.exists(local_path):
-                    self.stdout.write(
-                        self.style.ERROR(
-                            f'  ❌ Local file missing: {local_path}'
-                        )
-                    )
-                    failed_reels.append(reel.id)
-                    continue
-
-                if dry_run:
-                    file_size_mb = os.path.getsize(local_path) / (1024 * 1024)
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'  ✅ [DRY-RUN] Would upload {file_size_mb:.1f}MB to Cloudinary'
-                        )
-                    )
-                    promoted_count += 1
-                    continue
-
-                # Upload to Cloudinary
-                file_size_mb = os.path.getsize(local_path) / (1024 * 1024)
-                self.stdout.write(f'  📤 Uploading {file_size_mb:.1f}MB to Cloudinary...')
-
-                result = cloudinary.uploader.upload_video(
-                    local_path,
-                    folder='viral_reels_production/',
-                    resource_type='video',
-                    public_id=f"reel_{reel.id}_{reel.share_token}",
-                    overwrite=False,
-                    invalidate=True  # Invalidate CDN cache if re-uploading
-                )
-
-                # Update reel with Cloudinary public ID
-                reel.cloudinary_public_id = result['public_id']
-                reel.storage_tier = 'CLOUDINARY'
-                reel.save(update_fields=['cloudinary_public_id', 'storage_tier'])
-
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'  ✅ Promoted to CDN: {result["secure_url"]}'
-                    )
-                )
-
-                # Clean up local file
-                try:
-                    reel.local_video.delete(save=False)  # Delete FileField
-                    if os.path.exists(local_path):
-                        os.remove(local_path)  # Delete physical file if it still exists
-                    self.stdout.write('  🗑️  Cleaned up local storage')
-                except Exception as cleanup_error:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f'  ⚠️  Cleanup error (non-critical): {cleanup_error}'
-                        )
-                    )
-
-                promoted_count += 1
-
-            except Exception as error:
-                self.stdout.write(
-                    self.style.ERROR(f'  ❌ Error: {str(error)}')
-                )
-                failed_reels.append(reel.id)
+        def progress(promotion_id, state):
+            style = self.style.SUCCESS if state == ReelPromotion.DONE else self.style.ERROR
+            self.stdout.write(style(f'  {"✅" if state == ReelPromotion.DONE else "❌"} Promotion {promotion_id}: {state}'))
+
+        summary = promotion.run(
+            backend=promotion.get_backend(backend_name),
+            workers=options['workers'],
+            rate=options['rate'],
+            chunk_size=options['chunk_mb'] * 1024 * 1024,
+            limit=options['limit'],
+            progress=progress,
+        )
 
         # Summary Report
         self.stdout.write('\n' + '='*70)
         self.stdout.write(self.style.SUCCESS(f'✅ PROMOTION SUMMARY'))
         self.stdout.write('='*70)
-        self.stdout.write(f'Promoted to CDN: {promoted_count} reel(s)')
-        if failed_reels:
+        self.stdout.write(f'Promoted to CDN: {summary.get(ReelPromotion.DONE, 0)} reel(s)')
+        retrying = summary.get(ReelPromotion.QUEUED, 0)
+        if retrying:
+            self.stdout.write(self.style.WARNING(f'Will retry next run: {retrying} reel(s)'))
+        failed = list(
+            ReelPromotion.objects.filter(state=ReelPromotion.FAILED).values_list('reel_id', flat=True)[:50]
+        )
+        if failed:
             self.stdout.write(
-                self.style.ERROR(f'Failed: {len(failed_reels)} reel(s) (IDs: {failed_reels})')
+                self.style.ERROR(f'Failed: {len(failed)} reel(s) (IDs: {failed}); use --retry-failed')
             )
         self.stdout.write(f'Threshold: {threshold} views')
-        if dry_run:
-            self.stdout.write(self.style.WARNING('Mode: DRY-RUN (no changes applied)'))
         self.stdout.write('='*70)
+
+    def _preview(self, threshold):
+        reels = promotion.eligible_reels(threshold).filter(promotion__isnull=True)
+        count = 0
+        for reel in reels.select_related('author').iterator():
+            count += 1
+            try:
+                size = f'{os.path.getsize(reel.local_video.path) / (1024 * 1024):.1f}MB'
+            except (OSError, ValueError, NotImplementedError):
+                size = 'missing file'
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'  ✅ [DRY-RUN] Would upload "{reel.caption[:50]}" '
+                    f'({reel.views_count} views, {reel.author.username}, {size})'
+                )
+            )
+        self.stdout.write(self.style.WARNING(f'Mode: DRY-RUN (no changes applied) - {count} reel(s) eligible'))
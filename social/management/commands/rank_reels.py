@@ -0,0 +1,35 @@
+"""
+Management Command: Rank Reels
+Purpose: Rebuild the precomputed "For You" candidate table that the reel
+feed pages through.
+
+Usage:
+    python manage.py rank_reels
+    python manage.py rank_reels --pool 10000
+
+Scores every active reel from views, likes, shares, downloads, author trust
+and recency (see social.ranking) and keeps the top --pool reels. Runs as:
+    - Manual command
+    - Scheduled cron job (e.g., every 15 minutes via system cron)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.ranking import CANDIDATE_POOL_SIZE, rebuild_candidates
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ranked For You reel candidate table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool', type=int, default=CANDIDATE_POOL_SIZE,
+                            help=f'Number of top reels to keep (default: {CANDIDATE_POOL_SIZE}).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild_candidates(options['pool'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Ranked {written} reel candidate(s) in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,37 @@
+"""
+Management Command: Recompute Trust Scores
+Purpose: Recompute and re-seal every creator's trust score in bulk.
+
+Usage:
+    python manage.py recompute_trust_scores
+    python manage.py recompute_trust_scores --batch-size 5000
+
+Recounts the like rollup in one UPDATE, counts verified endorsements per
+professional with one grouped query, scores whole batches at once and writes
+only the profiles whose score or seal changed (see social.trust). Runs as:
+    - Manual command (after bulk imports or a change to the scoring rules)
+    - Scheduled cron job (e.g., nightly via system cron)
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from social.trust import BATCH_SIZE, recompute_all
+
+
+class Command(BaseCommand):
+    help = "Recompute every SocialProfile trust score and signature in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help=f'Profiles scored and written per batch (default: {BATCH_SIZE}).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        scored, written = recompute_all(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        rate = scored / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Scored {scored} profile(s), updated {written}, in {elapsed:.2f}s ({rate:,.0f} profiles/sec).'
+        ))
@@ -0,0 +1,73 @@
+"""
+Management Command: Transcode Reels
+Purpose: Build adaptive HLS renditions and a poster frame for local reels
+whose transcoding never finished, or retry failed ones.
+
+Usage:
+    python manage.py transcode_reels
+    python manage.py transcode_reels --limit 100
+    python manage.py transcode_reels --stale-minutes 60
+    python manage.py transcode_reels --retry-failed
+    python manage.py transcode_reels --all
+
+New uploads are transcoded automatically after they are saved, in a pool
+inside the web worker. A recycled worker (gunicorn --max-requests) loses
+whatever was still queued or running there, so by default this picks up
+local reels that were never transcoded or are left PENDING/PROCESSING for
+longer than --stale-minutes (younger ones are still in flight). FAILED reels
+are skipped, since ffmpeg would most likely fail on them again every run;
+--retry-failed includes them. Needs ffmpeg and ffprobe on PATH
+(or FFMPEG_BINARY / FFPROBE_BINARY in settings). Runs as:
+    - Scheduled cron job (e.g. every 5 minutes)
+    - Manual command with --all after changing the rendition ladder
+"""
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from social.models import BusinessReel
+from social.transcode import TRANSCODE_TIMEOUT, ffmpeg_available, transcode_reel
+
+# Longer than one ffmpeg run may take, so a live PROCESSING row is never picked up
+STALE_MINUTES = TRANSCODE_TIMEOUT // 60 + 15
+
+
+class Command(BaseCommand):
+    help = "Transcode local reels into multi-bitrate HLS renditions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help='Maximum reels to transcode')
+        parser.add_argument('--all', action='store_true', help='Re-transcode reels that are already READY')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry reels whose transcode FAILED')
+        parser.add_argument('--stale-minutes', type=int, default=STALE_MINUTES,
+                            help=f'Leave PENDING/PROCESSING reels updated more recently than this alone '
+                                 f'(default: {STALE_MINUTES}).')
+
+    def handle(self, *args, **options):
+        if not ffmpeg_available():
+            raise CommandError("ffmpeg/ffprobe not found. Install ffmpeg or set FFMPEG_BINARY and FFPROBE_BINARY.")
+
+        pending = BusinessReel.objects.exclude(local_video='').exclude(local_video__isnull=True).order_by('id')
+        if not options['all']:
+            cutoff = timezone.now() - timedelta(minutes=options['stale_minutes'])
+            done = ['READY'] if options['retry_failed'] else ['READY', 'FAILED']
+            pending = pending.exclude(transcode_status__in=done).exclude(
+                Q(transcode_status__in=['PENDING', 'PROCESSING']) & Q(transcode_updated_at__gt=cutoff)
+            )
+        reel_ids = list(pending.values_list('id', flat=True))
+        if options['limit']:
+            reel_ids = reel_ids[:options['limit']]
+
+        transcoded = failed = 0
+        for reel_id in reel_ids:
+            try:
+                transcode_reel(reel_id)
+                transcoded += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'⚠️ Reel {reel_id}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Transcoded {transcoded} reel(s), {failed} failed.'))
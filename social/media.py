@@ -0,0 +1,181 @@
+"""
+Byte-range and cache-friendly delivery of locally stored reel files.
+
+LOCAL and ARCHIVE reels (the MP4, its HLS playlists and segments, and the
+poster frame) used to be served straight from MEDIA_URL, i.e. by static()
+in development and by whatever the deployment put in front of /media/,
+with no guarantee of Range support or useful cache headers. reel_media_url()
+now points them at the social:reel_media view instead:
+
+    /social/reel/<reel id>/media/<version>/<storage name>
+
+The version is the file's mtime (for HLS files, the master playlist's), so
+the URL changes whenever the content can have changed and every response
+is sent with Cache-Control: immutable. A request for an out-of-date version
+is redirected to the current one. Responses carry a strong ETag and
+Last-Modified, answer If-None-Match/If-Modified-Since with 304, honour a
+single Range (206/416) unless If-Range no longer matches, and use
+FileResponse whenever the body runs to the end of the file so the WSGI
+server's file_wrapper can send it with sendfile(). Set
+REEL_MEDIA_SENDFILE to 'x-accel-redirect' (nginx, with
+REEL_MEDIA_ACCEL_PREFIX as the internal location mapped to MEDIA_ROOT) or
+'x-sendfile' (Apache/lighttpd) to hand the body to the front-end server
+after the checks here.
+
+Files on non-filesystem storage keep their storage URL; the CDN handles
+ranges and caching there. A file that is missing from the server disk is
+linked on the default storage, where reels were saved before the LOCAL
+tier was pinned to the disk.
+"""
+import os
+import posixpath
+import urllib.parse
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from hotel.attachments import iter_range, parse_range
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Inactive reels are only visible to their author, so shared caches must not keep them
+PRIVATE_IMMUTABLE = 'private, max-age=31536000, immutable'
+CONTENT_TYPES = {
+    '.mp4': 'video/mp4',
+    '.m4s': 'video/iso.segment',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+    '.jpg': 'image/jpeg',
+    '.webm': 'video/webm',
+}
+
+
+def local_path(field_file):
+    """Filesystem path of a stored file, or None for remote storage."""
+    try:
+        return field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        return None
+
+
+def file_version(path):
+    return f'{os.stat(path).st_mtime_ns:x}'
+
+
+def reel_media_url(reel, field_file):
+    """URL of one of the reel's files: through social:reel_media when stored locally, else its storage URL."""
+    path = local_path(field_file)
+    if path is None:
+        return field_file.url
+    try:
+        version = file_version(path)
+    except OSError:
+        # Saved to the default storage before reel files were pinned to the
+        # server disk, and not copied over (see migration 0025)
+        return default_storage.url(field_file.name)
+    return reverse('social:reel_media', args=[reel.id, version, field_file.name])
+
+
+def resolve(reel, name):
+    """
+    The reel's file field that name belongs to, or None. HLS renditions are
+    only listed in the master playlist, so anything under its directory
+    belongs to hls_manifest.
+    """
+    for field_file in (reel.local_video, reel.archived_video, reel.poster_frame):
+        if field_file and field_file.name == name:
+            return field_file
+    if reel.hls_manifest:
+        hls_dir = posixpath.dirname(reel.hls_manifest.name) + '/'
+        if name == reel.hls_manifest.name or (name.startswith(hls_dir) and '..' not in name.split('/')):
+            return reel.hls_manifest
+    return None
+
+
+def etag_for(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        # Weak comparison: a gzipped W/ copy of the ETag still counts
+        tags = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+        return '*' in tags or etag in tags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+    return since is not None and int(mtime) <= since
+
+
+def _range_allowed(request, etag, mtime):
+    """If-Range: the client's partial copy must still be this exact file."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    # A date validator only matches when it is exactly the Last-Modified date
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def _sendfile_response(path, name, content_type):
+    mode = (getattr(settings, 'REEL_MEDIA_SENDFILE', '') or '').lower()
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'REEL_MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + urllib.parse.quote(name)
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def media_response(request, path, name, cache_control=IMMUTABLE):
+    """Serve path with validators, conditional GETs and single byte ranges."""
+    stat = os.stat(path)
+    etag = etag_for(stat)
+    content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'application/octet-stream')
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return finish(HttpResponseNotModified())
+
+    # The front-end server does ranges itself once it has the file
+    response = _sendfile_response(path, name, content_type)
+    if response is not None:
+        return finish(response)
+
+    size = stat.st_size
+    byte_range = None
+    if request.method == 'GET' and _range_allowed(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+    if not byte_range:
+        return finish(FileResponse(open(path, 'rb'), content_type=content_type))
+
+    start, end = byte_range
+    if end == size - 1:
+        # Open-ended ranges (how players seek) can still go through file_wrapper/sendfile:
+        # FileResponse sends from the current position to the end of the file
+        handle = open(path, 'rb')
+        handle.seek(start)
+        response = FileResponse(handle, status=206, content_type=content_type)
+    else:
+        response = StreamingHttpResponse(iter_range(open(path, 'rb'), start, end - start + 1), status=206,
+                                         content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return finish(response)
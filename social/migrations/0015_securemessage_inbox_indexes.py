@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0014_remove_youtubevideo_channel_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='securemessage',
+            index=models.Index(fields=['sender', '-timestamp'], name='social_secmsg_sender_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='securemessage',
+            index=models.Index(fields=['recipient', '-timestamp'], name='social_secmsg_recipient_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0015_securemessage_inbox_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='businessreel',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='social_reel_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def rank_existing_reels(apps, schema_editor):
+    # Same formula as social.ranking; rank_reels refreshes it from here on
+    from social.ranking import CANDIDATE_POOL_SIZE, base_score
+
+    BusinessReel = apps.get_model('social', 'BusinessReel')
+    SocialProfile = apps.get_model('social', 'SocialProfile')
+    ReelCandidate = apps.get_model('social', 'ReelCandidate')
+    trust = dict(SocialProfile.objects.values_list('user_id', 'trust_score'))
+    now = timezone.now()
+    candidates = [
+        ReelCandidate(
+            reel_id=reel.id,
+            author_id=reel.author_id,
+            language=reel.language or 'en',
+            score=base_score(reel.views_count, reel.like_total, reel.share_count, reel.download_count,
+                             trust.get(reel.author_id), reel.created_at, now),
+        )
+        for reel in BusinessReel.objects.filter(is_active=True).annotate(like_total=Count('likes')).iterator()
+    ]
+    candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+    ReelCandidate.objects.bulk_create(candidates[:CANDIDATE_POOL_SIZE], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0016_reel_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReelCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(default='en', max_length=10)),
+                ('score', models.FloatField(default=0.0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('reel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ranking', to='social.businessreel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score', '-reel'], name='social_reelcand_rank_idx')],
+            },
+        ),
+        migrations.RunPython(rank_existing_reels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:58
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_like_counters(apps, schema_editor):
+    BusinessReel = apps.get_model('social', 'BusinessReel')
+    SocialProfile = apps.get_model('social', 'SocialProfile')
+    Likes = BusinessReel.likes.through
+    reel_totals = (
+        Likes.objects.filter(businessreel=OuterRef('pk'))
+        .order_by().values('businessreel').annotate(total=Count('pk')).values('total')
+    )
+    BusinessReel.objects.update(like_count=Coalesce(Subquery(reel_totals, output_field=IntegerField()), 0))
+    author_totals = (
+        Likes.objects.filter(businessreel__author=OuterRef('user'))
+        .order_by().values('businessreel__author').annotate(total=Count('pk')).values('total')
+    )
+    SocialProfile.objects.update(
+        reel_likes_count=Coalesce(Subquery(author_totals, output_field=IntegerField()), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0017_reel_candidates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessreel',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='socialprofile',
+            name='reel_likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_like_counters, migrations.RunPython.noop),
+    ]
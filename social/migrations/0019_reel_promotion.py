@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0018_reel_like_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReelPromotion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('QUEUED', 'Queued'), ('UPLOADING', 'Uploading'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('upload_id', models.CharField(blank=True, max_length=64)),
+                ('bytes_uploaded', models.BigIntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(default=0)),
+                ('public_id', models.CharField(blank=True, max_length=255)),
+                ('last_error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reel', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='promotion', to='social.businessreel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'updated_at'], name='social_reelpromo_state_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:06
+
+import social.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0019_reel_promotion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessreel',
+            name='archived_video',
+            field=models.FileField(blank=True, help_text='Video moved to archive storage by the storage policy.', null=True, storage=social.models.reel_archive_storage, upload_to='reels/archive/'),
+        ),
+        migrations.AddField(
+            model_name='businessreel',
+            name='last_viewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='businessreel',
+            name='recent_views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='businessreel',
+            name='velocity_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='businessreel',
+            name='video_bytes',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='businessreel',
+            name='view_velocity',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AlterField(
+            model_name='businessreel',
+            name='storage_tier',
+            field=models.CharField(choices=[('LOCAL', 'Django Server Hard Drive'), ('CLOUDINARY', 'Cloudinary Global CDN'), ('ARCHIVE', 'Cold Archive Storage')], default='LOCAL', help_text='Where this video is currently stored.', max_length=15),
+        ),
+        migrations.AddIndex(
+            model_name='businessreel',
+            index=models.Index(fields=['storage_tier', 'last_viewed_at'], name='social_reel_tier_lru_idx'),
+        ),
+    ]
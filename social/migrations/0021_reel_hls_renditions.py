@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0020_reel_storage_policy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessreel',
+            name='hls_manifest',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to='reels/hls/'),
+        ),
+        migrations.AddField(
+            model_name='businessreel',
+            name='poster_frame',
+            field=models.FileField(blank=True, max_length=255, null=True, upload_to='reels/posters/'),
+        ),
+        migrations.AddField(
+            model_name='businessreel',
+            name='transcode_status',
+            field=models.CharField(blank=True, choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('READY', 'Ready'), ('FAILED', 'Failed')], max_length=12),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:32
+
+import social.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0021_reel_hls_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessreel',
+            name='hls_bytes',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='businessreel',
+            name='local_video',
+            field=models.FileField(blank=True, help_text='Video stored on server disk (low-cost, handles initial uploads).', null=True, storage=social.models.reel_local_storage, upload_to='reels/staging/'),
+        ),
+    ]
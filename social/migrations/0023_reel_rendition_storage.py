@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:34
+
+import social.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0022_reel_tier_storages'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='businessreel',
+            name='hls_manifest',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=social.models.reel_local_storage, upload_to='reels/hls/'),
+        ),
+        migrations.AlterField(
+            model_name='businessreel',
+            name='poster_frame',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=social.models.reel_local_storage, upload_to='reels/posters/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0023_reel_rendition_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businessreel',
+            name='transcode_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:10
+
+from django.core.files.storage import default_storage
+from django.db import migrations
+
+
+def move_local_reels_to_disk(apps, schema_editor):
+    """
+    local_video used to be saved to the default storage (the Cloudinary media
+    storage in production); it is now pinned to the server disk. Copy every
+    file that is not on the disk yet over from the default storage, so the
+    rows keep pointing at a real file. The default storage copy is left in place.
+    """
+    BusinessReel = apps.get_model('social', 'BusinessReel')
+    local = BusinessReel._meta.get_field('local_video').storage
+    reels = BusinessReel.objects.exclude(local_video='').exclude(local_video__isnull=True)
+    for reel in reels.only('id', 'local_video').iterator():
+        name = reel.local_video.name
+        if local.exists(name):
+            continue
+        try:
+            with default_storage.open(name, 'rb') as source:
+                stored = local.save(name, source)
+            size = local.size(stored)
+        except Exception as e:
+            print(f"Reel {reel.id}: could not copy {name} to the local disk: {e}")
+            continue
+        BusinessReel.objects.filter(id=reel.id).update(local_video=stored, video_bytes=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0024_reel_transcode_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_local_reels_to_disk, migrations.RunPython.noop),
+    ]
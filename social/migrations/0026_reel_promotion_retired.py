@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0025_move_local_reels_to_disk'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reelpromotion',
+            name='state',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('UPLOADING', 'Uploading'), ('DONE', 'Done'), ('FAILED', 'Failed'), ('RETIRED', 'Retired')], default='QUEUED', max_length=10),
+        ),
+    ]
@@ -1,15 +1,17 @@
 from django.db import models
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 from django.db.models import Count
 from django.core.files.storage import storages # Import storage routing
+from django.core.files.storage import FileSystemStorage, InvalidStorageError
 from cloudinary.models import CloudinaryField
 import cloudinary
 import uuid
 import hashlib
 import hmac
 from decimal import Decimal
+from .media import reel_media_url
 
 # Link to your existing CustomUser
 User = settings.AUTH_USER_MODEL
@@ -32,6 +34,8 @@ class SocialProfile(models.Model):
     trust_signature = models.CharField(max_length=255, blank=True)
     
     verified_deals_count = models.PositiveIntegerField(default=0)
+    # Denormalized likes across all of this user's reels, kept current by social.likes
+    reel_likes_count = models.PositiveIntegerField(default=0)
     is_verified_merchant = models.BooleanField(
         default=False, 
         help_text="Awarded after AI assessment and identity verification."
@@ -61,7 +65,7 @@ class SocialProfile(models.Model):
 
     def generate_trust_signature(self):
         """Creates a cryptographic hash of the score using the server's secret key."""
-        data = f"{self.user.id}-{self.trust_score}"
+        data = f"{self.user_id}-{self.trust_score}"
         return hmac.new(
             settings.SECRET_KEY.encode(),
             data.encode(),
@@ -72,18 +76,18 @@ class SocialProfile(models.Model):
         """
         Logic to recalculate trust based on verified endorsements and engagement.
         UPDATED: Each like on any of the user's reels adds 5% to the score.
+        Likes come from the denormalized reel_likes_count; see social.trust.
         """
-        total_likes = BusinessReel.objects.filter(author=self.user).aggregate(
-            total=models.Count('likes')
-        )['total'] or 0
+        from .trust import score
 
-        endorsements = self.user.received_endorsements.filter(is_verified_transaction=True).count()
-        
-        new_score = (total_likes * 5) + (self.verified_deals_count * 2) + (endorsements * 5)
-        
-        self.trust_score = min(100.0, float(new_score))
+        self.refresh_from_db(fields=['reel_likes_count'])
+        endorsements = VideoEndorsement.objects.filter(
+            professional_id=self.user_id, is_verified_transaction=True
+        ).count()
+
+        self.trust_score = score(self.reel_likes_count, self.verified_deals_count, endorsements)
         self.trust_signature = self.generate_trust_signature()
-        self.save()
+        self.save(update_fields=['trust_score', 'trust_signature'])
 
     @property
     def is_trust_verified(self):
@@ -98,6 +102,22 @@ class SocialProfile(models.Model):
 
 # --- PILLAR 2 & 3: COMMERCE ---
 
+def reel_local_storage():
+    """LOCAL tier: the 'reels_local' alias, a filesystem storage even when default storage is a CDN."""
+    try:
+        return storages['reels_local']
+    except InvalidStorageError:
+        return FileSystemStorage()
+
+
+def reel_archive_storage():
+    """Cold tier: the 'reels_archive' alias from STORAGES, else the local reel disk (never the CDN)."""
+    try:
+        return storages['reels_archive']
+    except InvalidStorageError:
+        return reel_local_storage()
+
+
 class BusinessReel(models.Model):
     """
     Shoppable Reel / Professional Portfolio: 
@@ -109,7 +129,8 @@ class BusinessReel(models.Model):
     # --- THREE-TIER STORAGE SYSTEM ---
     STORAGE_TIERS = [
         ('LOCAL', 'Django Server Hard Drive'),
-        ('CLOUDINARY', 'Cloudinary Global CDN')
+        ('CLOUDINARY', 'Cloudinary Global CDN'),
+        ('ARCHIVE', 'Cold Archive Storage')
     ]
     storage_tier = models.CharField(
         max_length=15,
@@ -121,6 +142,7 @@ class BusinessReel(models.Model):
     # Tier 1: Local disk (Choice B - Initial staging)
     local_video = models.FileField(
         upload_to='reels/staging/',
+        storage=reel_local_storage,
         blank=True,
         null=True,
         help_text="Video stored on server disk (low-cost, handles initial uploads)."
@@ -134,6 +156,34 @@ class BusinessReel(models.Model):
         help_text="Cloudinary public ID for promoted viral content."
     )
     
+    # Cold tier: where social.storage moves reels nobody watches any more
+    archived_video = models.FileField(
+        upload_to='reels/archive/',
+        storage=reel_archive_storage,
+        blank=True,
+        null=True,
+        help_text="Video moved to archive storage by the storage policy."
+    )
+    # Adaptive streaming renditions built from local_video by social.transcode
+    TRANSCODE_STATES = [
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+    transcode_status = models.CharField(max_length=12, choices=TRANSCODE_STATES, blank=True)
+    # When transcode_status was last set; transcode_reels picks up PENDING/PROCESSING rows left stale
+    transcode_updated_at = models.DateTimeField(null=True, blank=True)
+    hls_manifest = models.FileField(upload_to='reels/hls/', storage=reel_local_storage, max_length=255,
+                                    blank=True, null=True)
+    poster_frame = models.FileField(upload_to='reels/posters/', storage=reel_local_storage, max_length=255,
+                                    blank=True, null=True)
+    
+    # Size of the video file, for disk budgets and per-tier reports
+    video_bytes = models.BigIntegerField(null=True, blank=True)
+    # Size of the HLS renditions and poster built by social.transcode
+    hls_bytes = models.BigIntegerField(null=True, blank=True)
+    
     # Legacy field - kept for backward compatibility
     video = CloudinaryField(
         'video',
@@ -181,12 +231,20 @@ class BusinessReel(models.Model):
 
     # --- ENGAGEMENT TRACKING & VIRALITY METRICS ---
     likes = models.ManyToManyField(User, related_name='liked_reels', blank=True)
+    # Denormalized likes.count(), kept current by social.likes
+    like_count = models.PositiveIntegerField(default=0)
     share_count = models.PositiveIntegerField(default=0)
     download_count = models.PositiveIntegerField(default=0)
     views_count = models.PositiveIntegerField(
         default=0,
         help_text="Track views to trigger tier promotion to Cloudinary."
     )
+    # Recent activity for the storage policy (social.storage): views since its last
+    # run, decayed views/hour as of velocity_at, and the last flushed view
+    recent_views = models.PositiveIntegerField(default=0)
+    view_velocity = models.FloatField(default=0.0)
+    velocity_at = models.DateTimeField(null=True, blank=True)
+    last_viewed_at = models.DateTimeField(null=True, blank=True)
     
     share_token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     is_low_bandwidth_optimized = models.BooleanField(default=True)
@@ -195,10 +253,16 @@ class BusinessReel(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pages of the reel feed (social.feed) walk active reels by (created_at, id)
+            models.Index(fields=['is_active', '-created_at', '-id'], name='social_reel_feed_idx'),
+            # LRU eviction of local reels when over the disk budget
+            models.Index(fields=['storage_tier', 'last_viewed_at'], name='social_reel_tier_lru_idx'),
+        ]
 
     @property
     def total_likes(self):
-        return self.likes.count()
+        return self.like_count
 
     def get_negotiation_floor(self):
         """Calculates floor price from specific field or global margin."""
@@ -230,9 +294,38 @@ class BusinessReel(models.Model):
             cloud_name = cloudinary.config().cloud_name
             return f"https://res.cloudinary.com/{cloud_name}/video/upload/{self.cloudinary_public_id}.mp4"
         
+        if self.stream_manifest_url:
+            # Adaptive bitrate HLS once social.transcode has built the renditions
+            return self.stream_manifest_url
+        
+        return self.progressive_video_url
+
+    @property
+    def stream_manifest_url(self):
+        """HLS master playlist for LOCAL/ARCHIVE reels, or '' until transcoding is done."""
+        if self.external_video_url or self.storage_tier == 'CLOUDINARY':
+            return ''
+        if self.transcode_status == 'READY' and self.hls_manifest:
+            return reel_media_url(self, self.hls_manifest)
+        return ''
+
+    @property
+    def progressive_video_url(self):
+        """Single-file MP4 for the reel, the fallback for players without HLS support."""
+        if self.external_video_url:
+            return self.external_video_url
+        
+        if self.storage_tier == 'CLOUDINARY' and self.cloudinary_public_id:
+            cloud_name = cloudinary.config().cloud_name
+            return f"https://res.cloudinary.com/{cloud_name}/video/upload/{self.cloudinary_public_id}.mp4"
+        
         if self.local_video:
             # New or low-traffic video stored on local server disk
-            return self.local_video.url
+            return reel_media_url(self, self.local_video)
+        
+        if self.storage_tier == 'ARCHIVE' and self.archived_video:
+            # Cold video served from archive storage
+            return reel_media_url(self, self.archived_video)
         
         # Fallback to legacy Cloudinary field if it exists
         if self.video and hasattr(self.video, 'url'):
@@ -247,6 +340,8 @@ class BusinessReel(models.Model):
             return self.external_thumbnail_url
         if self.thumbnail and hasattr(self.thumbnail, 'url'):
             return self.thumbnail.url
+        if self.poster_frame:
+            return reel_media_url(self, self.poster_frame)
         return ''
 
     @property
@@ -298,6 +393,68 @@ class BusinessReel(models.Model):
         return f"Professional Reel by {self.author.username}"
 
 
+class ReelCandidate(models.Model):
+    """
+    Precomputed "For You" ranking row (see social.ranking). rank_reels rewrites
+    the table periodically; serving the ranked feed is a range read on
+    (-score, -reel) followed by a light per-viewer re-rank of that page.
+    """
+    reel = models.OneToOneField(BusinessReel, on_delete=models.CASCADE, related_name='ranking')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    language = models.CharField(max_length=10, default='en')
+    score = models.FloatField(default=0.0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-reel'], name='social_reelcand_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reel {self.reel_id} ranked {self.score:.3f}"
+
+
+
+class ReelPromotion(models.Model):
+    """
+    Persisted state of a reel's LOCAL -> CLOUDINARY promotion (see social.promotion).
+    bytes_uploaded and upload_id let an interrupted chunked upload resume
+    where it stopped instead of starting over. RETIRED marks a reel the
+    storage policy archived or restored: only the policy's velocity check
+    queues it again, never the lifetime-views threshold.
+    """
+    QUEUED = 'QUEUED'
+    UPLOADING = 'UPLOADING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    RETIRED = 'RETIRED'
+    STATES = [
+        (QUEUED, 'Queued'),
+        (UPLOADING, 'Uploading'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+        (RETIRED, 'Retired'),
+    ]
+
+    reel = models.OneToOneField(BusinessReel, on_delete=models.CASCADE, related_name='promotion')
+    state = models.CharField(max_length=10, choices=STATES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    upload_id = models.CharField(max_length=64, blank=True)
+    bytes_uploaded = models.BigIntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
+    public_id = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'updated_at'], name='social_reelpromo_state_idx'),
+        ]
+
+    def __str__(self):
+        return f"Reel {self.reel_id} promotion {self.state} ({self.bytes_uploaded}/{self.total_bytes} bytes)"
+
+
 # --- SOVEREIGN MESSAGING ---
 
 class SecureMessage(models.Model):
@@ -314,6 +471,10 @@ class SecureMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['sender', '-timestamp'], name='social_secmsg_sender_idx'),
+            models.Index(fields=['recipient', '-timestamp'], name='social_secmsg_recipient_idx'),
+        ]
 
     def __str__(self):
         return f"Secure Msg: {self.sender.username} -> {self.recipient.username}"
@@ -358,4 +519,55 @@ def auto_update_trust_on_endorsement(sender, instance, created, **kwargs):
         try:
             instance.professional.social_profile.update_trust_score()
         except SocialProfile.DoesNotExist:
-            pass
\ No newline at end of file
+            pass
+
+@receiver(post_save, sender=SecureMessage)
+def push_secure_message(sender, instance, created, **kwargs):
+    """Push new secure messages to open websocket connections on the chat."""
+    if created:
+        from myuganda.realtime import publish_message, secure_group
+        publish_message(secure_group(instance.sender_id, instance.recipient_id), instance)
+
+@receiver(post_save, sender=BusinessReel)
+def transcode_new_reel(sender, instance, created, **kwargs):
+    """Build HLS renditions and a poster for new local uploads once the save commits."""
+    if created and instance.local_video and not instance.external_video_url:
+        from .transcode import schedule_reel_transcode
+        schedule_reel_transcode(instance.id)
+
+@receiver(post_delete, sender=BusinessReel)
+def delete_reel_renditions(sender, instance, **kwargs):
+    """Remove a deleted reel's HLS renditions and poster from the local disk once the delete commits."""
+    if instance.hls_manifest or instance.poster_frame:
+        from django.db import transaction
+        from .transcode import delete_rendition_files, rendition_files
+        prefix, names = rendition_files(instance)
+        transaction.on_commit(lambda: delete_rendition_files(prefix, names))
+
+@receiver(post_save, sender=BusinessReel)
+def rank_new_reel(sender, instance, created, **kwargs):
+    """Give new reels a provisional For You score so they surface before the next rank_reels run."""
+    if created and instance.is_active:
+        from .ranking import rank_reel
+        rank_reel(instance)
+
+
+@receiver(m2m_changed, sender=BusinessReel.likes.through)
+def update_like_counters(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep like_count/reel_likes_count in step with likes added or removed from either side."""
+    from .likes import apply_like_deltas, existing_likes
+    if action == 'pre_remove':
+        instance._removed_likes = (
+            existing_likes(reel_ids=pk_set, user_ids=[instance.pk]) if reverse
+            else existing_likes(reel_ids=[instance.pk], user_ids=pk_set)
+        )
+    elif action == 'pre_clear':
+        instance._removed_likes = (
+            existing_likes(user_ids=[instance.pk]) if reverse else existing_likes(reel_ids=[instance.pk])
+        )
+    elif action == 'post_add':
+        # post_add's pk_set only holds rows that were actually inserted
+        apply_like_deltas({reel_id: 1 for reel_id in pk_set} if reverse else {instance.pk: len(pk_set)})
+    elif action in ('post_remove', 'post_clear'):
+        removed = instance.__dict__.pop('_removed_likes', {})
+        apply_like_deltas({reel_id: -count for reel_id, count in removed.items()})
@@ -0,0 +1,304 @@
+"""
+LOCAL -> CLOUDINARY promotion of viral reels.
+
+Every eligible reel gets a ReelPromotion row that moves through
+
+    QUEUED -> UPLOADING -> DONE
+                       \\-> QUEUED (retry, attempts < MAX_ATTEMPTS) / FAILED
+
+run() drains the queue with a bounded thread pool. Workers claim a row with
+a conditional UPDATE (so overlapping runs never upload the same reel), then
+send the file in CHUNK_SIZE parts, saving bytes_uploaded and the upload id
+after every part; a crashed or interrupted upload resumes from the last
+acknowledged byte on the next run. A shared RateLimiter caps how many parts
+per second are sent across all workers.
+
+The storage backend is pluggable (REEL_PROMOTION_BACKEND): 'cloudinary'
+uses Cloudinary's chunked upload API, 'local' writes into a directory
+under MEDIA_ROOT and stands in for the CDN in development and tests.
+Backends can also open() and delete() a promoted video, which the storage
+policy (social.storage) uses to archive cold reels.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import BusinessReel, ReelPromotion
+from .transcode import clear_renditions
+
+DEFAULT_THRESHOLD = 50
+DEFAULT_WORKERS = 4
+CHUNK_SIZE = 20 * 1024 * 1024  # Cloudinary needs >= 5 MB for every part but the last
+MAX_ATTEMPTS = 5
+DEFAULT_RATE = 4.0  # parts per second across all workers; 0 disables the limit
+STALE_AFTER = timedelta(minutes=30)
+CLOUDINARY_FOLDER = 'viral_reels_production/'
+
+
+class RateLimiter:
+    """Token bucket shared by the worker threads."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CloudinaryBackend:
+    """Chunked uploads through Cloudinary's upload_large_part (the API behind upload_large)."""
+
+    def __init__(self, folder=CLOUDINARY_FOLDER):
+        import cloudinary.uploader
+        self.uploader = cloudinary.uploader
+        self.folder = folder
+
+    def upload_part(self, public_id, upload_id, filename, chunk, offset, total):
+        """Send one part. Returns the upload result, which is complete after the last part."""
+        headers = {
+            'Content-Range': f'bytes {offset}-{offset + len(chunk) - 1}/{total}',
+            'X-Unique-Upload-Id': upload_id,
+        }
+        return self.uploader.upload_large_part(
+            (filename, chunk),
+            http_headers=headers,
+            public_id=public_id,
+            folder=self.folder,
+            resource_type='video',
+            overwrite=False,
+            invalidate=True,
+        )
+
+    def open(self, public_id):
+        """Stream a promoted video back (used when the storage policy archives it)."""
+        import urllib.request
+        from cloudinary.utils import cloudinary_url
+        url, _ = cloudinary_url(public_id, resource_type='video', format='mp4', secure=True)
+        return urllib.request.urlopen(url, timeout=60)
+
+    def delete(self, public_id):
+        self.uploader.destroy(public_id, resource_type='video', invalidate=True)
+
+
+class LocalBackend:
+    """Stand-in CDN that assembles the parts into a directory (development and tests)."""
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(settings.MEDIA_ROOT, 'promoted')
+
+    def upload_part(self, public_id, upload_id, filename, chunk, offset, total):
+        path = os.path.join(self.root, f'{public_id}{os.path.splitext(filename)[1]}')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{upload_id}.part'
+        with open(partial, 'r+b' if os.path.exists(partial) else 'wb') as handle:
+            handle.seek(offset)
+            handle.write(chunk)
+        if offset + len(chunk) < total:
+            return {'done': False}
+        os.replace(partial, path)
+        return {'public_id': public_id, 'secure_url': path, 'bytes': total}
+
+    def _path(self, public_id):
+        prefix = os.path.join(self.root, public_id)
+        for name in os.listdir(self.root) if os.path.isdir(self.root) else ():
+            path = os.path.join(self.root, name)
+            if os.path.splitext(path)[0] == prefix:
+                return path
+        raise FileNotFoundError(public_id)
+
+    def open(self, public_id):
+        return open(self._path(public_id), 'rb')
+
+    def delete(self, public_id):
+        os.remove(self._path(public_id))
+
+
+def get_backend(name=None):
+    name = name or getattr(settings, 'REEL_PROMOTION_BACKEND', 'cloudinary')
+    if name == 'local':
+        return LocalBackend()
+    if name == 'cloudinary':
+        return CloudinaryBackend()
+    raise ValueError(f'Unknown reel promotion backend: {name}')
+
+
+def eligible_reels(threshold=DEFAULT_THRESHOLD):
+    return BusinessReel.objects.filter(
+        storage_tier='LOCAL',
+        views_count__gte=threshold,
+        local_video__isnull=False,
+    ).exclude(local_video='')
+
+
+def enqueue(threshold=DEFAULT_THRESHOLD, retry_failed=False):
+    """
+    Queue newly eligible reels (those without any promotion row, so RETIRED
+    reels the storage policy archived or restored are left to it) and hand
+    stale UPLOADING rows (a worker died) back to the queue. With retry_failed, FAILED rows get a fresh set of
+    attempts. Returns the number of rows queued.
+    """
+    new = [
+        ReelPromotion(reel_id=reel_id)
+        for reel_id in eligible_reels(threshold).filter(promotion__isnull=True).values_list('id', flat=True)
+    ]
+    ReelPromotion.objects.bulk_create(new, ignore_conflicts=True, batch_size=1000)
+    queued = len(new)
+    queued += ReelPromotion.objects.filter(
+        state=ReelPromotion.UPLOADING, updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(state=ReelPromotion.QUEUED)
+    if retry_failed:
+        queued += ReelPromotion.objects.filter(state=ReelPromotion.FAILED).update(
+            state=ReelPromotion.QUEUED, attempts=0
+        )
+    return queued
+
+
+def _claim(promotion_id):
+    """QUEUED -> UPLOADING, only for the one worker whose UPDATE matched."""
+    claimed = ReelPromotion.objects.filter(pk=promotion_id, state=ReelPromotion.QUEUED).update(
+        state=ReelPromotion.UPLOADING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    return ReelPromotion.objects.select_related('reel').get(pk=promotion_id)
+
+
+def _fail(promotion, error, retry=True):
+    attempts = promotion.attempts + 1
+    state = ReelPromotion.QUEUED if retry and attempts < MAX_ATTEMPTS else ReelPromotion.FAILED
+    ReelPromotion.objects.filter(pk=promotion.pk).update(
+        state=state, attempts=attempts, last_error=str(error)[:2000], updated_at=timezone.now()
+    )
+    return state
+
+
+def promote(promotion_id, backend, limiter=None, chunk_size=CHUNK_SIZE):
+    """
+    Upload one claimed reel, resuming from its saved offset.
+    Returns the promotion's new state, or None if another worker holds it.
+    """
+    promotion = _claim(promotion_id)
+    if promotion is None:
+        return None
+    reel = promotion.reel
+    try:
+        local_path = reel.local_video.path
+    except (ValueError, NotImplementedError) as e:
+        return _fail(promotion, e, retry=False)
+    if not os.path.exists(local_path):
+        return _fail(promotion, f'Local file missing: {local_path}', retry=False)
+
+    total = os.path.getsize(local_path)
+    if promotion.total_bytes != total or not promotion.upload_id:
+        # New upload, or the source changed since the last attempt: start over
+        promotion.upload_id = uuid.uuid4().hex
+        promotion.bytes_uploaded = 0
+        promotion.total_bytes = total
+    public_id = promotion.public_id or f'reel_{reel.id}_{reel.share_token}'
+    ReelPromotion.objects.filter(pk=promotion.pk).update(
+        upload_id=promotion.upload_id, bytes_uploaded=promotion.bytes_uploaded,
+        total_bytes=total, public_id=public_id,
+    )
+
+    result = None
+    try:
+        with open(local_path, 'rb') as source:
+            source.seek(promotion.bytes_uploaded)
+            offset = promotion.bytes_uploaded
+            while offset < total:
+                chunk = source.read(chunk_size)
+                if limiter is not None:
+                    limiter.acquire()
+                result = backend.upload_part(public_id, promotion.upload_id, os.path.basename(local_path),
+                                             chunk, offset, total)
+                offset += len(chunk)
+                # Resume point: everything before offset has been acknowledged
+                ReelPromotion.objects.filter(pk=promotion.pk).update(bytes_uploaded=offset, updated_at=timezone.now())
+    except Exception as e:
+        return _fail(promotion, e)
+
+    public_id = (result or {}).get('public_id') or public_id
+    with transaction.atomic():
+        BusinessReel.objects.filter(pk=reel.pk).update(
+            storage_tier='CLOUDINARY', cloudinary_public_id=public_id, video_bytes=total
+        )
+        ReelPromotion.objects.filter(pk=promotion.pk).update(
+            state=ReelPromotion.DONE, public_id=public_id, last_error='', updated_at=timezone.now()
+        )
+
+    try:
+        reel.local_video.delete(save=False)
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        BusinessReel.objects.filter(pk=reel.pk).update(local_video=None)
+        # The CDN serves the promoted video; local renditions would only take disk
+        clear_renditions(reel)
+    except Exception as e:
+        print(f"Promoted reel {reel.id} but local cleanup failed: {e}")
+    return ReelPromotion.DONE
+
+
+def _promote_in_thread(promotion_id, backend, limiter, chunk_size):
+    close_old_connections()
+    try:
+        return promote(promotion_id, backend, limiter, chunk_size)
+    finally:
+        close_old_connections()
+
+
+def run(backend=None, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE, limit=None,
+        progress=None):
+    """
+    Drain the QUEUED promotions with up to `workers` threads.
+    progress(promotion_id, state) is called as each reel finishes.
+    Returns {state: count} for the reels processed in this run.
+    """
+    backend = backend or get_backend()
+    limiter = RateLimiter(rate)
+    ids = ReelPromotion.objects.filter(state=ReelPromotion.QUEUED).order_by('updated_at', 'pk').values_list('pk', flat=True)
+    ids = list(ids[:limit] if limit else ids)
+
+    summary = {}
+
+    def finished(promotion_id, state):
+        if state is None:
+            return
+        summary[state] = summary.get(state, 0) + 1
+        if progress is not None:
+            progress(promotion_id, state)
+
+    if workers <= 1:
+        for promotion_id in ids:
+            finished(promotion_id, promote(promotion_id, backend, limiter, chunk_size))
+        return summary
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_promote_in_thread, promotion_id, backend, limiter, chunk_size): promotion_id
+            for promotion_id in ids
+        }
+        for future in as_completed(futures):
+            finished(futures[future], future.result())
+    return summary
@@ -0,0 +1,138 @@
+"""
+"For You" ranking for the reel feed.
+
+Offline: rebuild_candidates() scores every active reel and writes the best
+CANDIDATE_POOL_SIZE of them to ReelCandidate. A reel's base score is its
+engagement (log-damped views, likes, shares and downloads), scaled by the
+author's trust score and an exponential recency decay:
+
+    score = (1 + engagement) * (1 + TRUST_WEIGHT * trust / 100) * 0.5 ** (age_hours / HALF_LIFE_HOURS)
+
+Online: ranked_page() reads one page of candidates in (score, reel) order
+from the index, then re-ranks only that page for the viewer: reels in the
+viewer's language are boosted, reels they already liked are pushed down,
+and the same author is not shown twice in a row. Paging is keyed on the
+base order, so re-ranking never skips or repeats reels between pages.
+"""
+import math
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BusinessReel, ReelCandidate
+
+CANDIDATE_POOL_SIZE = 5000
+
+VIEW_WEIGHT = 1.0
+LIKE_WEIGHT = 3.0
+SHARE_WEIGHT = 5.0
+DOWNLOAD_WEIGHT = 4.0
+TRUST_WEIGHT = 0.5
+HALF_LIFE_HOURS = 48.0
+
+LANGUAGE_BOOST = 1.5
+LIKED_PENALTY = 0.5
+
+
+def base_score(views, likes, shares, downloads, trust_score, created_at, now=None):
+    now = now or timezone.now()
+    engagement = (
+        VIEW_WEIGHT * math.log1p(views)
+        + LIKE_WEIGHT * math.log1p(likes)
+        + SHARE_WEIGHT * math.log1p(shares)
+        + DOWNLOAD_WEIGHT * math.log1p(downloads)
+    )
+    trust = 1.0 + TRUST_WEIGHT * min(max(trust_score or 0.0, 0.0), 100.0) / 100.0
+    age_hours = max((now - created_at).total_seconds() / 3600.0, 0.0)
+    return (1.0 + engagement) * trust * 0.5 ** (age_hours / HALF_LIFE_HOURS)
+
+
+def _trust(reel):
+    profile = getattr(reel.author, 'social_profile', None)
+    return profile.trust_score if profile else 0.0
+
+
+def _candidate(reel, likes, now):
+    return ReelCandidate(
+        reel=reel,
+        author_id=reel.author_id,
+        language=reel.language or 'en',
+        score=base_score(reel.views_count, likes, reel.share_count, reel.download_count, _trust(reel),
+                         reel.created_at, now),
+    )
+
+
+def rank_reel(reel):
+    """Score a single reel into the candidate table (used for new uploads between rebuilds)."""
+    candidate = _candidate(reel, reel.like_count, timezone.now())
+    ReelCandidate.objects.update_or_create(
+        reel=reel,
+        defaults={'author_id': candidate.author_id, 'language': candidate.language, 'score': candidate.score},
+    )
+
+
+def rebuild_candidates(pool_size=CANDIDATE_POOL_SIZE):
+    """Re-score all active reels and replace the candidate table with the top pool_size. Returns rows written."""
+    now = timezone.now()
+    reels = (
+        BusinessReel.objects.filter(is_active=True)
+        .select_related('author__social_profile')
+        .only('id', 'author_id', 'language', 'views_count', 'like_count', 'share_count', 'download_count',
+              'created_at', 'author__id', 'author__social_profile__trust_score')
+    )
+    candidates = [_candidate(reel, reel.like_count, now) for reel in reels.iterator(chunk_size=2000)]
+    candidates.sort(key=lambda candidate: candidate.score, reverse=True)
+    candidates = candidates[:pool_size]
+
+    with transaction.atomic():
+        ReelCandidate.objects.all().delete()
+        ReelCandidate.objects.bulk_create(candidates, batch_size=1000)
+    return len(candidates)
+
+
+def _after(queryset, position):
+    if not position:
+        return queryset
+    score, reel_id = position
+    return queryset.filter(Q(score__lt=score) | Q(score=score, reel_id__lt=reel_id))
+
+
+def rerank(reels, candidates, viewer_language=None):
+    """Personalize one page: language boost, liked penalty, then no author twice in a row."""
+    scores = {candidate.reel_id: candidate.score for candidate in candidates}
+
+    def personal(reel):
+        score = scores.get(reel.id, 0.0)
+        if viewer_language and reel.language == viewer_language:
+            score *= LANGUAGE_BOOST
+        if getattr(reel, 'liked_by_me', False):
+            score *= LIKED_PENALTY
+        return score
+
+    remaining = sorted(reels, key=personal, reverse=True)
+    ordered = []
+    while remaining:
+        last_author = ordered[-1].author_id if ordered else None
+        pick = next((reel for reel in remaining if reel.author_id != last_author), remaining[0])
+        remaining.remove(pick)
+        ordered.append(pick)
+    return ordered
+
+
+def ranked_page(queryset, position=None, page_size=20, viewer_language=None):
+    """
+    One re-ranked page of reels from the candidate table.
+    queryset is the reel queryset to hydrate from (joins/annotations).
+    Returns (reels, next_position); next_position is None on the last page.
+    """
+    candidates = list(
+        _after(ReelCandidate.objects.only('reel_id', 'score'), position)
+        .order_by('-score', '-reel_id')[:page_size + 1]
+    )
+    page = candidates[:page_size]
+    next_position = None
+    if len(candidates) > page_size:
+        next_position = [page[-1].score, page[-1].reel_id]
+    reels = list(queryset.filter(id__in=[candidate.reel_id for candidate in page]))
+    return rerank(reels, page, viewer_language), next_position
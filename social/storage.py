@@ -0,0 +1,240 @@
+"""
+Storage policy for reel videos across the LOCAL, CLOUDINARY and ARCHIVE tiers.
+
+Tier decisions follow recent demand rather than lifetime views. Each counter
+flush (social.counters) adds a reel's new views to recent_views and stamps
+last_viewed_at; update_velocities() folds them into a decayed view count
+with a VELOCITY_HALF_LIFE_HOURS half-life, stored as views/hour in
+view_velocity. One policy pass then:
+
+- promotes hot LOCAL reels (velocity >= PROMOTE_VELOCITY) by queueing a
+  ReelPromotion for promote_viral_reels to upload
+- restores hot ARCHIVE reels to LOCAL, from where they are promoted again
+
+Archiving from the CDN and restoring leave the reel's ReelPromotion row in
+the RETIRED state rather than deleting it, so promote_viral_reels (which
+queues reels without a row by lifetime views) cannot send a reel straight
+back to the CDN; only this policy re-queues RETIRED rows, when the reel is
+hot again.
+- archives cold reels (velocity < COLD_VELOCITY and unwatched for
+  COLD_AFTER) from LOCAL or CLOUDINARY
+- keeps LOCAL reels (video plus HLS renditions and poster) under
+  LOCAL_DISK_BUDGET by archiving the least recently viewed ones until the
+  rest fit
+
+LOCAL is the 'reels_local' storage alias and ARCHIVE the 'reels_archive'
+one (see settings.STORAGES); neither falls back to default storage, which
+is the Cloudinary image CDN in production. Point ARCHIVE at a cheap disk
+or object store so archiving frees the server disk. Every setting can be
+overridden as REEL_<NAME> in settings.
+"""
+import math
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BusinessReel, ReelPromotion
+from .transcode import clear_renditions, schedule_reel_transcode
+
+PROMOTE_VELOCITY = 10.0  # views/hour
+COLD_VELOCITY = 0.05  # views/hour
+COLD_AFTER = timedelta(days=30)
+LOCAL_DISK_BUDGET = 20 * 1024 ** 3  # bytes
+VELOCITY_HALF_LIFE_HOURS = 12.0
+MAX_ACTIONS = 200
+
+PROMOTE = 'promote'
+RESTORE = 'restore'
+ARCHIVE = 'archive'
+
+_IN_FLIGHT = (ReelPromotion.QUEUED, ReelPromotion.UPLOADING)
+
+
+def setting(name, default):
+    return getattr(settings, f'REEL_{name}', default)
+
+
+def update_velocities(now=None):
+    """Fold recent_views into view_velocity for every reel with recent activity. Returns reels updated."""
+    now = now or timezone.now()
+    half_life = setting('VELOCITY_HALF_LIFE_HOURS', VELOCITY_HALF_LIFE_HOURS)
+    reels = list(
+        BusinessReel.objects.filter(Q(recent_views__gt=0) | Q(view_velocity__gt=0))
+        .only('id', 'recent_views', 'view_velocity', 'velocity_at', 'created_at')
+    )
+    for reel in reels:
+        hours = max((now - (reel.velocity_at or reel.created_at)).total_seconds() / 3600.0, 0.0)
+        decayed = reel.view_velocity * half_life / math.log(2) * 0.5 ** (hours / half_life)
+        velocity = (decayed + reel.recent_views) * math.log(2) / half_life
+        reel.view_velocity = velocity if velocity >= 0.001 else 0.0
+        reel.velocity_at = now
+        # Subtract what was read so views flushed meanwhile are kept for the next pass
+        reel.recent_views = F('recent_views') - reel.recent_views
+    BusinessReel.objects.bulk_update(reels, ['view_velocity', 'velocity_at', 'recent_views'], batch_size=1000)
+    return len(reels)
+
+
+def local_bytes(reel):
+    """Disk used by a LOCAL reel: its video (measured once into video_bytes) plus renditions and poster."""
+    if reel.video_bytes is None:
+        try:
+            reel.video_bytes = reel.local_video.size
+        except (OSError, ValueError):
+            return reel.hls_bytes or 0
+        BusinessReel.objects.filter(pk=reel.pk).update(video_bytes=reel.video_bytes)
+    return reel.video_bytes + (reel.hls_bytes or 0)
+
+
+def plan(now=None, budget=None, max_actions=MAX_ACTIONS):
+    """The tier moves one policy pass would make, as [(action, reel, reason)]."""
+    now = now or timezone.now()
+    budget = setting('LOCAL_DISK_BUDGET', LOCAL_DISK_BUDGET) if budget is None else budget
+    hot = setting('PROMOTE_VELOCITY', PROMOTE_VELOCITY)
+    cold_cutoff = now - setting('COLD_AFTER', COLD_AFTER)
+
+    reels = BusinessReel.objects.annotate(last_activity=Coalesce('last_viewed_at', 'created_at'))
+    local = reels.filter(storage_tier='LOCAL', local_video__isnull=False).exclude(local_video='')
+    in_flight = Q(promotion__state__in=_IN_FLIGHT)
+    actions = []
+
+    promotable = Q(promotion__isnull=True) | Q(promotion__state=ReelPromotion.RETIRED)
+    for reel in local.filter(promotable, view_velocity__gte=hot, is_active=True):
+        actions.append((PROMOTE, reel, f'{reel.view_velocity:.1f} views/hour'))
+    restorable = reels.filter(storage_tier='ARCHIVE', view_velocity__gte=hot, archived_video__isnull=False)
+    for reel in restorable.exclude(archived_video=''):
+        actions.append((RESTORE, reel, f'{reel.view_velocity:.1f} views/hour'))
+
+    cold = Q(view_velocity__lt=setting('COLD_VELOCITY', COLD_VELOCITY), last_activity__lt=cold_cutoff)
+    archived_ids = set()
+    for reel in local.filter(cold).exclude(in_flight):
+        actions.append((ARCHIVE, reel, 'cold'))
+        archived_ids.add(reel.id)
+    for reel in reels.filter(cold, storage_tier='CLOUDINARY').exclude(cloudinary_public_id__isnull=True):
+        actions.append((ARCHIVE, reel, 'cold'))
+
+    # Disk budget: evict least recently viewed LOCAL reels until the rest fit
+    resident = [reel for reel in local.order_by('last_activity', 'id') if reel.id not in archived_ids]
+    used = sum(local_bytes(reel) for reel in resident)
+    evictable = (reel for reel in resident if reel.view_velocity < hot)
+    promoting = set(ReelPromotion.objects.filter(state__in=_IN_FLIGHT).values_list('reel_id', flat=True))
+    while used > budget:
+        reel = next(evictable, None)
+        if reel is None:
+            break
+        if reel.id in promoting:
+            continue
+        actions.append((ARCHIVE, reel, 'over disk budget'))
+        used -= local_bytes(reel)
+
+    return actions[:max_actions]
+
+
+_FRESH_PROMOTION = {'attempts': 0, 'upload_id': '', 'bytes_uploaded': 0, 'total_bytes': 0, 'public_id': '',
+                    'last_error': ''}
+
+
+def _retire_promotion(reel):
+    ReelPromotion.objects.update_or_create(reel=reel, defaults={'state': ReelPromotion.RETIRED, **_FRESH_PROMOTION})
+
+
+def _queue_promotion(reel):
+    """Queue a hot reel for promote_viral_reels, reviving a RETIRED row. Returns True if queued."""
+    if ReelPromotion.objects.filter(reel=reel, state=ReelPromotion.RETIRED).update(
+            state=ReelPromotion.QUEUED, **_FRESH_PROMOTION):
+        return True
+    _, created = ReelPromotion.objects.get_or_create(reel=reel)
+    return created
+
+
+def _archive_local(reel):
+    with reel.local_video.open('rb') as source:
+        reel.archived_video.save(os.path.basename(reel.local_video.name), File(source), save=False)
+    moved = BusinessReel.objects.filter(pk=reel.pk, storage_tier='LOCAL').update(
+        storage_tier='ARCHIVE', archived_video=reel.archived_video.name, local_video=None,
+        video_bytes=reel.archived_video.size,
+    )
+    if not moved:
+        reel.archived_video.delete(save=False)
+        return False
+    reel.local_video.delete(save=False)
+    clear_renditions(reel)
+    return True
+
+
+def _archive_cdn(reel, backend):
+    public_id = reel.cloudinary_public_id
+    with backend.open(public_id) as source:
+        reel.archived_video.save(f'reel_{reel.id}_{reel.share_token}.mp4', File(source), save=False)
+    moved = BusinessReel.objects.filter(pk=reel.pk, storage_tier='CLOUDINARY').update(
+        storage_tier='ARCHIVE', archived_video=reel.archived_video.name, cloudinary_public_id=None,
+        video_bytes=reel.archived_video.size,
+    )
+    if not moved:
+        reel.archived_video.delete(save=False)
+        return False
+    # Only a fresh burst of demand may promote it again
+    _retire_promotion(reel)
+    clear_renditions(reel)
+    try:
+        backend.delete(public_id)
+    except Exception as e:
+        print(f"Archived reel {reel.id} but could not delete CDN copy {public_id}: {e}")
+    return True
+
+
+def _restore(reel):
+    with reel.archived_video.open('rb') as source:
+        reel.local_video.save(os.path.basename(reel.archived_video.name), File(source), save=False)
+    moved = BusinessReel.objects.filter(pk=reel.pk, storage_tier='ARCHIVE').update(
+        storage_tier='LOCAL', local_video=reel.local_video.name, archived_video=None,
+    )
+    if not moved:
+        reel.local_video.delete(save=False)
+        return False
+    reel.archived_video.delete(save=False)
+    # A promotion that failed before archiving must not block promoting the restored reel
+    _retire_promotion(reel)
+    schedule_reel_transcode(reel.id)
+    return True
+
+
+def apply(actions, backend=None):
+    """Carry out planned moves. Returns Counter of action -> moves made, plus 'failed'."""
+    from .promotion import get_backend
+
+    results = Counter()
+    for action, reel, reason in actions:
+        try:
+            if action == PROMOTE:
+                moved = _queue_promotion(reel)
+            elif action == RESTORE:
+                moved = _restore(reel)
+            elif reel.storage_tier == 'CLOUDINARY':
+                backend = backend or get_backend()
+                moved = _archive_cdn(reel, backend)
+            else:
+                moved = _archive_local(reel)
+        except Exception as e:
+            print(f"Storage policy could not {action} reel {reel.id}: {e}")
+            results['failed'] += 1
+            continue
+        if moved:
+            results[action] += 1
+    return results
+
+
+def tier_report():
+    """{tier: {'reels': n, 'bytes': total}} from the recorded video and rendition sizes."""
+    rows = BusinessReel.objects.order_by().values('storage_tier').annotate(
+        reels=Count('id'), bytes=Coalesce(Sum('video_bytes'), 0) + Coalesce(Sum('hls_bytes'), 0)
+    )
+    report = {tier: {'reels': 0, 'bytes': 0} for tier, _ in BusinessReel.STORAGE_TIERS}
+    for row in rows:
+        report[row['storage_tier']] = {'reels': row['reels'], 'bytes': row['bytes']}
+    return report
@@ -1,3 +1,818 @@
-from django.test import TestCase
+import json
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+
+from social import counters as reel_counters
+from social import media as reel_media
+from social import promotion
+from social import storage as reel_storage
+from social import transcode
+from social import trust as reel_trust
+from social import views
+from social.feed import REEL_PAGE_SIZE
+from social.likes import recount_likes
+from social.models import BusinessReel, ReelCandidate, ReelPromotion, SecureMessage, SocialProfile
+from social.ranking import base_score, rebuild_candidates
+
+
+User = get_user_model()
+
+
+class SecureInboxTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(username='me', password='secret1234')
+        self.partners = [User.objects.create_user(username=f'partner{i}', password='secret1234') for i in range(3)]
+        self.client.login(username='me', password='secret1234')
+
+    def test_inbox_lists_last_message_and_unread_per_partner(self):
+        first, second, third = self.partners
+        SecureMessage.objects.create(sender=first, recipient=self.me, content='first hello')
+        SecureMessage.objects.create(sender=first, recipient=self.me, content='first again')
+        SecureMessage.objects.create(sender=self.me, recipient=second, content='to second')
+        SecureMessage.objects.create(sender=third, recipient=self.me, content='third read', is_read=True)
+        SecureMessage.objects.create(sender=second, recipient=self.me, content='second reply')
+
+        response = self.client.get(reverse('social:inbox'))
+        rows = [
+            (conv['partner'].username, conv['last_message'].content, conv['unread_count'])
+            for conv in response.context['conversations']
+        ]
+        self.assertEqual(rows, [
+            ('partner1', 'second reply', 1),
+            ('partner2', 'third read', 0),
+            ('partner0', 'first again', 2),
+        ])
+
+    def test_inbox_paginates_partners(self):
+        for partner in self.partners:
+            SecureMessage.objects.create(sender=partner, recipient=self.me, content='hi')
+
+        with patch.object(views, 'INBOX_PAGE_SIZE', 2):
+            page_two = self.client.get(reverse('social:inbox'), {'page': 2})
+        self.assertEqual([c['partner'] for c in page_two.context['conversations']], [self.partners[0]])
+
+
+@override_settings(TRUST_RECOMPUTE_ASYNC=False)
+class ReelFeedPaginationTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.viewer = User.objects.create_user(username='viewer', password='secret1234')
+        self.reels = [
+            BusinessReel.objects.create(author=self.creator, caption=f'reel {i}', external_video_url='https://youtu.be/abcdefghijk')
+            for i in range(REEL_PAGE_SIZE * 2 + 3)
+        ]
+        BusinessReel.objects.create(author=self.creator, caption='hidden', is_active=False)
+        self.reels[-1].likes.add(self.viewer)
+        self.client.force_login(self.viewer)
+
+    def test_feed_renders_only_the_first_page(self):
+        response = self.client.get(reverse('social:social_feed'), {'feed': 'latest'})
+        self.assertEqual(len(response.context['reels']), REEL_PAGE_SIZE)
+        self.assertTrue(response.context['has_next'])
+        self.assertContains(response, '<section data-reel-id=', count=REEL_PAGE_SIZE)
+        self.assertContains(response, 'heart-icon heart-active', count=1)
+
+    def test_pages_walk_the_whole_feed_once_with_constant_queries(self):
+        cursor = self.client.get(reverse('social:social_feed'), {'feed': 'latest'}).context['next_cursor']
+        seen = []
+        while cursor:
+            with self.assertNumQueries(3):  # session, user, one page query
+                data = self.client.get(reverse('social:feed_page'), {'cursor': cursor}).json()
+            self.assertIn('<section data-reel-id=', data['html'])
+            seen.extend(reel['id'] for reel in data['reels'])
+            cursor = data['next_cursor']
+
+        expected = [reel.id for reel in reversed(self.reels)][REEL_PAGE_SIZE:]
+        self.assertEqual(seen, expected)
+        self.assertFalse(data['has_next'])
+
+    def test_tampered_cursor_starts_from_the_top(self):
+        data = self.client.get(reverse('social:feed_page'), {'cursor': 'bogus', 'limit': 2, 'feed': 'latest'}).json()
+        self.assertEqual([reel['id'] for reel in data['reels']], [self.reels[-1].id, self.reels[-2].id])
+        self.assertTrue(data['reels'][0]['liked'])
+        self.assertEqual(data['reels'][0]['likes'], 1)
+
+
+class ReelRankingTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.other = User.objects.create_user(username='other', password='secret1234')
+        self.viewer = User.objects.create_user(username='viewer', password='secret1234', language='sw')
+
+    def _reel(self, author, caption, **fields):
+        return BusinessReel.objects.create(author=author, caption=caption,
+                                           external_video_url='https://youtu.be/abcdefghijk', **fields)
+
+    def test_score_rewards_engagement_and_trust_and_decays_with_age(self):
+        now = timezone.now()
+        quiet = base_score(10, 0, 0, 0, 0, now, now)
+        popular = base_score(10, 20, 5, 5, 0, now, now)
+        trusted = base_score(10, 20, 5, 5, 100, now, now)
+        stale = base_score(10, 20, 5, 5, 100, now - timezone.timedelta(hours=48), now)
+        self.assertLess(quiet, popular)
+        self.assertLess(popular, trusted)
+        self.assertAlmostEqual(stale, trusted / 2)
+
+    def test_new_reels_get_a_provisional_candidate(self):
+        reel = self._reel(self.creator, 'fresh')
+        self.assertTrue(ReelCandidate.objects.filter(reel=reel).exists())
+
+    def test_for_you_orders_by_rank_and_reranks_for_the_viewer(self):
+        viral = self._reel(self.creator, 'viral', views_count=5000, share_count=300)
+        viral_follow_up = self._reel(self.creator, 'viral again', views_count=4000, share_count=250)
+        local = self._reel(self.other, 'habari', language='sw', views_count=900, share_count=90)
+        quiet = self._reel(self.other, 'quiet', views_count=10)
+        inactive = self._reel(self.other, 'gone', views_count=9000)
+        BusinessReel.objects.filter(id=inactive.id).update(is_active=False)
+        self.assertEqual(rebuild_candidates(), 4)
+
+        # Anonymous: base rank, but the same author is never shown twice in a row
+        data = self.client.get(reverse('social:feed_page'), {'limit': 4}).json()
+        self.assertEqual([reel['id'] for reel in data['reels']], [viral.id, local.id, viral_follow_up.id, quiet.id])
+
+        # Swahili speaker: the local reel is boosted to the top
+        self.client.force_login(self.viewer)
+        with self.assertNumQueries(4):  # session, user, candidate range, hydrate
+            data = self.client.get(reverse('social:feed_page'), {'limit': 4}).json()
+        self.assertEqual([reel['id'] for reel in data['reels']], [local.id, viral.id, quiet.id, viral_follow_up.id])
+
+        data = self.client.get(reverse('social:feed_page'), {'limit': 2}).json()
+        self.assertEqual(len(data['reels']), 2)
+        rest = self.client.get(reverse('social:feed_page'), {'cursor': data['next_cursor']}).json()
+        self.assertEqual(len(rest['reels']), 2)
+        self.assertIsNone(rest['next_cursor'])
+
+
+@override_settings(
+    REEL_COUNTERS_ASYNC=False,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class ReelCounterBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reel_counters.reset()
+        self.addCleanup(reel_counters.reset)
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.viewer = User.objects.create_user(username='viewer', password='secret1234')
+        self.reel = BusinessReel.objects.create(author=self.creator, caption='counted', views_count=10)
+        self.client.force_login(self.viewer)
+
+    def _post(self, name):
+        return self.client.post(reverse(f'social:{name}', args=[self.reel.id])).json()
+
+    def test_events_are_buffered_and_flushed_as_one_write(self):
+        self.assertEqual(self._post('track_share')['total_shares'], 1)
+        with self.assertNumQueries(2):  # session, user - no reel reads or writes
+            data = self._post('track_share')
+        self.assertEqual(data['total_shares'], 2)
+        self._post('track_download')
+
+        self.reel.refresh_from_db()
+        self.assertEqual((self.reel.share_count, self.reel.download_count), (0, 0))
+
+        with self.assertNumQueries(4):  # savepoint, one UPDATE for the reel, release, one read-back
+            self.assertEqual(reel_counters.flush(), 1)
+        self.reel.refresh_from_db()
+        self.assertEqual((self.reel.share_count, self.reel.download_count), (2, 1))
+        self.assertEqual(reel_counters.flush(), 0)
+
+    def test_repeat_views_by_the_same_viewer_are_deduplicated(self):
+        first = self._post('track_view')
+        second = self._post('track_view')
+        self.assertEqual((first['counted'], first['total_views']), (True, 11))
+        self.assertEqual((second['counted'], second['total_views']), (False, 11))
+        self.assertEqual(first['storage_tier'], 'LOCAL')
+
+        self.client.force_login(self.creator)
+        self.assertTrue(self._post('track_view')['counted'])
+        reel_counters.flush()
+        self.reel.refresh_from_db()
+        self.assertEqual(self.reel.views_count, 12)
+
+    def test_unknown_reel_is_a_404(self):
+        response = self.client.post(reverse('social:track_view', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    REEL_COUNTERS_ASYNC=False,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+)
+class EngagementBeaconTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reel_counters.reset()
+        self.addCleanup(reel_counters.reset)
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.viewer = User.objects.create_user(username='viewer', password='secret1234')
+        self.first = BusinessReel.objects.create(author=self.creator, caption='first')
+        self.second = BusinessReel.objects.create(author=self.creator, caption='second')
+
+    def _beacon(self, events, content_type='text/plain', origin='http://testserver'):
+        return self.client.post(reverse('social:track_events'), data=json.dumps({'events': events}),
+                                content_type=content_type, HTTP_ORIGIN=origin)
+
+    def test_batch_is_validated_and_coalesced(self):
+        self.client.force_login(self.viewer)
+        events = (
+            [{'type': 'view', 'reel': self.first.id}] * 3
+            + [{'type': 'share', 'reel': self.first.id}] * 2
+            + [{'type': 'download', 'reel': str(self.second.id)}]
+            + [{'type': 'view', 'reel': self.second.id}]
+            + [{'type': 'like', 'reel': self.first.id}, {'type': 'view', 'reel': 'abc'}, 'junk',
+               {'type': 'view', 'reel': 999999}]
+        )
+        data = self._beacon(events).json()
+
+        self.assertEqual((data['accepted'], data['rejected']), (5, 4))
+        self.assertEqual(data['reels'][str(self.first.id)]['total_shares'], 2)
+        reel_counters.flush()
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.views_count, self.first.share_count), (1, 2))
+        self.assertEqual((self.second.views_count, self.second.download_count), (1, 1))
+
+    def test_anonymous_and_cross_site_beacons_are_refused(self):
+        from django.contrib.sessions.models import Session
+
+        response = self._beacon([{'type': 'view', 'reel': self.first.id}])
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.viewer)
+        sessions = Session.objects.count()
+        self.assertEqual(self._beacon([{'type': 'view', 'reel': self.first.id}], origin='https://evil.example').status_code, 403)
+        reel_counters.flush()
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.views_count, 0)
+        self.assertEqual(Session.objects.count(), sessions)
+
+        # Anonymous dedup keys never create a session row
+        from django.contrib.auth.models import AnonymousUser
+        from django.contrib.sessions.backends.db import SessionStore
+        from django.test import RequestFactory
+
+        request = RequestFactory().get('/', HTTP_USER_AGENT='phone', REMOTE_ADDR='10.0.0.1')
+        request.user, request.session = AnonymousUser(), SessionStore()
+        key = reel_counters.viewer_key(request)
+        self.assertEqual(key, reel_counters.viewer_key(request))
+        self.assertIsNone(request.session.session_key)
+        self.assertEqual(Session.objects.count(), sessions)
+
+    def test_malformed_or_oversized_batches_are_rejected(self):
+        self.client.force_login(self.viewer)
+        response = self.client.post(reverse('social:track_events'), data='not json', content_type='text/plain',
+                                    HTTP_ORIGIN='http://testserver')
+        self.assertEqual(response.status_code, 400)
+        too_many = [{'type': 'view', 'reel': self.first.id}] * 1000
+        self.assertEqual(self._beacon(too_many, 'application/json').status_code, 400)
+
+
+@override_settings(TRUST_RECOMPUTE_ASYNC=True, TRUST_RECOMPUTE_DELAY=3600)
+class ReelLikeCounterTests(TestCase):
+    def setUp(self):
+        reel_trust.reset()
+        self.addCleanup(reel_trust.reset)
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='secret1234') for i in range(3)]
+        self.reel = BusinessReel.objects.create(author=self.creator, caption='liked')
+        self.other = BusinessReel.objects.create(author=self.creator, caption='also liked')
+
+    def _counts(self):
+        self.reel.refresh_from_db()
+        return self.reel.like_count, SocialProfile.objects.get(user=self.creator).reel_likes_count
+
+    def test_toggle_serves_counters_and_defers_the_trust_recompute(self):
+        self.client.force_login(self.fans[0])
+        url = reverse('social:toggle_like', args=[self.reel.id])
+        data = self.client.post(url).json()
+
+        self.assertEqual((data['liked'], data['total_likes'], data['new_trust_score']), (True, 1, 5.0))
+        self.assertEqual(SocialProfile.objects.get(user=self.creator).trust_score, 0.0)
+        self.assertEqual(reel_trust.flush(), 1)
+        profile = SocialProfile.objects.get(user=self.creator)
+        self.assertEqual(profile.trust_score, 5.0)
+        self.assertTrue(profile.is_trust_verified)
+
+        data = self.client.post(url).json()
+        self.assertEqual((data['liked'], data['total_likes'], data['new_trust_score']), (False, 0, 0.0))
+        self.assertEqual(self._counts(), (0, 0))
+
+    def test_counters_follow_either_side_of_the_relation(self):
+        self.reel.likes.add(*self.fans)
+        self.fans[0].liked_reels.add(self.other)
+        self.assertEqual(self._counts(), (3, 4))
+
+        self.reel.likes.remove(self.fans[0], self.creator)  # creator never liked it
+        self.assertEqual(self._counts(), (2, 3))
+        self.fans[1].liked_reels.clear()
+        self.assertEqual(self._counts(), (1, 2))
+        self.other.likes.clear()
+        self.assertEqual(self._counts(), (1, 1))
+
+        BusinessReel.objects.filter(pk=self.reel.pk).update(like_count=40)
+        recount_likes()
+        self.assertEqual(self._counts(), (1, 1))
+
+    def test_batch_recompute_matches_the_per_profile_score(self):
+        self.reel.likes.add(*self.fans)
+        reel_trust.reset()
+        SocialProfile.objects.filter(user=self.creator).update(
+            reel_likes_count=99, trust_score=0.0, verified_deals_count=4
+        )
+
+        out = StringIO()
+        call_command('recompute_trust_scores', batch_size=2, stdout=out)
+        self.assertIn('profiles/sec', out.getvalue())
+        batched = SocialProfile.objects.get(user=self.creator)
+        self.assertEqual((batched.trust_score, batched.reel_likes_count), (23.0, 3))
+        self.assertTrue(batched.is_trust_verified)
+
+        batched.update_trust_score()
+        self.assertEqual(SocialProfile.objects.get(user=self.creator).trust_score, 23.0)
+        self.assertEqual(reel_trust.recompute_all(), (len(self.fans) + 1, 0))
+
+    def test_batch_recompute_keeps_concurrent_like_deltas(self):
+        self.reel.likes.add(*self.fans)
+        reel_trust.reset()
+        SocialProfile.objects.filter(user=self.creator).update(trust_score=0.0)
+        seal = SocialProfile.generate_trust_signature
+
+        def like_while_scoring(profile):
+            # A like landing after the batch read the profiles
+            if profile.user_id == self.creator.id:
+                SocialProfile.objects.filter(user=self.creator).update(reel_likes_count=F('reel_likes_count') + 1)
+            return seal(profile)
+
+        with patch.object(SocialProfile, 'generate_trust_signature', like_while_scoring):
+            reel_trust.recompute_all()
+        profile = SocialProfile.objects.get(user=self.creator)
+        self.assertEqual((profile.trust_score, profile.reel_likes_count), (15.0, 4))
+
+
+class FlakyBackend(promotion.LocalBackend):
+    """Local stand-in that drops the connection on selected part offsets."""
+
+    def __init__(self, root, fail_at=()):
+        super().__init__(root)
+        self.fail_at = set(fail_at)
+        self.offsets = []
+
+    def upload_part(self, public_id, upload_id, filename, chunk, offset, total):
+        if offset in self.fail_at:
+            raise ConnectionError('connection reset')
+        self.offsets.append(offset)
+        return super().upload_part(public_id, upload_id, filename, chunk, offset, total)
+
+
+@override_settings(REEL_PROMOTION_BACKEND='local')
+class ReelPromotionTests(TestCase):
+    VIDEO = bytes(range(256)) * 40  # 10 KB
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.cdn_root = os.path.join(self.media_root, 'promoted')
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.reel = BusinessReel.objects.create(
+            author=self.creator, caption='viral', views_count=80,
+            local_video=SimpleUploadedFile('clip.mp4', self.VIDEO, content_type='video/mp4'),
+        )
+        self.local_path = self.reel.local_video.path
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _uploaded_bytes(self):
+        public_id = ReelPromotion.objects.get(reel=self.reel).public_id
+        with open(os.path.join(self.cdn_root, f'{public_id}.mp4'), 'rb') as handle:
+            return handle.read()
+
+    def test_command_promotes_eligible_reels(self):
+        BusinessReel.objects.create(author=self.creator, caption='quiet', views_count=3,
+                                    local_video=SimpleUploadedFile('quiet.mp4', b'x', content_type='video/mp4'))
+        out = StringIO()
+        call_command('promote_viral_reels', workers=1, rate=0, stdout=out)
+
+        self.assertIn('Promoted to CDN: 1 reel(s)', out.getvalue())
+        self.reel.refresh_from_db()
+        self.assertEqual(self.reel.storage_tier, 'CLOUDINARY')
+        self.assertEqual(self.reel.cloudinary_public_id, f'reel_{self.reel.id}_{self.reel.share_token}')
+        self.assertEqual(self._uploaded_bytes(), self.VIDEO)
+        self.assertFalse(os.path.exists(self.local_path))
+        self.assertEqual(ReelPromotion.objects.get().state, ReelPromotion.DONE)
+
+    def test_interrupted_upload_resumes_from_the_last_acknowledged_part(self):
+        promotion.enqueue()
+        flaky = FlakyBackend(self.cdn_root, fail_at={4096})
+        self.assertEqual(promotion.run(flaky, workers=1, rate=0, chunk_size=2048), {ReelPromotion.QUEUED: 1})
+        state = ReelPromotion.objects.get(reel=self.reel)
+        self.assertEqual((state.attempts, state.bytes_uploaded), (1, 4096))
+        self.assertIn('connection reset', state.last_error)
+
+        resumed = FlakyBackend(self.cdn_root)
+        self.assertEqual(promotion.run(resumed, workers=1, rate=0, chunk_size=2048), {ReelPromotion.DONE: 1})
+        self.assertEqual(resumed.offsets, [4096, 6144, 8192])
+        self.assertEqual(self._uploaded_bytes(), self.VIDEO)
+
+    def test_failures_are_retried_then_parked_and_rows_are_claimed_once(self):
+        promotion.enqueue()
+        broken = FlakyBackend(self.cdn_root, fail_at={0})
+        for _ in range(promotion.MAX_ATTEMPTS):
+            promotion.run(broken, workers=1, rate=0)
+        state = ReelPromotion.objects.get(reel=self.reel)
+        self.assertEqual((state.state, state.attempts), (ReelPromotion.FAILED, promotion.MAX_ATTEMPTS))
+
+        self.assertEqual(promotion.enqueue(retry_failed=True), 1)
+        ReelPromotion.objects.filter(pk=state.pk).update(state=ReelPromotion.UPLOADING)
+        self.assertIsNone(promotion.promote(state.pk, broken))
+
+
+@override_settings(REEL_PROMOTION_BACKEND='local', REEL_COUNTERS_ASYNC=False,
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ReelStoragePolicyTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        reel_counters.reset()
+        self.addCleanup(reel_counters.reset)
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.now = timezone.now()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _reel(self, caption, size=1000, hours_since_view=1, velocity=1.0):
+        reel = BusinessReel.objects.create(
+            author=self.creator, caption=caption,
+            local_video=SimpleUploadedFile(f'{caption}.mp4', b'v' * size, content_type='video/mp4'),
+        )
+        BusinessReel.objects.filter(pk=reel.pk).update(
+            view_velocity=velocity, last_viewed_at=self.now - timedelta(hours=hours_since_view)
+        )
+        reel.refresh_from_db()
+        return reel
+
+    def test_flushed_views_become_a_decaying_velocity(self):
+        reel = self._reel('steady', velocity=0.0)
+        BusinessReel.objects.filter(pk=reel.pk).update(velocity_at=self.now - timedelta(hours=1))
+        for viewer in range(24):
+            reel_counters.record_view(reel.id, f'u{viewer}')
+        reel_counters.flush()
+
+        self.assertEqual(reel_storage.update_velocities(self.now), 1)
+        reel.refresh_from_db()
+        self.assertEqual(reel.recent_views, 0)
+        self.assertAlmostEqual(reel.view_velocity, 24 * math.log(2) / 12)
+
+        reel_storage.update_velocities(self.now + timedelta(hours=12))
+        reel.refresh_from_db()
+        self.assertAlmostEqual(reel.view_velocity, 12 * math.log(2) / 12)
+
+    def test_policy_promotes_hot_archives_cold_and_keeps_under_budget(self):
+        hot = self._reel('hot', velocity=50.0)
+        stale = self._reel('stale', hours_since_view=24 * 60, velocity=0.0)
+        oldest = self._reel('oldest', hours_since_view=48)
+        self._reel('recent', hours_since_view=2)
+
+        cdn = promotion.LocalBackend()
+        cdn.upload_part('reel_cold', 'u1', 'x.mp4', b'c' * 500, 0, 500)
+        cold_cdn = BusinessReel.objects.create(author=self.creator, caption='cold cdn', storage_tier='CLOUDINARY',
+                                               cloudinary_public_id='reel_cold')
+        BusinessReel.objects.filter(pk=cold_cdn.pk).update(last_viewed_at=self.now - timedelta(days=90))
+        ReelPromotion.objects.create(reel=cold_cdn, state=ReelPromotion.DONE)
+
+        out = StringIO()
+        call_command('manage_reel_storage', budget_gb=2500 / 1024 ** 3, stdout=out)
+        self.assertIn('Promotions queued: 1, restored: 0, archived: 3, failed: 0', out.getvalue())
+
+        tiers = dict(BusinessReel.objects.values_list('caption', 'storage_tier'))
+        self.assertEqual(tiers, {'hot': 'LOCAL', 'stale': 'ARCHIVE', 'oldest': 'ARCHIVE', 'recent': 'LOCAL',
+                                 'cold cdn': 'ARCHIVE'})
+        self.assertTrue(ReelPromotion.objects.filter(reel=hot, state=ReelPromotion.QUEUED).exists())
+        self.assertEqual(ReelPromotion.objects.get(reel=cold_cdn).state, ReelPromotion.RETIRED)
+        with self.assertRaises(FileNotFoundError):
+            cdn.open('reel_cold')
+
+        oldest.refresh_from_db()
+        self.assertFalse(oldest.local_video)
+        self.assertEqual(oldest.archived_video.read(), b'v' * 1000)
+        self.assertEqual(oldest.source_video_url, reel_media.reel_media_url(oldest, oldest.archived_video))
+        report = reel_storage.tier_report()
+        self.assertEqual(report['LOCAL'], {'reels': 2, 'bytes': 2000})
+        self.assertEqual(report['ARCHIVE'], {'reels': 3, 'bytes': 2500})
+
+        # Demand returns: the archived reel comes back to LOCAL for promotion
+        BusinessReel.objects.filter(pk=stale.pk).update(view_velocity=80.0)
+        moves = reel_storage.apply(reel_storage.plan(budget=10 ** 9))
+        self.assertEqual(moves[reel_storage.RESTORE], 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.storage_tier, 'LOCAL')
+        self.assertEqual(stale.local_video.read(), b'v' * 1000)
+
+
+    def test_budget_counts_renditions_and_restore_retires_failed_promotions(self):
+        older = self._reel('older', hours_since_view=10)
+        self._reel('newer', hours_since_view=1)
+        self.assertEqual(reel_storage.plan(self.now, budget=3000), [])
+        BusinessReel.objects.filter(pk=older.pk).update(hls_bytes=1500)
+        self.assertEqual([(action, reel.caption) for action, reel, _ in reel_storage.plan(self.now, budget=3000)],
+                         [(reel_storage.ARCHIVE, 'older')])
+        self.assertTrue(os.path.exists(older.local_video.path))
+
+        reel_storage.apply(reel_storage.plan(self.now, budget=3000))
+        ReelPromotion.objects.create(reel=older, state=ReelPromotion.FAILED, attempts=promotion.MAX_ATTEMPTS)
+        BusinessReel.objects.filter(pk=older.pk).update(view_velocity=80.0)
+        self.assertEqual(reel_storage.apply(reel_storage.plan(self.now, budget=10 ** 9))[reel_storage.RESTORE], 1)
+        self.assertEqual(ReelPromotion.objects.get(reel=older).state, ReelPromotion.RETIRED)
+        # Lifetime views alone never send a restored reel back to the CDN
+        BusinessReel.objects.filter(pk=older.pk).update(views_count=10 ** 6)
+        self.assertEqual(promotion.enqueue(), 0)
+        actions = [(action, reel.caption) for action, reel, _ in reel_storage.plan(self.now, budget=10 ** 9)]
+        self.assertIn((reel_storage.PROMOTE, 'older'), actions)
+        reel_storage.apply([action for action in reel_storage.plan(self.now, budget=10 ** 9)
+                            if action[0] == reel_storage.PROMOTE])
+        retried = ReelPromotion.objects.get(reel=older)
+        self.assertEqual((retried.state, retried.attempts), (ReelPromotion.QUEUED, 0))
+
+
+class ReelTranscodeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_ladder_never_upscales_and_command_maps_every_rung(self):
+        self.assertEqual([rung[0] for rung in transcode.select_ladder(1080)], ['240p', '360p', '480p', '720p'])
+        self.assertEqual([rung[0] for rung in transcode.select_ladder(480)], ['240p', '360p', '480p'])
+        self.assertEqual(transcode.select_ladder(181), [('240p', 180, 400, 64)])
+
+        rungs = transcode.select_ladder(360)
+        silent = transcode.hls_command('in.mp4', '/out', rungs, has_audio=False)
+        self.assertEqual(silent[silent.index('-var_stream_map') + 1], 'v:0,name:240p v:1,name:360p')
+        self.assertNotIn('0:a:0', silent)
+        voiced = transcode.hls_command('in.mp4', '/out', rungs, has_audio=True)
+        self.assertEqual(voiced[voiced.index('-var_stream_map') + 1], 'v:0,a:0,name:240p v:1,a:1,name:360p')
+
+    @override_settings(FFMPEG_BINARY='ffmpeg-not-installed-here')
+    def test_manifest_replaces_the_mp4_once_ready(self):
+        reel = BusinessReel.objects.create(
+            author=self.creator, caption='local',
+            local_video=SimpleUploadedFile('clip.mp4', b'mp4', content_type='video/mp4'),
+        )
+        self.assertEqual(reel.transcode_status, '')  # no ffmpeg: nothing scheduled
+        self.assertEqual(reel.source_video_url, reel_media.reel_media_url(reel, reel.local_video))
+
+        BusinessReel.objects.filter(pk=reel.pk).update(
+            transcode_status='READY', hls_manifest='reels/hls/1_x/master.m3u8', poster_frame='reels/hls/1_x/poster.jpg'
+        )
+        reel.refresh_from_db()
+        self.assertTrue(reel.source_video_url.endswith('reels/hls/1_x/master.m3u8'))
+        self.assertEqual(reel.progressive_video_url, reel_media.reel_media_url(reel, reel.local_video))
+        self.assertTrue(reel.source_thumbnail_url.endswith('poster.jpg'))
+        html = render_to_string('social/reels_partial.html', {'reels': [reel]})
+        self.assertIn(f'data-hls-src="{reel.stream_manifest_url}"', html)
+        self.assertIn(f'data-src="{reel.progressive_video_url}"', html)
+
+        reel.storage_tier, reel.cloudinary_public_id = 'CLOUDINARY', 'reel_1'
+        self.assertEqual(reel.stream_manifest_url, '')
+        self.assertTrue(reel.source_video_url.endswith('reel_1.mp4'))
+
+    @patch('social.management.commands.transcode_reels.ffmpeg_available', return_value=True)
+    @patch('social.management.commands.transcode_reels.transcode_reel')
+    def test_command_picks_up_reels_left_unfinished_by_a_lost_worker(self, mock_transcode, _available):
+        reels = {
+            status: BusinessReel.objects.create(
+                author=self.creator, caption=status or 'new',
+                local_video=SimpleUploadedFile('clip.mp4', b'mp4', content_type='video/mp4'),
+            )
+            for status in ('PENDING', 'PROCESSING', 'FAILED', 'READY', '')
+        }
+        long_ago = timezone.now() - timedelta(hours=2)
+        for status, reel in reels.items():
+            BusinessReel.objects.filter(pk=reel.pk).update(transcode_status=status, transcode_updated_at=long_ago)
+        in_flight = BusinessReel.objects.create(
+            author=self.creator, caption='in flight',
+            local_video=SimpleUploadedFile('clip.mp4', b'mp4', content_type='video/mp4'),
+        )
+        BusinessReel.objects.filter(pk=in_flight.pk).update(transcode_status='PROCESSING',
+                                                            transcode_updated_at=timezone.now())
+
+        call_command('transcode_reels', stdout=StringIO())
+        picked = [call.args[0] for call in mock_transcode.call_args_list]
+        self.assertEqual(picked, [reels[status].id for status in ('PENDING', 'PROCESSING', '')])
+
+        mock_transcode.reset_mock()
+        call_command('transcode_reels', retry_failed=True, stdout=StringIO())
+        self.assertIn(reels['FAILED'].id, [call.args[0] for call in mock_transcode.call_args_list])
+
+    def test_outputs_are_dropped_when_the_reel_leaves_local_mid_transcode(self):
+        reel = BusinessReel.objects.create(
+            author=self.creator, caption='archived meanwhile',
+            local_video=SimpleUploadedFile('clip.mp4', b'mp4', content_type='video/mp4'),
+        )
+
+        def render_while_archived(source, out_dir):
+            os.makedirs(out_dir)
+            with open(os.path.join(out_dir, 'master.m3u8'), 'w') as handle:
+                handle.write('#EXTM3U\n')
+            BusinessReel.objects.filter(pk=reel.pk).update(storage_tier='ARCHIVE', transcode_status='')
+            return {'rungs': ['240p']}
+
+        with patch('social.transcode.render_hls', render_while_archived):
+            self.assertEqual(transcode.transcode_reel(reel.id, use_pool=False), [])
+        reel.refresh_from_db()
+        self.assertEqual(reel.transcode_status, '')
+        self.assertFalse(reel.hls_manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, transcode.rendition_prefix(reel))))
+
+    def _renditions(self, reel, rungs):
+        out_dir = tempfile.mkdtemp(dir=self.media_root)
+        for rung in rungs:
+            os.makedirs(os.path.join(out_dir, rung))
+            with open(os.path.join(out_dir, rung, 'index.m3u8'), 'w') as handle:
+                handle.write('#EXTM3U\n')
+        with open(os.path.join(out_dir, 'master.m3u8'), 'w') as handle:
+            handle.write('#EXTM3U\n')
+        prefix = transcode.rendition_prefix(reel)
+        stored = transcode._store_outputs(out_dir, prefix)
+        BusinessReel.objects.filter(pk=reel.pk).update(
+            transcode_status='READY', hls_manifest=f'{prefix}/master.m3u8', hls_bytes=stored
+        )
+        reel.refresh_from_db()
+        return os.path.join(self.media_root, prefix)
+
+    @override_settings(FFMPEG_BINARY='ffmpeg-not-installed-here', REEL_PROMOTION_BACKEND='local')
+    def test_renditions_are_replaced_and_removed_with_the_local_copy(self):
+        reel = BusinessReel.objects.create(
+            author=self.creator, caption='local', views_count=80,
+            local_video=SimpleUploadedFile('clip.mp4', b'mp4', content_type='video/mp4'),
+        )
+        hls_dir = self._renditions(reel, ['240p', '360p'])
+        self._renditions(reel, ['240p'])
+        self.assertEqual(sorted(os.listdir(hls_dir)), ['240p', 'master.m3u8'])
+
+        promotion.enqueue()
+        promotion.run(workers=1, rate=0)
+        reel.refresh_from_db()
+        self.assertEqual(reel.storage_tier, 'CLOUDINARY')
+        self.assertFalse(os.path.exists(hls_dir))
+        self.assertEqual((reel.transcode_status, reel.hls_bytes), ('', None))
+        self.assertFalse(reel.hls_manifest)
+
+        doomed = BusinessReel.objects.create(
+            author=self.creator, caption='doomed',
+            local_video=SimpleUploadedFile('doomed.mp4', b'mp4', content_type='video/mp4'),
+        )
+        doomed_dir = self._renditions(doomed, ['240p'])
+        with self.captureOnCommitCallbacks(execute=True):
+            doomed.delete()
+        self.assertFalse(os.path.exists(doomed_dir))
+
+    @skipUnless(transcode.ffmpeg_available(), 'ffmpeg is not installed')
+    @override_settings(REEL_TRANSCODE_ASYNC=False)
+    def test_upload_is_transcoded_to_hls_with_a_poster(self):
+        source = os.path.join(self.media_root, 'src.mp4')
+        subprocess.run([transcode.ffmpeg_binary(), '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=360x640:rate=30',
+                        '-t', '3', '-pix_fmt', 'yuv420p', source], check=True)
+        with open(source, 'rb') as handle:
+            upload = SimpleUploadedFile('clip.mp4', handle.read(), content_type='video/mp4')
+        with self.captureOnCommitCallbacks(execute=True):
+            reel = BusinessReel.objects.create(author=self.creator, caption='portrait', local_video=upload)
+
+        reel.refresh_from_db()
+        self.assertEqual(reel.transcode_status, 'READY')
+        with reel.hls_manifest.open('rb') as manifest:
+            playlist = manifest.read().decode()
+        self.assertIn('240p/index.m3u8', playlist)
+        self.assertIn('360p/index.m3u8', playlist)
+        self.assertTrue(reel.poster_frame.storage.exists(reel.poster_frame.name))
+
+
+class ReelMediaServingTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.creator = User.objects.create_user(username='creator', password='secret1234')
+        self.data = bytes(range(256)) * 4
+        self.reel = BusinessReel.objects.create(
+            author=self.creator, caption='local',
+            local_video=SimpleUploadedFile('clip.mp4', self.data, content_type='video/mp4'),
+        )
+        self.url = self.reel.progressive_video_url
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_ranges_and_validators(self):
+        self.assertTrue(self.url.startswith(f'/social/reel/{self.reel.id}/media/'))
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.data)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertNotIn('Content-Encoding', response)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(self._body(response), self.data[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '24')
+        self.assertEqual(self._body(response), self.data[1000:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=f'W/{etag}').status_code, 304)
+        # If-Range: the range only applies while the client's copy is still current
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._body(response), self.data)
+
+    def test_hls_files_resolve_and_stale_versions_redirect(self):
+        hls_dir = os.path.join(self.media_root, 'reels', 'hls', f'{self.reel.id}_x')
+        os.makedirs(os.path.join(hls_dir, '240p'))
+        with open(os.path.join(hls_dir, 'master.m3u8'), 'w') as handle:
+            handle.write('#EXTM3U\n240p/index.m3u8\n')
+        with open(os.path.join(hls_dir, '240p', 'seg_00000.ts'), 'wb') as handle:
+            handle.write(b'ts' * 100)
+        BusinessReel.objects.filter(pk=self.reel.pk).update(
+            transcode_status='READY', hls_manifest=f'reels/hls/{self.reel.id}_x/master.m3u8'
+        )
+        self.reel.refresh_from_db()
+
+        manifest_url = self.reel.source_video_url
+        response = self.client.get(manifest_url)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        segment_url = manifest_url.rsplit('/', 1)[0] + '/240p/seg_00000.ts'
+        response = self.client.get(segment_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'video/mp2t')
+
+        self.assertEqual(self.client.get(manifest_url.rsplit('/', 1)[0] + '/../../staging/clip.mp4').status_code, 404)
+        other = self.url.replace('clip.mp4', 'other.mp4')
+        self.assertEqual(self.client.get(other).status_code, 404)
+
+        stale = reverse('social:reel_media', args=[self.reel.id, 'abc', self.reel.local_video.name])
+        response = self.client.get(stale)
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+
+        BusinessReel.objects.filter(pk=self.reel.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.login(username='creator', password='secret1234')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+
+    def test_files_missing_from_the_disk_link_to_the_default_storage(self):
+        os.remove(self.reel.local_video.path)
+        with patch('social.media.default_storage') as default:
+            default.url.return_value = 'https://cdn.example.com/reels/staging/clip.mp4'
+            self.assertEqual(self.reel.progressive_video_url, 'https://cdn.example.com/reels/staging/clip.mp4')
+        default.url.assert_called_once_with(self.reel.local_video.name)
+
+    @override_settings(REEL_MEDIA_SENDFILE='x-accel-redirect')
+    def test_sendfile_hands_the_body_to_the_front_end(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.reel.local_video.name}')
+        self.assertEqual(response.content, b'')
+        self.assertTrue(response['ETag'])
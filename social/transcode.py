@@ -0,0 +1,322 @@
+"""
+Adaptive bitrate HLS renditions for locally stored reels.
+
+Browsers upload one MP4 (compressed client-side by ffmpeg.wasm), which
+either stalls or wastes data on slow mobile networks. After a reel with a
+local_video is committed, ffmpeg re-encodes it into the RENDITION_LADDER
+rungs that fit the source (never upscaled) as 4-second HLS segments with a
+master playlist, plus a poster frame. Transcoding is CPU-bound, so the
+ffmpeg runs are bounded by a process pool fed by a small dispatcher thread,
+as with hotel.images.
+
+Outputs are stored under reels/hls/<reel>/ in the local reel storage
+('reels_local', never the CDN default) with their relative paths intact,
+so the master playlist's relative URIs resolve under social.media's URLs.
+A re-transcode replaces the whole directory; clear_renditions() removes
+it when the reel leaves the LOCAL tier, and a post_delete signal when the
+reel is deleted. A transcode only stores its outputs after re-reading the
+row under select_for_update: a reel promoted, archived, re-uploaded or
+deleted while ffmpeg ran gets nothing written (and no status change).
+BusinessReel.source_video_url switches to the master playlist once
+transcode_status is READY; the feed falls back to the MP4 on players
+without HLS support.
+
+The pool lives in the web worker, and gunicorn's --max-requests recycles
+workers, so a queued or running job can be lost with its process. Its row
+keeps transcode_status PENDING or PROCESSING, stamped with
+transcode_updated_at; run `transcode_reels` from cron every few minutes
+and it picks up rows left in either state longer than --stale-minutes.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+# (name, short side in pixels, video kbps, audio kbps), lowest first
+RENDITION_LADDER = (
+    ('240p', 240, 400, 64),
+    ('360p', 360, 800, 96),
+    ('480p', 480, 1400, 128),
+    ('720p', 720, 2800, 128),
+)
+SEGMENT_SECONDS = 4
+POSTER_AT_SECONDS = 1.0
+TRANSCODE_TIMEOUT = 30 * 60
+
+_pool_lock = threading.Lock()
+_process_pool = None
+_dispatcher = None
+
+
+def ffmpeg_binary():
+    return getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+
+
+def ffprobe_binary():
+    return getattr(settings, 'FFPROBE_BINARY', 'ffprobe')
+
+
+def ffmpeg_available():
+    return bool(shutil.which(ffmpeg_binary()) and shutil.which(ffprobe_binary()))
+
+
+def probe(path):
+    """(width, height, duration seconds, has_audio) of a video file."""
+    output = subprocess.run(
+        [ffprobe_binary(), '-v', 'error', '-show_entries', 'stream=codec_type,width,height:format=duration',
+         '-of', 'json', path],
+        capture_output=True, check=True, timeout=60,
+    ).stdout
+    info = json.loads(output or b'{}')
+    streams = info.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    if video is None:
+        raise ValueError('No video stream')
+    has_audio = any(stream.get('codec_type') == 'audio' for stream in streams)
+    duration = float(info.get('format', {}).get('duration') or 0)
+    return int(video['width']), int(video['height']), duration, has_audio
+
+
+def select_ladder(short_side, ladder=RENDITION_LADDER):
+    """
+    Rungs whose size fits the source's short side (reels are mostly
+    portrait, so "720p" means 720 wide there); at least the lowest rung,
+    shrunk to the source when it is smaller still.
+    """
+    rungs = [rung for rung in ladder if rung[1] <= short_side]
+    if not rungs:
+        name, _, video_kbps, audio_kbps = ladder[0]
+        rungs = [(name, short_side - short_side % 2, video_kbps, audio_kbps)]
+    return rungs
+
+
+def _short_side_scale(size):
+    """scale filter that sets the short side to size in either orientation, keeping the aspect ratio."""
+    return f"scale='if(gt(iw,ih),-2,{size})':'if(gt(iw,ih),{size},-2)'"
+
+
+def hls_command(source, out_dir, rungs, has_audio):
+    """One ffmpeg invocation that encodes every rung and writes the master playlist."""
+    split = f'[0:v]split={len(rungs)}' + ''.join(f'[v{i}]' for i in range(len(rungs)))
+    scales = [f'[v{i}]{_short_side_scale(size)}[v{i}out]' for i, (_, size, _, _) in enumerate(rungs)]
+    command = [
+        ffmpeg_binary(), '-y', '-v', 'error', '-i', source,
+        '-filter_complex', ';'.join([split] + scales),
+    ]
+    for i, (_, _, video_kbps, audio_kbps) in enumerate(rungs):
+        command += [
+            '-map', f'[v{i}out]',
+            f'-c:v:{i}', 'libx264', f'-b:v:{i}', f'{video_kbps}k',
+            f'-maxrate:v:{i}', f'{int(video_kbps * 1.07)}k', f'-bufsize:v:{i}', f'{video_kbps * 2}k',
+        ]
+        if has_audio:
+            command += ['-map', '0:a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', f'{audio_kbps}k']
+    stream_map = ' '.join(
+        f'v:{i},a:{i},name:{name}' if has_audio else f'v:{i},name:{name}'
+        for i, (name, _, _, _) in enumerate(rungs)
+    )
+    # Keyframes on segment boundaries so every rung switches at the same points
+    command += [
+        '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})', '-sc_threshold', '0',
+        '-ac', '2',
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(out_dir, '%v', 'seg_%05d.ts'),
+        '-master_pl_name', 'master.m3u8',
+        '-var_stream_map', stream_map,
+        os.path.join(out_dir, '%v', 'index.m3u8'),
+    ]
+    return command
+
+
+def poster_command(source, out_path, at_seconds):
+    return [ffmpeg_binary(), '-y', '-v', 'error', '-ss', f'{at_seconds:.2f}', '-i', source,
+            '-frames:v', '1', '-vf', _short_side_scale(720), '-q:v', '4', out_path]
+
+
+def render_hls(source, out_dir, ladder=RENDITION_LADDER):
+    """
+    Pure, picklable worker: transcode source into out_dir.
+    Returns {'rungs': [...names], 'duration': seconds}; raises on ffmpeg errors.
+    """
+    width, height, duration, has_audio = probe(source)
+    rungs = select_ladder(min(width, height), ladder)
+    for name, _, _, _ in rungs:
+        os.makedirs(os.path.join(out_dir, name), exist_ok=True)
+    subprocess.run(hls_command(source, out_dir, rungs, has_audio), check=True, capture_output=True,
+                   timeout=TRANSCODE_TIMEOUT)
+    poster_at = min(POSTER_AT_SECONDS, duration / 2) if duration else 0
+    subprocess.run(poster_command(source, os.path.join(out_dir, 'poster.jpg'), poster_at),
+                   check=True, capture_output=True, timeout=120)
+    return {'rungs': [name for name, _, _, _ in rungs], 'duration': duration}
+
+
+def _get_process_pool():
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=getattr(settings, 'REEL_TRANSCODE_WORKERS', 2))
+        return _process_pool
+
+
+def _get_dispatcher():
+    global _dispatcher
+    with _pool_lock:
+        if _dispatcher is None:
+            _dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='reel-transcode')
+        return _dispatcher
+
+
+def rendition_prefix(reel):
+    return f'reels/hls/{reel.id}_{reel.share_token}'
+
+
+def _delete_tree(storage, prefix):
+    """Delete every file under prefix (rung directories included) from storage."""
+    try:
+        directories, files = storage.listdir(prefix)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    for directory in directories:
+        _delete_tree(storage, f'{prefix}/{directory}')
+    for filename in files:
+        storage.delete(f'{prefix}/{filename}')
+    if hasattr(storage, 'path'):
+        try:
+            os.rmdir(storage.path(prefix))
+        except OSError:
+            pass
+
+
+def _store_outputs(out_dir, prefix):
+    """
+    Replace everything under prefix in the local reel storage with out_dir's
+    files, keeping relative paths (rungs dropped since the last run go too).
+    Returns the bytes stored.
+    """
+    from .models import reel_local_storage
+
+    storage = reel_local_storage()
+    _delete_tree(storage, prefix)
+    stored = 0
+    for root, _, files in os.walk(out_dir):
+        for filename in files:
+            local = os.path.join(root, filename)
+            name = f'{prefix}/{os.path.relpath(local, out_dir).replace(os.sep, "/")}'
+            with open(local, 'rb') as handle:
+                storage.save(name, File(handle))
+            stored += os.path.getsize(local)
+    return stored
+
+
+def rendition_files(reel):
+    """(prefix, names) of what delete_rendition_files removes, captured while the reel still has its id."""
+    return rendition_prefix(reel), [field_file.name for field_file in (reel.hls_manifest, reel.poster_frame) if field_file]
+
+
+def delete_rendition_files(prefix, names=()):
+    """Remove a rendition directory (and files stored outside it) from the local reel storage."""
+    from .models import reel_local_storage
+
+    storage = reel_local_storage()
+    _delete_tree(storage, prefix)
+    for name in names:
+        if storage.exists(name):
+            storage.delete(name)
+
+
+def clear_renditions(reel):
+    """Delete the renditions of a reel leaving the LOCAL tier and forget them on the row."""
+    from .models import BusinessReel
+
+    if not (reel.hls_manifest or reel.poster_frame or reel.transcode_status):
+        return
+    try:
+        delete_rendition_files(*rendition_files(reel))
+    except Exception as e:
+        print(f"Could not delete renditions of reel {reel.id}: {e}")
+    BusinessReel.objects.filter(pk=reel.pk).update(
+        transcode_status='', hls_manifest=None, poster_frame=None, hls_bytes=None
+    )
+
+
+def transcode_reel(reel_id, use_pool=True):
+    """Transcode one reel and mark it READY. Returns the rendition names written."""
+    from .models import BusinessReel
+
+    reel = BusinessReel.objects.filter(id=reel_id).first()
+    if reel is None or not reel.local_video:
+        return []
+    BusinessReel.objects.filter(id=reel_id).update(transcode_status='PROCESSING', transcode_updated_at=timezone.now())
+
+    work_dir = tempfile.mkdtemp(prefix=f'reel-{reel_id}-')
+    try:
+        source = os.path.join(work_dir, 'source' + os.path.splitext(reel.local_video.name)[1])
+        with reel.local_video.open('rb') as original, open(source, 'wb') as copy:
+            shutil.copyfileobj(original, copy)
+        out_dir = os.path.join(work_dir, 'hls')
+        if use_pool:
+            result = _get_process_pool().submit(render_hls, source, out_dir).result()
+        else:
+            result = render_hls(source, out_dir)
+
+        prefix = rendition_prefix(reel)
+        with transaction.atomic():
+            current = (
+                BusinessReel.objects.select_for_update().filter(id=reel_id)
+                .values_list('storage_tier', 'local_video').first()
+            )
+            if current is None or current[0] != 'LOCAL':
+                # Left the LOCAL tier meanwhile: clear_renditions() has run, drop anything under the prefix
+                delete_rendition_files(prefix)
+                return []
+            if current[1] != reel.local_video.name:
+                # A newer upload replaced the source; its own transcode owns the prefix
+                return []
+            stored = _store_outputs(out_dir, prefix)
+            BusinessReel.objects.filter(id=reel_id).update(
+                transcode_status='READY',
+                transcode_updated_at=timezone.now(),
+                hls_bytes=stored,
+                hls_manifest=f'{prefix}/master.m3u8',
+                poster_frame=f'{prefix}/poster.jpg',
+            )
+        return result['rungs']
+    except Exception:
+        BusinessReel.objects.filter(id=reel_id, storage_tier='LOCAL', local_video=reel.local_video.name).update(
+            transcode_status='FAILED', transcode_updated_at=timezone.now()
+        )
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _transcode_in_background(reel_id):
+    close_old_connections()
+    try:
+        transcode_reel(reel_id)
+    except Exception as e:
+        print(f"Reel transcoding failed for reel {reel_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_reel_transcode(reel_id):
+    """Queue transcoding once the surrounding transaction commits (no-op without ffmpeg)."""
+    from .models import BusinessReel
+
+    if not ffmpeg_available():
+        return
+    BusinessReel.objects.filter(id=reel_id).update(transcode_status='PENDING', transcode_updated_at=timezone.now())
+    if not getattr(settings, 'REEL_TRANSCODE_ASYNC', True):
+        transaction.on_commit(lambda: transcode_reel(reel_id, use_pool=False))
+        return
+    transaction.on_commit(lambda: _get_dispatcher().submit(_transcode_in_background, reel_id))
@@ -0,0 +1,205 @@
+"""
+Trust score bookkeeping for SocialProfile.
+
+A creator's trust score is
+
+    min(100, LIKE_POINTS * likes on their reels
+             + DEAL_POINTS * verified deals
+             + ENDORSEMENT_POINTS * verified endorsements)
+
+and is sealed with an HMAC (SocialProfile.trust_signature). Recomputing
+and re-sealing on every like tap made liking a reel cost an aggregate over
+the author's reels plus a profile write, so likes now only mark the author
+dirty. Dirty authors are recomputed together TRUST_RECOMPUTE_DELAY seconds
+after the first mark, so a burst of likes on one creator costs one
+recompute. Until then, approximate() projects the pending like delta onto
+the last sealed score for display.
+
+recompute_all() is the batch path (recompute_trust_scores command, admin
+action): the like rollup is first recounted inside a single UPDATE (so
+concurrent F() deltas from likes are never overwritten by a stale count),
+verified endorsements are counted with one grouped query, scores are
+computed as arrays and rows whose score or seal changed are written back
+with bulk_update, which touches only the trust fields.
+"""
+import atexit
+import threading
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+
+LIKE_POINTS = 5
+DEAL_POINTS = 2
+ENDORSEMENT_POINTS = 5
+MAX_TRUST_SCORE = 100.0
+TRUST_RECOMPUTE_DELAY = 10.0
+BATCH_SIZE = 2000
+
+
+def score(likes, deals, endorsements):
+    raw = LIKE_POINTS * likes + DEAL_POINTS * deals + ENDORSEMENT_POINTS * endorsements
+    return min(MAX_TRUST_SCORE, float(raw))
+
+
+def recompute(author_ids):
+    """Recompute and re-seal the trust score of each author. Returns the number of profiles updated."""
+    from .models import SocialProfile
+
+    updated = 0
+    for profile in SocialProfile.objects.filter(user_id__in=list(author_ids)):
+        profile.update_trust_score()
+        updated += 1
+    return updated
+
+
+def _grouped_counts(queryset, key, user_ids):
+    if user_ids is not None:
+        queryset = queryset.filter(**{f'{key}__in': user_ids})
+    return dict(queryset.order_by().values(key).annotate(total=Count('pk')).values_list(key, 'total'))
+
+
+def recompute_all(user_ids=None, batch_size=BATCH_SIZE):
+    """
+    Recount the like rollup, then recompute the trust score and seal of every
+    profile (or of the given users) in bulk. Returns (profiles scored,
+    profiles written).
+    """
+    from .likes import recount_author_likes
+    from .models import SocialProfile, VideoEndorsement
+
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    recount_author_likes(user_ids)
+    endorsements = _grouped_counts(
+        VideoEndorsement.objects.filter(is_verified_transaction=True), 'professional', user_ids
+    )
+
+    profiles = SocialProfile.objects.only(
+        'id', 'user_id', 'trust_score', 'trust_signature', 'verified_deals_count', 'reel_likes_count'
+    ).order_by('pk')
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+
+    scored = written = 0
+    batch = []
+    for profile in profiles.iterator(chunk_size=batch_size):
+        batch.append(profile)
+        if len(batch) == batch_size:
+            written += _rescore(batch, endorsements, batch_size)
+            scored += len(batch)
+            batch = []
+    if batch:
+        written += _rescore(batch, endorsements, batch_size)
+        scored += len(batch)
+    return scored, written
+
+
+def _rescore(profiles, endorsements, batch_size):
+    from .models import SocialProfile
+
+    likes = np.array([profile.reel_likes_count for profile in profiles], dtype=np.int64)
+    deals = np.array([profile.verified_deals_count for profile in profiles], dtype=np.int64)
+    endorsed = np.array([endorsements.get(profile.user_id, 0) for profile in profiles], dtype=np.int64)
+    raw = LIKE_POINTS * likes + DEAL_POINTS * deals + ENDORSEMENT_POINTS * endorsed
+    scores = np.minimum(raw, MAX_TRUST_SCORE).astype(float).tolist()
+
+    changed = []
+    for profile, new_score in zip(profiles, scores):
+        before = (profile.trust_score, profile.trust_signature)
+        profile.trust_score = new_score
+        # HMAC does not vectorize; it is a few microseconds per profile
+        profile.trust_signature = profile.generate_trust_signature()
+        if (profile.trust_score, profile.trust_signature) != before:
+            changed.append(profile)
+    if changed:
+        with transaction.atomic():
+            SocialProfile.objects.bulk_update(
+                changed, ['trust_score', 'trust_signature'], batch_size=batch_size
+            )
+    return len(changed)
+
+
+class TrustRecomputeQueue:
+    """Authors whose likes changed since their score was last sealed, with the net like delta."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._timer = None
+
+    def mark(self, like_deltas):
+        """like_deltas: {author_id: net change in likes}."""
+        if not getattr(settings, 'TRUST_RECOMPUTE_ASYNC', True):
+            recompute(like_deltas)
+            return
+        with self._lock:
+            for author_id, delta in like_deltas.items():
+                self._pending[author_id] += delta
+            if self._timer is None:
+                self._timer = threading.Timer(
+                    getattr(settings, 'TRUST_RECOMPUTE_DELAY', TRUST_RECOMPUTE_DELAY), self._flush_in_background
+                )
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending_likes(self, author_id):
+        with self._lock:
+            return self._pending.get(author_id, 0)
+
+    def _flush_in_background(self):
+        close_old_connections()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Trust score recompute failed: {e}")
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Recompute every dirty author now. Returns the number of profiles updated."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._timer = None
+        if not pending:
+            return 0
+        try:
+            return recompute(pending)
+        except Exception:
+            with self._lock:
+                self._pending.update(pending)
+            raise
+
+    def reset(self):
+        """Forget dirty authors without recomputing them (tests)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._pending.clear()
+
+
+_queue = TrustRecomputeQueue()
+atexit.register(_queue._flush_in_background)
+
+
+def mark_likes_changed(like_deltas):
+    like_deltas = {author_id: delta for author_id, delta in like_deltas.items() if delta}
+    if like_deltas:
+        _queue.mark(like_deltas)
+
+
+def approximate(profile):
+    """The profile's sealed score with any not-yet-recomputed like changes projected onto it."""
+    projected = profile.trust_score + LIKE_POINTS * _queue.pending_likes(profile.user_id)
+    return max(0.0, min(MAX_TRUST_SCORE, projected))
+
+
+def flush():
+    return _queue.flush()
+
+
+def reset():
+    _queue.reset()
@@ -12,6 +12,8 @@ urlpatterns = [
     # --- PILLAR 2: DISCOVERY LAYER ---
     # Main social feed displaying Business Reels (TikTok 2.0 Shoppable Feed)
     path('feed/', views.FeedView.as_view(), name='social_feed'),
+    # Cursor-paginated pages of the same feed (JSON + HTML fragment) for infinite scroll
+    path('feed/page/', views.feed_page, name='feed_page'),
     
     # Africa-First Upload Flow: Optimized for low-latency video publishing
     # UPDATED: Now also captures/updates WhatsApp contact info via the upload form
@@ -25,6 +27,11 @@ urlpatterns = [
     path('reel/<int:reel_id>/track-share/', views.track_share, name='track_share'),
     path('reel/<int:reel_id>/track-download/', views.track_download, name='track_download'),
     path('reel/<int:reel_id>/track-view/', views.track_view, name='track_view'),
+    # Batched beacon for the same events (navigator.sendBeacon from the feed)
+    path('events/', views.track_events, name='track_events'),
+
+    # Locally stored reel files with Range/ETag/immutable caching (social.media)
+    path('reel/<int:reel_id>/media/<str:version>/<path:name>', views.reel_media_file, name='reel_media'),
     
     # --- PILLAR 3: AGENTIC COMMERCE & NEGOTIATION ---
     # The 'Haggle' Protocol: Real-time AI price negotiation endpoint
@@ -7,19 +7,27 @@ import logging
 import cloudinary
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_safe
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
 from django.contrib import messages
-from django.db.models import F, Q
+from django.core.paginator import Paginator
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
 from django.urls import reverse
 
 # Internal App Models and Forms
 from .models import BusinessReel, SocialProfile, SecureMessage
 from .forms import BusinessReelUploadForm, SecureMessageForm
+from . import beacon as reel_beacon
+from . import counters as reel_counters
+from . import feed as reel_feed
+from . import media as reel_media
+from . import trust as reel_trust
 # External User Model from users app
 from users.models import CustomUser
 
@@ -38,18 +46,50 @@ if os.environ.get('CLOUDINARY_CLOUD_NAME'):
 class FeedView(ListView):
     """
     Pillar 2: Main social feed displaying Business Reels.
-    Optimized for high-speed performance on mobile networks.
+    Optimized for high-speed performance on mobile networks: only the first
+    page of reels is rendered, the rest stream in from feed_page as the
+    viewer scrolls.
     """
     model = BusinessReel
     template_name = 'social/feed.html'
     context_object_name = 'reels'
-    
+
     def get_queryset(self):
-        # Optimized with select_related to avoid N+1 queries on profile data
-        return BusinessReel.objects.filter(is_active=True).select_related(
-            'author', 
-            'author__social_profile'
-        ).order_by('-created_at')
+        # One keyset page with author/profile joined and like state annotated (see social.feed)
+        self.feed_mode = self.request.GET.get('feed', 'for_you')
+        reels, self.next_cursor = reel_feed.feed_page(self.request.user, mode=self.feed_mode)
+        return reels
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['feed_mode'] = self.feed_mode
+        context['next_cursor'] = self.next_cursor
+        context['has_next'] = self.next_cursor is not None
+        return context
+
+
+def feed_page(request):
+    """
+    Next page of the reel feed after ?cursor=, as JSON reel data plus the
+    rendered HTML fragment. ?limit= overrides the page size (capped) and
+    ?feed=latest|for_you picks the ordering when there is no cursor yet.
+    """
+    try:
+        page_size = int(request.GET.get('limit', reel_feed.REEL_PAGE_SIZE))
+    except (TypeError, ValueError):
+        page_size = reel_feed.REEL_PAGE_SIZE
+    page_size = min(max(page_size, 1), reel_feed.REEL_PAGE_SIZE_MAX)
+
+    reels, next_cursor = reel_feed.feed_page(
+        request.user, request.GET.get('cursor'), page_size, mode=request.GET.get('feed', 'for_you')
+    )
+    html = render_to_string('social/reels_partial.html', {'reels': reels}, request=request)
+    return JsonResponse({
+        'reels': [reel_feed.serialize_reel(reel) for reel in reels],
+        'html': html,
+        'next_cursor': next_cursor,
+        'has_next': next_cursor is not None,
+    })
 
 class BentoProfileView(DetailView):
     """
@@ -98,6 +138,7 @@ def upload_reel(request):
                 reel.local_video = request.FILES['local_video']
                 reel.video = None
                 reel.storage_tier = 'LOCAL'  # Initial tier: Local server storage
+                reel.video_bytes = request.FILES['local_video'].size
             
             # Generate unique share token for viral loop metrics
             if not hasattr(reel, 'share_token') or not reel.share_token:
@@ -131,30 +172,33 @@ def toggle_like_reel(request, reel_id):
     """
     Social Proof: Toggles a like on a reel via AJAX.
     UPDATED: Now triggers author trust score recalculation and returns verification status.
+    The like check is an indexed exists() and totals come from the denormalized
+    counters (social.likes); the trust score is recomputed in the background
+    (social.trust) and the value returned projects the pending likes onto it.
     """
-    reel = get_object_or_404(BusinessReel, id=reel_id)
-    if request.user in reel.likes.all():
+    reel = get_object_or_404(BusinessReel.objects.only('id', 'author_id'), id=reel_id)
+    if reel.likes.filter(pk=request.user.pk).exists():
         reel.likes.remove(request.user)
         liked = False
     else:
         reel.likes.add(request.user)
         liked = True
     
-    # --- TRIGGER TRUST SCORE UPDATE & CRYPTOGRAPHIC SEAL ---
+    # --- TRUST SCORE (DEFERRED RECOMPUTE) & CRYPTOGRAPHIC SEAL ---
     is_verified = False
     new_trust_score = 0
     
-    if hasattr(reel.author, 'social_profile'):
-        profile = reel.author.social_profile
-        # Atomic update of Trust Ledger (Pillar 1)
-        profile.update_trust_score() 
-        new_trust_score = profile.trust_score
-        is_verified = getattr(profile, 'is_trust_verified', False) 
+    profile = SocialProfile.objects.filter(user_id=reel.author_id).only(
+        'user_id', 'trust_score', 'trust_signature'
+    ).first()
+    if profile is not None:
+        new_trust_score = reel_trust.approximate(profile)
+        is_verified = profile.is_trust_verified
     
     return JsonResponse({
         'status': 'success',
         'liked': liked,
-        'total_likes': reel.likes.count(),
+        'total_likes': BusinessReel.objects.filter(id=reel.id).values_list('like_count', flat=True).first() or 0,
         'new_trust_score': new_trust_score,
         'is_verified': is_verified
     })
@@ -165,15 +209,15 @@ def toggle_like_reel(request, reel_id):
 def track_share(request, reel_id):
     """
     Branding: Increments the share count (Viral Loop metric).
+    Buffered write-behind (social.counters); the total returned is approximate.
     """
-    reel = get_object_or_404(BusinessReel, id=reel_id)
-    reel.share_count = F('share_count') + 1
-    reel.save(update_fields=['share_count'])
-    reel.refresh_from_db()
-    
+    counts = reel_counters.record(reel_id, 'share_count')
+    if counts is None:
+        return JsonResponse({'status': 'ERROR', 'message': 'Reel not found'}, status=404)
+
     return JsonResponse({
         'status': 'SUCCESS',
-        'total_shares': reel.share_count
+        'total_shares': counts['share_count']
     })
 
 @login_required
@@ -182,15 +226,15 @@ def track_share(request, reel_id):
 def track_download(request, reel_id):
     """
     Performance: Increments download count (Offline utility metric).
+    Buffered write-behind (social.counters); the total returned is approximate.
     """
-    reel = get_object_or_404(BusinessReel, id=reel_id)
-    reel.download_count = F('download_count') + 1
-    reel.save(update_fields=['download_count'])
-    reel.refresh_from_db()
-    
+    counts = reel_counters.record(reel_id, 'download_count')
+    if counts is None:
+        return JsonResponse({'status': 'ERROR', 'message': 'Reel not found'}, status=404)
+
     return JsonResponse({
         'status': 'SUCCESS',
-        'total_downloads': reel.download_count
+        'total_downloads': counts['download_count']
     })
 
 @login_required
@@ -200,52 +244,124 @@ def track_view(request, reel_id):
     """
     Track video views for virality metrics.
     When views exceed threshold (default: 50), background task promotes to Cloudinary.
+    Repeat views by the same viewer within the dedup window are not counted.
     """
-    reel = get_object_or_404(BusinessReel, id=reel_id)
-    reel.views_count = F('views_count') + 1
-    reel.save(update_fields=['views_count'])
-    reel.refresh_from_db()
-    
+    counts, counted = reel_counters.record_view(reel_id, reel_counters.viewer_key(request))
+    if counts is None:
+        return JsonResponse({'status': 'ERROR', 'message': 'Reel not found'}, status=404)
+
     return JsonResponse({
         'status': 'SUCCESS',
-        'total_views': reel.views_count,
-        'storage_tier': reel.storage_tier
+        'counted': counted,
+        'total_views': counts['views_count'],
+        'storage_tier': counts['storage_tier']
     })
 
+@login_required
+@csrf_exempt
+@require_POST
+def track_events(request):
+    """
+    Batched engagement beacon: one request carries the view/share/download
+    events a feed session queued up (see social.beacon for the format).
+    csrf_exempt because sendBeacon cannot send the token; the origin is checked instead.
+    """
+    if not reel_beacon.is_same_origin(request):
+        return JsonResponse({'status': 'ERROR', 'message': 'Cross-site beacon rejected.'}, status=403)
+    try:
+        events = reel_beacon.parse_batch(request.body)
+    except reel_beacon.BeaconError as e:
+        return JsonResponse({'status': 'ERROR', 'message': str(e)}, status=400)
+
+    coalesced, rejected = reel_beacon.coalesce(events)
+    accepted, missing, totals = reel_beacon.record_batch(coalesced, reel_counters.viewer_key(request))
+
+    return JsonResponse({
+        'status': 'SUCCESS',
+        'accepted': accepted,
+        'rejected': rejected + missing,
+        'reels': {
+            str(reel_id): {
+                'total_views': counts['views_count'],
+                'total_shares': counts['share_count'],
+                'total_downloads': counts['download_count'],
+            }
+            for reel_id, counts in totals.items()
+        },
+    })
+
+@require_safe
+def reel_media_file(request, reel_id, version, name):
+    """
+    Locally stored reel files (MP4, HLS playlists/segments, poster) with
+    Range, ETag and immutable caching; see social.media.
+    """
+    reel = get_object_or_404(BusinessReel, id=reel_id)
+    if not reel.is_active and request.user != reel.author:
+        raise Http404
+    field_file = reel_media.resolve(reel, name)
+    path = reel_media.local_path(field_file) if field_file else None
+    if path is None:
+        raise Http404
+
+    try:
+        current = reel_media.file_version(path)
+        if version != current:
+            # The file was replaced since this URL was rendered
+            return redirect('social:reel_media', reel.id, current, name)
+        if field_file.name != name:
+            path = field_file.storage.path(name)
+        cache_control = reel_media.IMMUTABLE if reel.is_active else reel_media.PRIVATE_IMMUTABLE
+        return reel_media.media_response(request, path, name, cache_control)
+    except FileNotFoundError:
+        raise Http404
+
 # --- SOVEREIGN MESSAGING PROTOCOLS ---
 
+INBOX_PAGE_SIZE = 20
+
 @login_required
 def inbox(request):
     """
     Pillar 4: Inbox view to see all ongoing conversations.
+    One windowed query ranks every message per chat partner: row 1 is the
+    last message, and the unread total rides along as a window SUM.
     """
-    sent_ids = SecureMessage.objects.filter(sender=request.user).values_list('recipient', flat=True)
-    received_ids = SecureMessage.objects.filter(recipient=request.user).values_list('sender', flat=True)
-    
-    partner_ids = set(list(sent_ids) + list(received_ids))
-    chat_partners = CustomUser.objects.filter(id__in=partner_ids)
-    
-    # Get last message for each partner
-    conversations = []
-    for partner in chat_partners:
-        last_message = SecureMessage.objects.filter(
-            (Q(sender=request.user) & Q(recipient=partner)) |
-            (Q(sender=partner) & Q(recipient=request.user))
-        ).order_by('-created_at').first()
-        
-        if last_message:
-            conversations.append({
-                'partner': partner,
-                'last_message': last_message,
-                'unread_count': SecureMessage.objects.filter(
-                    sender=partner, recipient=request.user, is_read=False
-                ).count()
-            })
-    
-    # Sort by last message time
-    conversations.sort(key=lambda x: x['last_message'].created_at, reverse=True)
-    
-    return render(request, 'social/inbox.html', {'conversations': conversations})
+    user = request.user
+    ranked = SecureMessage.objects.filter(
+        Q(sender=user) | Q(recipient=user)
+    ).annotate(
+        partner_id=Case(
+            When(sender=user, then=F('recipient_id')),
+            default=F('sender_id'),
+        ),
+    ).annotate(
+        thread_rank=Window(
+            RowNumber(),
+            partition_by=[F('partner_id')],
+            order_by=[F('timestamp').desc(), F('id').desc()],
+        ),
+        unread_count=Window(
+            Sum(Case(
+                When(recipient=user, is_read=False, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )),
+            partition_by=[F('partner_id')],
+        ),
+    ).filter(thread_rank=1).select_related('sender', 'recipient').order_by('-timestamp', '-id')
+
+    page = Paginator(ranked, INBOX_PAGE_SIZE).get_page(request.GET.get('page'))
+    conversations = [
+        {
+            'partner': message.recipient if message.sender_id == user.id else message.sender,
+            'last_message': message,
+            'unread_count': message.unread_count,
+        }
+        for message in page
+    ]
+
+    return render(request, 'social/inbox.html', {'conversations': conversations, 'page_obj': page})
 
 @login_required
 def chat_detail(request, partner_id):
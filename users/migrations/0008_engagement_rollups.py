@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_usersubscription_pesapalpayment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='comments_received_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Comments received'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='likes_received_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Likes received'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='posts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Posts'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='shares_received_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Shares received'),
+        ),
+    ]
@@ -38,6 +38,12 @@ class CustomUser(AbstractUser):
         help_text=_("Tracks how many times this user has viewed the job ad flow for post payout eligibility.")
     )
 
+    # --- ENGAGEMENT ROLLUPS (maintained by hotel.engagement) ---
+    posts_count = models.PositiveIntegerField(_("Posts"), default=0)
+    likes_received_count = models.PositiveIntegerField(_("Likes received"), default=0)
+    comments_received_count = models.PositiveIntegerField(_("Comments received"), default=0)
+    shares_received_count = models.PositiveIntegerField(_("Shares received"), default=0)
+
     # --- REFERRAL LOGIC PROPERTY ---
     @property
     def total_referral_earnings(self):
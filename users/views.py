@@ -71,12 +71,9 @@ from cerebras.cloud.sdk import Cerebras
 from .models import CustomUser, Experience, Education, Skill, SocialConnection, PayoutRequest, UserSubscription, PesapalPayment 
 # Import cross-app models for profile aggregates (keep optional to avoid hard failures)
 try:
-    from hotel.models import Post, Like, Comment, Share, Connection
+    from hotel.models import Post, Connection
 except Exception:
     Post = None
-    Like = None
-    Comment = None
-    Share = None
     Connection = None
 from .forms import CustomUserCreationForm, ProfileEditForm
 from django.contrib.auth import get_user_model
@@ -439,18 +436,16 @@ def user_profile(request):
     try:
         if Post:
             user_posts = Post.objects.filter(author=user).order_by('-created_at')
-            posts_count = user_posts.count()
+            # Engagement rollups are denormalized on the user (hotel.engagement), no COUNT queries
+            posts_count = user.posts_count
+            likes_count = user.likes_received_count
 
             # If posts have explicit impression/watch fields, aggregate them, else compute a simple proxy
             if hasattr(Post, 'impressions'):
                 impressions = user_posts.aggregate(Sum('impressions'))['impressions__sum'] or 0
             else:
-                likes_count = Like.objects.filter(post__author=user).count() if Like else 0
-                comments_count = Comment.objects.filter(post__author=user).count() if Comment else 0
-                shares_count = Share.objects.filter(original_post__author=user).count() if Share else 0
-                impressions = likes_count + comments_count + shares_count
+                impressions = likes_count + user.comments_received_count + user.shares_received_count
 
-            likes_count = Like.objects.filter(post__author=user).count() if Like else 0
             job_ad_watch_count = getattr(user, 'post_ad_watch_count', 0)
             can_request_payout = (
                 (impressions or 0) >= 10000 and